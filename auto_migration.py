@@ -1,49 +1,243 @@
 """
-Auto-migration implementation for Magellan EV Tracker v3.0
-- Automatically adds the budgeted_hours column to the sub_job table on application startup
-- Ensures database schema is always in sync with application models
-- Eliminates need for manual migration steps
+Versioned schema migrations for Magellan EV Tracker v3.0
+- Replaces drop_all/create_all on every boot: the database persists across deploys
+- Applied migrations are recorded in the schema_version table, so startup is a
+  single version check once the schema is current
+- A file lock lets only one process (e.g. one of several gunicorn workers) migrate;
+  the others wait for it and then see the new version
+- Each migration runs in one transaction together with its version row, and
+  checks the live schema first, so databases created by older releases upgrade in place
 """
 
-from flask import Flask
-from models import db, SubJob
-import os
+from models import db, SubJob, Project, ProjectRevision, ReportBatch, EVSnapshot, EVSnapshotTotal, GLOBAL_REVISION_ID
+from datetime import datetime
 import logging
-from sqlalchemy import inspect, Column, Float
-from sqlalchemy.exc import OperationalError
+import os
+from sqlalchemy import inspect, text
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines run a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+def _columns(connection, table_name):
+    return {column['name'] for column in inspect(connection).get_columns(table_name)}
+
+
+def _add_column(connection, table_name, column_name, ddl):
+    if column_name not in _columns(connection, table_name):
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+        logger.info(f"Added {column_name} column to {table_name} table")
+
+
+def create_missing_tables(connection):
+    """Create every model table that does not exist yet"""
+    db.metadata.create_all(bind=connection, checkfirst=True)
+
+
+def add_sub_job_columns(connection):
+    """Add sub_job.area and sub_job.budgeted_hours (formerly migration.run_migration and setup_auto_migration)"""
+    _add_column(connection, "sub_job", "area", "VARCHAR(100)")
+    _add_column(connection, "sub_job", "budgeted_hours", "FLOAT DEFAULT 0.0")
+    sub_job = SubJob.__table__
+    connection.execute(sub_job.update().where((sub_job.c.area.is_(None)) | (sub_job.c.area == "")).values(area="Main"))
+    connection.execute(sub_job.update().where(sub_job.c.budgeted_hours.is_(None)).values(budgeted_hours=0.0))
+
+
+def add_rule_of_credit_version(connection):
+    """Add rule_of_credit.version used to key the parsed step cache"""
+    _add_column(connection, "rule_of_credit", "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+def move_step_progress(connection):
+    """Move legacy work_item.progress_json blobs into work_item_step_progress"""
+    from migration import migrate_step_progress
+
+    if "progress_json" in _columns(connection, "work_item"):
+        migrate_step_progress(batch_size=5000, commit=False)
+
+
+def rebuild_summaries(connection):
+    """Fill the earned-value summary tables from the existing work items"""
+    from services.summary_service import SummaryService
+
+    SummaryService.rebuild(commit=False)
+
+
+def create_indexes(connection):
+    """Create the secondary indexes declared on the models and refresh planner statistics"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("ANALYZE"))
+
+
+def seed_project_revisions(connection):
+    """Create project_revision with a first revision for the global counter and every project"""
+    table = ProjectRevision.__table__
+    table.create(bind=connection, checkfirst=True)
+    existing = set(connection.execute(db.select(table.c.project_id)).scalars())
+    now = datetime.utcnow()
+    project_ids = [GLOBAL_REVISION_ID] + list(connection.execute(db.select(Project.__table__.c.id)).scalars())
+    rows = [{"project_id": project_id, "revision": 1, "updated_at": now} for project_id in project_ids if project_id not in existing]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def add_report_job_format(connection):
+    """Add report_job.file_format for Excel report jobs"""
+    _add_column(connection, "report_job", "file_format", "VARCHAR(10) NOT NULL DEFAULT 'pdf'")
+
+
+def create_report_batch(connection):
+    """Create report_batch for batch report exports"""
+    ReportBatch.__table__.create(bind=connection, checkfirst=True)
+
+
+
+def create_ev_snapshots(connection):
+    """Create ev_snapshot and ev_snapshot_total for earned-value history"""
+    EVSnapshot.__table__.create(bind=connection, checkfirst=True)
+    EVSnapshotTotal.__table__.create(bind=connection, checkfirst=True)
+
+
+def add_evm_columns(connection):
+    """Add work item actual hours and the project and work item planned dates"""
+    _add_column(connection, "project", "planned_start", "DATE")
+    _add_column(connection, "project", "planned_finish", "DATE")
+    _add_column(connection, "work_item", "actual_man_hours", "FLOAT DEFAULT 0.0")
+    _add_column(connection, "work_item", "planned_start", "DATE")
+    _add_column(connection, "work_item", "planned_finish", "DATE")
+
+
+def add_report_job_owner(connection):
+    """Add report_job owner and heartbeat_at for recovering jobs of stopped processes"""
+    _add_column(connection, "report_job", "owner", "VARCHAR(100)")
+    _add_column(connection, "report_job", "heartbeat_at", "TIMESTAMP")
+
+
+def add_report_batch_owner(connection):
+    """Add report_batch owner and heartbeat_at for failing batches of stopped processes"""
+    _add_column(connection, "report_batch", "owner", "VARCHAR(100)")
+    _add_column(connection, "report_batch", "heartbeat_at", "TIMESTAMP")
+
+# Ordered (version, description, migration) entries; append new migrations, never reorder
+MIGRATIONS = [
+    (1, "create missing tables", create_missing_tables),
+    (2, "add sub_job area and budgeted_hours", add_sub_job_columns),
+    (3, "add rule_of_credit version", add_rule_of_credit_version),
+    (4, "move progress_json into work_item_step_progress", move_step_progress),
+    (5, "rebuild earned-value summaries", rebuild_summaries),
+    (6, "create secondary indexes on foreign keys and lookup columns", create_indexes),
+    (7, "seed project data revisions", seed_project_revisions),
+    (8, "add report_job file_format", add_report_job_format),
+    (9, "create report_batch", create_report_batch),
+    (10, "create ev_snapshot and ev_snapshot_total", create_ev_snapshots),
+    (11, "add actual hours and planned dates", add_evm_columns),
+    (12, "add report_job owner and heartbeat", add_report_job_owner),
+    (13, "add report_batch owner and heartbeat", add_report_batch_owner),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection):
+    """
+    Get the version of the last applied migration
+
+    Returns:
+        int: Schema version, 0 when no migration was ever recorded
+    """
+    if not inspect(connection).has_table(SCHEMA_VERSION_TABLE):
+        return 0
+    return connection.execute(text(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}")).scalar() or 0
+
+
+class _MigrationLock:
+    """Exclusive lock file held while migrating"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        return False
+
+
+def run_migrations():
+    """
+    Apply every pending migration
+
+    Must run inside an app context while holding the migration lock.
+
+    Returns:
+        list: Versions applied
+    """
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} "
+            "(version INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+    applied = []
+    current = get_schema_version(db.session.connection())
+    db.session.rollback()
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying schema migration {version}: {description}")
+        try:
+            connection = db.session.connection()
+            migration(connection)
+            connection.execute(
+                text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+                {"version": version, "description": description, "applied_at": datetime.utcnow()}
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error applying schema migration {version} ({description}): {str(e)}")
+            raise
+        applied.append(version)
+    return applied
+
 
 def setup_auto_migration(app):
     """
-    Configure automatic database migrations on application startup
+    Bring the database schema up to date on application startup
+
+    A current schema costs one version query. Otherwise the migration lock
+    is taken, the version is read again (another worker may have finished
+    meanwhile) and the pending migrations are applied.
+
+    Args:
+        app: Flask application instance
     """
     with app.app_context():
-        inspector = inspect(db.engine)
-        
-        # Check if the sub_job table exists
-        if 'sub_job' in inspector.get_table_names():
-            # Get columns in the sub_job table
-            columns = [column['name'] for column in inspector.get_columns('sub_job')]
-            
-            # Check if budgeted_hours column exists
-            if 'budgeted_hours' not in columns:
-                try:
-                    # Add the budgeted_hours column
-                    db.engine.execute("ALTER TABLE sub_job ADD COLUMN budgeted_hours FLOAT DEFAULT 0.0")
-                    app.logger.info("Added budgeted_hours column to sub_job table")
-                except OperationalError as e:
-                    app.logger.error(f"Error adding budgeted_hours column: {str(e)}")
-                    # Try alternative approach for SQLite
-                    try:
-                        with db.engine.begin() as conn:
-                            conn.execute("ALTER TABLE sub_job ADD COLUMN budgeted_hours FLOAT DEFAULT 0.0")
-                        app.logger.info("Added budgeted_hours column to sub_job table (alternative method)")
-                    except Exception as e2:
-                        app.logger.error(f"Failed to add budgeted_hours column (alternative method): {str(e2)}")
-            else:
-                app.logger.info("budgeted_hours column already exists in sub_job table")
+        with db.engine.connect() as connection:
+            if get_schema_version(connection) >= LATEST_VERSION:
+                return
+
+        lock_path = app.config.get('MIGRATION_LOCK_FILE') or os.path.join(app.instance_path, "schema_migration.lock")
+        with _MigrationLock(lock_path):
+            applied = run_migrations()
+        if applied:
+            logger.info(f"Database schema migrated to version {applied[-1]}")
         else:
-            app.logger.info("sub_job table doesn't exist yet, will be created with all columns")
-            
-        # Ensure tables are created if they don't exist
-        db.create_all()
-        app.logger.info("Database schema check and migration completed")
+            logger.info(f"Database schema already at version {LATEST_VERSION}")
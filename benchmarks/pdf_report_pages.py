@@ -0,0 +1,224 @@
+"""
+PDF report rendering benchmark for Magellan EV Tracker v3.0
+- Renders a synthetic hours report of about 500 pages from a ReportDataset
+  whose rows come from a list in memory, so only the PDF layer is measured
+  (no database)
+- Reports pages per second over several rounds in one process, then the
+  throughput of many one-page reports, where the per-report setup that the
+  report template (reports/pdf_template.py) caches per process dominates
+- --baseline renders with the original HoursPDF class, loaded with `git show`
+  from the revision that added reports/pdf_export.py (or --baseline-rev). It
+  runs that revision's grouping loop from generate_hours_report_pdf over
+  in-memory work items, with the queries left out. Run both modes for a
+  before/after comparison; this needs a git checkout.
+
+Usage:
+    python benchmarks/pdf_report_pages.py --items 6000 --rounds 3 --small-reports 200
+    python benchmarks/pdf_report_pages.py --baseline
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import types
+import warnings
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from models import RuleOfCredit
+from reports.pdf_export import render_pdf
+from reports.report_dataset import REPORT_TYPES, ReportDataset
+from reports.report_rows import ReportItem
+from utils.rule_step_cache import RuleStep
+
+STEPS = (RuleStep('Receive', 10), RuleStep('Install', 50), RuleStep('Test', 30), RuleStep('Turnover', 10))
+
+
+class SyntheticDataset(ReportDataset):
+    """ReportDataset streaming prepared (discipline, cost code ID, ReportItem) tuples instead of a query"""
+
+    def __init__(self, items, cost_codes):
+        super().__init__(SimpleNamespace(id=1, name='Benchmark Project'), cost_codes=cost_codes)
+        self.items = items
+
+    def iter_items(self):
+        return iter(self.items)
+
+
+def synthetic_dataset(items, items_per_cost_code=200, cost_codes_per_discipline=5):
+    """Build a dataset of `items` work items with a mix of short and wrapped descriptions"""
+    rows = []
+    cost_codes = {}
+    for index in range(items):
+        cost_code_id = index // items_per_cost_code + 1
+        if cost_code_id not in cost_codes:
+            cost_codes[cost_code_id] = (
+                SimpleNamespace(cost_code_id_str=f'CC-{cost_code_id:04d}', description='Benchmark cost code'), STEPS
+            )
+        earned = (index % 11) * 1.0
+        item = ReportItem(index, f'WI-{index:06d}', 'Pipe spool installation ' * (1 + index % 4), 'EA',
+                          1.0, earned / 10, 10.0, earned)
+        item.steps_progress = {'Receive': 100.0, 'Install': (index * 7) % 101}
+        discipline = f'Discipline {(cost_code_id - 1) // cost_codes_per_discipline + 1}'
+        rows.append((discipline, cost_code_id, item))
+
+    dataset = SyntheticDataset(rows, cost_codes)
+    for _, _, item in rows:
+        dataset.totals.add(item.budgeted_quantity, item.earned_quantity, item.budgeted_man_hours, item.earned_man_hours)
+    return dataset
+
+
+def first_revision(path):
+    """Revision that added a file to the repository"""
+    revisions = subprocess.run(['git', 'log', '--diff-filter=A', '--format=%H', '--', path],
+                               cwd=ROOT, check=True, capture_output=True, text=True).stdout.split()
+    if not revisions:
+        raise SystemExit(f"{path} has no history in {ROOT}")
+    return revisions[-1]
+
+
+def load_baseline_module(revision):
+    """Execute reports/pdf_export.py as of a revision; its __file__ is the current path, so the logo resolves"""
+    path = 'reports/pdf_export.py'
+    source = subprocess.run(['git', 'show', f'{revision}:{path}'],
+                            cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    module = types.ModuleType('baseline_pdf_export')
+    module.__file__ = os.path.join(ROOT, path)
+    exec(compile(source, f'{revision}:{path}', 'exec'), module.__dict__)
+    return module
+
+
+class BaselineWorkItem(ReportItem):
+    """ReportItem with the cost code relationship the baseline renderer read from WorkItem"""
+    __slots__ = ('cost_code_id', 'cost_code')
+
+
+def baseline_work_items(dataset):
+    """
+    Turn a synthetic dataset into the work items the baseline renderer expects
+
+    Each cost code has a RuleOfCredit, so the baseline still parses the steps
+    JSON on every row, as it did with the ORM rows.
+    """
+    rule = RuleOfCredit(name='Benchmark rule', steps_json=json.dumps(
+        {'steps': [{'name': step.name, 'weight': step.weight} for step in STEPS]}
+    ))
+    cost_codes = {}
+    work_items = []
+    for discipline, cost_code_id, item in dataset.iter_items():
+        if cost_code_id not in cost_codes:
+            cost_code, _ = dataset.cost_codes[cost_code_id]
+            cost_codes[cost_code_id] = SimpleNamespace(
+                cost_code_id_str=cost_code.cost_code_id_str, description=cost_code.description,
+                discipline=discipline, rule_of_credit=rule
+            )
+        work_item = BaselineWorkItem(item.id, item.work_item_id_str, item.description, item.unit_of_measure,
+                                     item.budgeted_quantity, item.earned_quantity,
+                                     item.budgeted_man_hours, item.earned_man_hours)
+        work_item.steps_progress = item.steps_progress
+        work_item.cost_code_id = cost_code_id
+        work_item.cost_code = cost_codes[cost_code_id]
+        work_items.append(work_item)
+    return work_items
+
+
+def render_baseline_pdf(baseline, work_items, project_name, output):
+    """The baseline generate_hours_report_pdf after its queries: group the items, then draw them with HoursPDF"""
+    grouped_items = {}
+    discipline_totals = {}
+    total_budgeted_hours = 0
+    total_earned_hours = 0
+    for item in work_items:
+        discipline = item.cost_code.discipline
+        if discipline not in grouped_items:
+            grouped_items[discipline] = {}
+            discipline_totals[discipline] = {'total_budgeted_hours': 0, 'total_earned_hours': 0}
+        if item.cost_code_id not in grouped_items[discipline]:
+            grouped_items[discipline][item.cost_code_id] = {
+                'cost_code': item.cost_code, 'items': [], 'total_budgeted_hours': 0, 'total_earned_hours': 0
+            }
+        group = grouped_items[discipline][item.cost_code_id]
+        group['items'].append(item)
+        budgeted_hours = item.budgeted_man_hours or 0
+        earned_hours = item.earned_man_hours or 0
+        group['total_budgeted_hours'] += budgeted_hours
+        group['total_earned_hours'] += earned_hours
+        discipline_totals[discipline]['total_budgeted_hours'] += budgeted_hours
+        discipline_totals[discipline]['total_earned_hours'] += earned_hours
+        total_budgeted_hours += budgeted_hours
+        total_earned_hours += earned_hours
+
+    pdf = baseline.HoursPDF()
+    pdf.project_name = project_name
+    pdf.overall_progress = total_earned_hours / total_budgeted_hours * 100 if total_budgeted_hours > 0 else 0
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.table_header()
+    for discipline, cost_codes in grouped_items.items():
+        pdf.discipline_row(discipline)
+        for data in cost_codes.values():
+            pdf.cost_code_row(data['cost_code'], data['cost_code'].rule_of_credit.get_steps())
+            for item in data['items']:
+                pdf.work_item_row(item)
+            pdf.total_row('Cost Code Total', data['total_budgeted_hours'], data['total_earned_hours'])
+        pdf.total_row('Discipline Total', discipline_totals[discipline]['total_budgeted_hours'],
+                      discipline_totals[discipline]['total_earned_hours'])
+    pdf.total_row('Grand Total', total_budgeted_hours, total_earned_hours, is_grand_total=True)
+    pdf.output(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=6000, help='work items (6000 is about 500 pages)')
+    parser.add_argument('--rounds', type=int, default=3, help='reports rendered in one process')
+    parser.add_argument('--small-reports', type=int, default=200, help='one-page reports rendered afterwards')
+    parser.add_argument('--baseline', action='store_true', help='render with the original HoursPDF from git history')
+    parser.add_argument('--baseline-rev', help='revision to load the baseline renderer from')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    if args.baseline:
+        revision = args.baseline_rev or first_revision('reports/pdf_export.py')
+        baseline = load_baseline_module(revision)
+        print(f"renderer: baseline HoursPDF from {revision[:10]}")
+
+        def prepare(dataset):
+            return baseline_work_items(dataset)
+
+        def render(work_items, output):
+            render_baseline_pdf(baseline, work_items, 'Benchmark Project', output)
+    else:
+        print("renderer: report template")
+
+        def prepare(dataset):
+            return dataset
+
+        def render(dataset, output):
+            render_pdf(dataset, REPORT_TYPES['hours'], output)
+
+    report = prepare(synthetic_dataset(args.items))
+    print(f"{'round':>5}  {'pages':>6}  {'seconds':>8}  {'pages/s':>8}  {'bytes':>10}")
+    for round_number in range(1, args.rounds + 1):
+        output = io.BytesIO()
+        started = time.perf_counter()
+        render(report, output)
+        elapsed = time.perf_counter() - started
+        pages = output.getvalue().count(b'/Type /Page\n')
+        print(f"{round_number:>5}  {pages:>6}  {elapsed:>8.2f}  {pages / elapsed:>8.1f}  {len(output.getvalue()):>10}")
+
+    if args.small_reports:
+        small_report = prepare(synthetic_dataset(10))
+        started = time.perf_counter()
+        for _ in range(args.small_reports):
+            render(small_report, io.BytesIO())
+        elapsed = time.perf_counter() - started
+        print(f"{args.small_reports} one-page reports: {elapsed:.2f}s, {args.small_reports / elapsed:.1f} reports/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Concurrent writer benchmark for the SQLite engine profile of Magellan EV Tracker v3.0
+- Starts N writer processes that apply single-item progress updates (UPDATE + commit)
+  against one database file, like gunicorn workers handling progress posts
+- Compares the stock connection settings with the profile in utils/db_profile.py
+
+Usage:
+    python benchmarks/sqlite_concurrent_writers.py --writers 1 2 4 8 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from utils.db_profile import DEFAULT_SQLITE_PRAGMAS, SQLITE_ENGINE_OPTIONS, apply_sqlite_pragmas
+
+ITEMS = 10000
+
+
+def make_engine(path, profile):
+    uri = f"sqlite:///{path}"
+    if profile == 'stock':
+        return create_engine(uri)
+    engine = create_engine(uri, **SQLITE_ENGINE_OPTIONS)
+    event.listen(engine, "connect", lambda dbapi_connection, record: apply_sqlite_pragmas(dbapi_connection, DEFAULT_SQLITE_PRAGMAS))
+    return engine
+
+
+def create_database(path, profile):
+    engine = make_engine(path, profile)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE work_item (id INTEGER PRIMARY KEY, earned_man_hours FLOAT, percent_complete_hours FLOAT)"
+        ))
+        connection.execute(
+            text("INSERT INTO work_item (id, earned_man_hours, percent_complete_hours) VALUES (:id, 0, 0)"),
+            [{"id": i} for i in range(1, ITEMS + 1)]
+        )
+    engine.dispose()
+
+
+def writer(path, profile, seconds, results):
+    engine = make_engine(path, profile)
+    commits = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        item_id = random.randint(1, ITEMS)
+        percent = random.uniform(0, 100)
+        try:
+            with engine.begin() as connection:
+                connection.execute(text("SELECT earned_man_hours FROM work_item WHERE id = :id"), {"id": item_id})
+                connection.execute(
+                    text("UPDATE work_item SET earned_man_hours = :hours, percent_complete_hours = :percent WHERE id = :id"),
+                    {"hours": percent / 10, "percent": percent, "id": item_id}
+                )
+            commits += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put((commits, errors))
+
+
+def run(profile, writers, seconds):
+    path = tempfile.mktemp(suffix='.db')
+    create_database(path, profile)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=writer, args=(path, profile, seconds, results)) for _ in range(writers)]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    commits = sum(commit for commit, _ in totals)
+    errors = sum(error for _, error in totals)
+    return commits / seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'profile':<8} {'writers':>7} {'commits/s':>10} {'lock errors':>12}")
+    for writers in args.writers:
+        for profile in ('stock', 'tuned'):
+            throughput, errors = run(profile, writers, args.seconds)
+            print(f"{profile:<8} {writers:>7} {throughput:>10.0f} {errors:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,10 @@
 Migration script to fix database schema issues in Magellan EV Tracker v3.0
 - Adds 'area' field to SubJob model
 - Updates code to remove 'discipline' references from SubJob workflows
+- Moves legacy progress_json blobs into the work_item_step_progress table
 """
 
-from models import db, SubJob
+from models import db, SubJob, WorkItem, WorkItemStepProgress, parse_steps_progress
 import sqlalchemy as sa
 import traceback
 
@@ -42,5 +43,77 @@ def run_migration():
         traceback.print_exc()
         return False
 
+def migrate_step_progress(batch_size=1000, commit=True):
+    """
+    Move legacy work_item.progress_json blobs into work_item_step_progress
+    
+    Handles every stored shape (step_name/current_complete_percentage lists,
+    name/percentage lists and plain dictionaries). Works through the table in
+    id-ordered batches, committing each one, and clears progress_json once an
+    item is migrated, so it can be re-run safely after an interruption.
+    Steps already present in the new table are newer than the blob and win.
+    With commit=False every batch stays in the caller's transaction, as the
+    versioned schema migrations in auto_migration.py run it.
+    """
+    print("Migrating work item step progress...")
+    
+    try:
+        work_item = WorkItem.__table__
+        step_progress = WorkItemStepProgress.__table__
+        migrated_items = 0
+        migrated_steps = 0
+        
+        while True:
+            rows = db.session.execute(
+                sa.select(work_item.c.id, work_item.c.progress_json)
+                .where(work_item.c.progress_json.isnot(None))
+                .order_by(work_item.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            
+            item_ids = [row.id for row in rows]
+            existing = set(db.session.execute(
+                sa.select(step_progress.c.work_item_id, step_progress.c.step_name)
+                .where(step_progress.c.work_item_id.in_(item_ids))
+            ).all())
+            
+            step_rows = []
+            for row in rows:
+                for step_name, percentage in parse_steps_progress(row.progress_json).items():
+                    if (row.id, step_name) in existing:
+                        continue
+                    try:
+                        percent_complete = float(percentage)
+                    except (TypeError, ValueError):
+                        continue
+                    step_rows.append({
+                        "work_item_id": row.id,
+                        "step_name": str(step_name),
+                        "percent_complete": percent_complete
+                    })
+            
+            if step_rows:
+                db.session.execute(step_progress.insert(), step_rows)
+            db.session.execute(work_item.update().where(work_item.c.id.in_(item_ids)).values(progress_json=None))
+            if commit:
+                db.session.commit()
+            
+            migrated_items += len(rows)
+            migrated_steps += len(step_rows)
+            print(f"Migrated {migrated_items} work items ({migrated_steps} steps)")
+        
+        print("Step progress migration completed successfully!")
+        return True
+        
+    except Exception as e:
+        print(f"Error during step progress migration: {str(e)}")
+        if not commit:
+            raise
+        db.session.rollback()
+        traceback.print_exc()
+        return False
+
 if __name__ == "__main__":
     run_migration()
@@ -1,8 +1,20 @@
 """
 Updated models.py for Magellan EV Tracker v3.0
 - Adds budgeted_hours field to SubJob model
+- Adds project, sub job and cost code summary tables maintained by deltas on flush
+- Adds RuleOfCredit.version so parsed rule steps can be cached per version
+- Moves work item step progress from the progress_json blob to work_item_step_progress
+- Adds report_job for the background report job queue
+- Indexes the foreign keys and lookup columns the services filter and sort on
+- Adds project_revision: per-project data revisions bumped on flush, used as HTTP validators
+- Adds ev_snapshot / ev_snapshot_total: earned-value history per cutoff date for S-curves
+- Adds actual man hours and planned start/finish dates for earned value management metrics
 """
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, attribute_keyed_dict
+from utils.rule_step_cache import RuleStepCache
+from datetime import datetime
 import json
 
 # Initialize SQLAlchemy
@@ -22,6 +34,9 @@ class Project(db.Model):
     project_id_str = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
+    # Baseline schedule, used for the planned value of work items without their own dates
+    planned_start = db.Column(db.Date)
+    planned_finish = db.Column(db.Date)
     sub_jobs = db.relationship("SubJob", backref="project", lazy=True, cascade="all, delete-orphan")
     work_items = db.relationship("WorkItem", backref="project", lazy=True)
     
@@ -30,7 +45,9 @@ class Project(db.Model):
             "id": self.id,
             "project_id_str": self.project_id_str,
             "name": self.name,
-            "description": self.description
+            "description": self.description,
+            "planned_start": self.planned_start.isoformat() if self.planned_start else None,
+            "planned_finish": self.planned_finish.isoformat() if self.planned_finish else None
         }
     
     def serialize_with_subjobs_and_workitems(self):
@@ -50,34 +67,44 @@ class Project(db.Model):
             items.extend(sub_job.work_items)
         return items
     
+    def get_rollup_totals(self):
+        """Get budgeted and earned totals for this project from its maintained summary row"""
+        # Kept on the instance for the total_* properties; a commit expires the row, so it
+        # is reread after writes. Empty placeholder rows are not kept.
+        totals = getattr(self, '_rollup_totals', None)
+        if totals is None:
+            from services.summary_service import SummaryService
+            totals = SummaryService.get_project_summary(self.id)
+            if inspect(totals).persistent:
+                self._rollup_totals = totals
+        return totals
+    
     @property
     def total_budgeted_hours(self):
         """Calculate total budgeted hours for all work items in this project"""
-        return sum(item.budgeted_man_hours or 0 for item in self.work_items)
+        return self.get_rollup_totals().budgeted_hours
     
     @property
     def total_earned_hours(self):
         """Calculate total earned hours for all work items in this project"""
-        return sum(item.earned_man_hours or 0 for item in self.work_items)
+        return self.get_rollup_totals().earned_hours
     
     @property
     def total_budgeted_quantity(self):
         """Calculate total budgeted quantity for all work items in this project"""
         # Note: This is a simplified approach as quantities might have different units
-        return sum(item.budgeted_quantity or 0 for item in self.work_items)
+        return self.get_rollup_totals().budgeted_quantity
     
     @property
     def total_earned_quantity(self):
         """Calculate total earned quantity for all work items in this project"""
         # Note: This is a simplified approach as quantities might have different units
-        return sum(item.earned_quantity or 0 for item in self.work_items)
+        return self.get_rollup_totals().earned_quantity
     
     @property
     def percent_complete(self):
         """Calculate overall percent complete for the project based on earned vs budgeted hours"""
-        if self.total_budgeted_hours == 0:
-            return 0
-        return (self.total_earned_hours / self.total_budgeted_hours) * 100
+        return self.get_rollup_totals().percent_complete
 
 class SubJob(db.Model):
     __tablename__ = "sub_job"
@@ -85,7 +112,7 @@ class SubJob(db.Model):
     sub_job_id_str = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False, index=True)
     work_items = db.relationship("WorkItem", backref="sub_job", lazy=True, cascade="all, delete-orphan")
     area = db.Column(db.String(100))
     budgeted_hours = db.Column(db.Float, default=0.0)  # Added budgeted_hours field
@@ -113,32 +140,42 @@ class SubJob(db.Model):
             "work_items": [wi.serialize() for wi in self.work_items]
         }
     
+    def get_rollup_totals(self):
+        """Get budgeted and earned totals for this sub job from its maintained summary row"""
+        # Kept on the instance for the total_* properties; a commit expires the row, so it
+        # is reread after writes. Empty placeholder rows are not kept.
+        totals = getattr(self, '_rollup_totals', None)
+        if totals is None:
+            from services.summary_service import SummaryService
+            totals = SummaryService.get_sub_job_summary(self.id)
+            if inspect(totals).persistent:
+                self._rollup_totals = totals
+        return totals
+    
     @property
     def total_budgeted_hours(self):
         """Calculate total budgeted hours for all work items in this sub job"""
-        return sum(item.budgeted_man_hours or 0 for item in self.work_items)
+        return self.get_rollup_totals().budgeted_hours
     
     @property
     def total_earned_hours(self):
         """Calculate total earned hours for all work items in this sub job"""
-        return sum(item.earned_man_hours or 0 for item in self.work_items)
+        return self.get_rollup_totals().earned_hours
     
     @property
     def total_budgeted_quantity(self):
         """Calculate total budgeted quantity for all work items in this sub job"""
-        return sum(item.budgeted_quantity or 0 for item in self.work_items)
+        return self.get_rollup_totals().budgeted_quantity
     
     @property
     def total_earned_quantity(self):
         """Calculate total earned quantity for all work items in this sub job"""
-        return sum(item.earned_quantity or 0 for item in self.work_items)
+        return self.get_rollup_totals().earned_quantity
     
     @property
     def percent_complete(self):
         """Calculate overall percent complete for the sub job based on earned vs budgeted hours"""
-        if self.total_budgeted_hours == 0:
-            return 0
-        return (self.total_earned_hours / self.total_budgeted_hours) * 100
+        return self.get_rollup_totals().percent_complete
 
 class RuleOfCredit(db.Model):
     __tablename__ = "rule_of_credit"
@@ -146,6 +183,7 @@ class RuleOfCredit(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     steps_json = db.Column(db.Text, default="[]")  # JSON string to store steps and weights
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped whenever the steps change
     cost_codes = db.relationship("CostCode", backref="rule_of_credit", lazy=True)
     
     def get_steps(self):
@@ -163,6 +201,7 @@ class RuleOfCredit(db.Model):
     def set_steps(self, steps_list):
         """Set steps from a list of dictionaries with name and weight"""
         self.steps_json = json.dumps(steps_list)
+        self.version = (self.version or 1) + 1
     
     def serialize(self):
         return {
@@ -178,8 +217,8 @@ class CostCode(db.Model):
     cost_code_id_str = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.String(200), nullable=False)
     discipline = db.Column(db.String(100), nullable=False)
-    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
-    rule_of_credit_id = db.Column(db.Integer, db.ForeignKey("rule_of_credit.id"), nullable=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False, index=True)
+    rule_of_credit_id = db.Column(db.Integer, db.ForeignKey("rule_of_credit.id"), nullable=True, index=True)
     work_items = db.relationship("WorkItem", backref="cost_code", lazy=True)
     
     def serialize(self):
@@ -192,94 +231,93 @@ class CostCode(db.Model):
             "rule_of_credit_id": self.rule_of_credit_id
         }
 
+def parse_steps_progress(progress_json):
+    """Parse a legacy progress_json blob, in any of its stored formats, into a step name -> percent dictionary"""
+    try:
+        progress_data = {}
+        current_progress_data = json.loads(progress_json or "[]")
+        
+        if isinstance(current_progress_data, list):
+            for step_progress in current_progress_data:
+                if isinstance(step_progress, dict):
+                    if "step_name" in step_progress and "current_complete_percentage" in step_progress:
+                        progress_data[step_progress["step_name"]] = float(step_progress["current_complete_percentage"])
+                    elif "name" in step_progress and "percentage" in step_progress:
+                        progress_data[step_progress["name"]] = float(step_progress["percentage"])
+        elif isinstance(current_progress_data, dict):
+            progress_data = current_progress_data
+        
+        return progress_data
+    except:
+        return {}
+
 class WorkItem(db.Model):
     __tablename__ = "work_item"
+    __table_args__ = (
+        # Project filters, optionally narrowed to a cost code (listings, reports, rollups)
+        db.Index("ix_work_item_project_id_cost_code_id", "project_id", "cost_code_id"),
+        # Sub job filters returned in id order (listings, keyset pages, sub job counts)
+        db.Index("ix_work_item_sub_job_id_id", "sub_job_id", "id"),
+        # Cost code lookups (rule recalculation) and keyset pages sorted by cost code
+        db.Index("ix_work_item_cost_code_id_id", "cost_code_id", "id"),
+        # Status buckets and keyset pages sorted by progress
+        db.Index("ix_work_item_percent_complete_hours_id", "percent_complete_hours", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     work_item_id_str = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text)
-    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
-    sub_job_id = db.Column(db.Integer, db.ForeignKey("sub_job.id"), nullable=False)
-    cost_code_id = db.Column(db.Integer, db.ForeignKey("cost_code.id"), nullable=False)
-    budgeted_quantity = db.Column(db.Float)
+    # Columns folded into the summary tables keep their pre-flush value (active_history)
+    # so the flush listener can apply exact deltas
+    project_id = db.column_property(db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False), active_history=True)
+    sub_job_id = db.column_property(db.Column(db.Integer, db.ForeignKey("sub_job.id"), nullable=False), active_history=True)
+    cost_code_id = db.column_property(db.Column(db.Integer, db.ForeignKey("cost_code.id"), nullable=False), active_history=True)
+    budgeted_quantity = db.column_property(db.Column(db.Float), active_history=True)
     unit_of_measure = db.Column(db.String(20))
-    budgeted_man_hours = db.Column(db.Float)
-    progress_json = db.Column(db.Text, default="[]") # JSON string of step name and its % completion
-    earned_man_hours = db.Column(db.Float, default=0.0)
-    earned_quantity = db.Column(db.Float, default=0.0)
+    budgeted_man_hours = db.column_property(db.Column(db.Float), active_history=True)
+    progress_json = db.Column(db.Text) # Legacy JSON blob of step progress, migrated into work_item_step_progress
+    earned_man_hours = db.column_property(db.Column(db.Float, default=0.0), active_history=True)
+    earned_quantity = db.column_property(db.Column(db.Float, default=0.0), active_history=True)
     percent_complete_hours = db.Column(db.Float, default=0.0)
     percent_complete_quantity = db.Column(db.Float, default=0.0)
+    # Actual cost in man hours and baseline schedule, for earned value management metrics
+    actual_man_hours = db.Column(db.Float, default=0.0)
+    planned_start = db.Column(db.Date)
+    planned_finish = db.Column(db.Date)
+    step_progress = db.relationship(
+        "WorkItemStepProgress",
+        backref="work_item",
+        lazy=True,
+        cascade="all, delete-orphan",
+        collection_class=attribute_keyed_dict("step_name")
+    )
     
     def get_steps_progress(self):
         """Return steps progress as a Python dictionary"""
-        try:
-            progress_data = {}
-            current_progress_data = json.loads(self.progress_json or "[]")
-            
-            if isinstance(current_progress_data, list):
-                for step_progress in current_progress_data:
-                    if isinstance(step_progress, dict):
-                        if "step_name" in step_progress and "current_complete_percentage" in step_progress:
-                            progress_data[step_progress["step_name"]] = float(step_progress["current_complete_percentage"])
-                        elif "name" in step_progress and "percentage" in step_progress:
-                            progress_data[step_progress["name"]] = float(step_progress["percentage"])
-            elif isinstance(current_progress_data, dict):
-                progress_data = current_progress_data
-            
-            return progress_data
-        except:
-            return {}
+        return {step_name: row.percent_complete for step_name, row in self.step_progress.items()}
     
     def set_steps_progress(self, progress_dict):
         """Set steps progress from a dictionary"""
-        progress_list = []
+        for step_name in list(self.step_progress):
+            if step_name not in progress_dict:
+                del self.step_progress[step_name]
         for step_name, percentage in progress_dict.items():
-            progress_list.append({
-                "step_name": step_name,
-                "current_complete_percentage": float(percentage)
-            })
-        self.progress_json = json.dumps(progress_list)
+            self._set_step_percentage(step_name, percentage)
         
     def set_progress_data(self, progress_dict):
         """Alias for set_steps_progress for compatibility"""
         self.set_steps_progress(progress_dict)
     
+    def _set_step_percentage(self, step_name, percentage):
+        row = self.step_progress.get(step_name)
+        if row is None:
+            self.step_progress[step_name] = WorkItemStepProgress(step_name=step_name, percent_complete=float(percentage))
+        else:
+            row.percent_complete = float(percentage)
+    
     def update_progress_step(self, step_name_to_update, completion_percentage):
         """Update progress for a specific step"""
         try:
-            progress_data = json.loads(self.progress_json or "[]")
-            
-            # Handle different progress_json formats
-            if isinstance(progress_data, list):
-                # Find and update the step if it exists
-                step_found = False
-                for step in progress_data:
-                    if isinstance(step, dict):
-                        if "step_name" in step and step["step_name"] == step_name_to_update:
-                            step["current_complete_percentage"] = float(completion_percentage)
-                            step_found = True
-                            break
-                        elif "name" in step and step["name"] == step_name_to_update:
-                            step["percentage"] = float(completion_percentage)
-                            step_found = True
-                            break
-                
-                # If step not found, add it
-                if not step_found:
-                    progress_data.append({
-                        "step_name": step_name_to_update,
-                        "current_complete_percentage": float(completion_percentage)
-                    })
-            elif isinstance(progress_data, dict):
-                # Legacy dictionary format
-                progress_data[step_name_to_update] = float(completion_percentage)
-            else:
-                # Initialize as new format
-                progress_data = [{
-                    "step_name": step_name_to_update,
-                    "current_complete_percentage": float(completion_percentage)
-                }]
-            
-            self.progress_json = json.dumps(progress_data)
+            self._set_step_percentage(step_name_to_update, completion_percentage)
             self.calculate_earned_values()
         except Exception as e:
             print(f"Error updating progress step: {e}")
@@ -287,68 +325,27 @@ class WorkItem(db.Model):
     def calculate_earned_values(self):
         """Calculate earned values based on rule of credit steps and their weights"""
         try:
-            # Get the cost code and rule of credit
-            cost_code = CostCode.query.get(self.cost_code_id)
-            if not cost_code or not cost_code.rule_of_credit_id:
+            # Get the cost code and its cached, normalized rule of credit steps.
+            # Session.get and the many-to-one load hit the identity map, so bulk
+            # updates in one session do not re-query the cost code or rule.
+            cost_code = db.session.get(CostCode, self.cost_code_id) if self.cost_code_id else None
+            if not cost_code or not cost_code.rule_of_credit_id or not cost_code.rule_of_credit:
                 self.earned_man_hours = 0
                 self.percent_complete_hours = 0
                 self.earned_quantity = 0
                 self.percent_complete_quantity = 0
                 return
             
-            rule = RuleOfCredit.query.get(cost_code.rule_of_credit_id)
-            if not rule:
-                self.earned_man_hours = 0
-                self.percent_complete_hours = 0
-                self.earned_quantity = 0
-                self.percent_complete_quantity = 0
-                return
-
-            # Parse rule steps
-            parsed_rule_steps = []
-            try:
-                rule_data = json.loads(rule.steps_json)
-                if isinstance(rule_data, dict) and "steps" in rule_data and isinstance(rule_data["steps"], list):
-                    steps_list_from_json = rule_data["steps"]
-                    for step_entry in steps_list_from_json:
-                        if isinstance(step_entry, dict) and "name" in step_entry and "weight" in step_entry:
-                            parsed_rule_steps.append({
-                                "name": str(step_entry["name"]),
-                                "weight": float(step_entry["weight"])
-                            })
-                elif isinstance(rule_data, list):  # Legacy format support
-                    for step_entry in rule_data:
-                        if isinstance(step_entry, dict) and "weight" in step_entry:
-                            step_name_val = None
-                            if "name" in step_entry:  # Legacy might have 'name'
-                                step_name_val = str(step_entry["name"])
-                            elif "step_name" in step_entry:  # Or 'step_name'
-                                step_name_val = str(step_entry["step_name"])
-                            
-                            if step_name_val:
-                                parsed_rule_steps.append({
-                                    "name": step_name_val,
-                                    "weight": float(step_entry["weight"])
-                                })
-            except json.JSONDecodeError:
-                pass
-            except Exception:
-                pass
+            parsed_rule_steps = RuleStepCache.get_steps(cost_code.rule_of_credit)
 
             # Get progress data
             progress_data = self.get_steps_progress()
 
             # Calculate weighted percentage
             total_weighted_percentage = 0
-            for step_def in parsed_rule_steps:
-                step_name_key = step_def.get("name")
-                if not step_name_key:
-                    continue
-                
-                step_weight = float(step_def.get("weight", 0.0))
-                step_completion = float(progress_data.get(step_name_key, 0.0))
-                
-                total_weighted_percentage += (step_completion / 100.0) * step_weight
+            for step in parsed_rule_steps:
+                step_completion = float(progress_data.get(step.name, 0.0))
+                total_weighted_percentage += (step_completion / 100.0) * step.weight
 
             # Calculate earned values
             if self.budgeted_man_hours and self.budgeted_man_hours > 0:
@@ -365,5 +362,427 @@ class WorkItem(db.Model):
                 self.earned_quantity = 0
                 self.percent_complete_quantity = 0
         except Exception as e:
-            
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+            print(f"Error calculating earned values: {e}")
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "work_item_id_str": self.work_item_id_str,
+            "description": self.description,
+            "project_id": self.project_id,
+            "sub_job_id": self.sub_job_id,
+            "cost_code_id": self.cost_code_id,
+            "budgeted_quantity": self.budgeted_quantity,
+            "unit_of_measure": self.unit_of_measure,
+            "budgeted_man_hours": self.budgeted_man_hours,
+            "earned_man_hours": self.earned_man_hours,
+            "earned_quantity": self.earned_quantity,
+            "percent_complete_hours": self.percent_complete_hours,
+            "percent_complete_quantity": self.percent_complete_quantity,
+            "actual_man_hours": self.actual_man_hours,
+            "planned_start": self.planned_start.isoformat() if self.planned_start else None,
+            "planned_finish": self.planned_finish.isoformat() if self.planned_finish else None,
+            "progress": self.get_steps_progress()
+        }
+
+
+# Row counts for listing pages, loaded as correlated subqueries only when undeferred
+# (see services/load_profiles.py)
+SubJob.work_item_count = db.column_property(
+    db.select(db.func.count(WorkItem.id)).where(WorkItem.sub_job_id == SubJob.id).correlate_except(WorkItem).scalar_subquery(),
+    deferred=True
+)
+Project.sub_job_count = db.column_property(
+    db.select(db.func.count(SubJob.id)).where(SubJob.project_id == Project.id).correlate_except(SubJob).scalar_subquery(),
+    deferred=True
+)
+
+
+class WorkItemStepProgress(db.Model):
+    """Completion percentage of one rule of credit step on one work item"""
+    __tablename__ = "work_item_step_progress"
+    work_item_id = db.Column(db.Integer, db.ForeignKey("work_item.id"), primary_key=True)
+    step_name = db.Column(db.String(100), primary_key=True)
+    percent_complete = db.Column(db.Float, nullable=False, default=0.0)
+
+    def serialize(self):
+        return {
+            "work_item_id": self.work_item_id,
+            "step_name": self.step_name,
+            "percent_complete": self.percent_complete
+        }
+
+
+class EVSummaryMixin:
+    """Columns shared by the materialized earned-value summary tables"""
+    budgeted_hours = db.Column(db.Float, nullable=False, default=0.0)
+    earned_hours = db.Column(db.Float, nullable=False, default=0.0)
+    budgeted_quantity = db.Column(db.Float, nullable=False, default=0.0)
+    earned_quantity = db.Column(db.Float, nullable=False, default=0.0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def percent_complete(self):
+        """Percent complete based on earned vs budgeted hours"""
+        if not self.budgeted_hours:
+            return 0
+        return (self.earned_hours / self.budgeted_hours) * 100
+
+    def serialize(self):
+        return {
+            "budgeted_hours": self.budgeted_hours,
+            "earned_hours": self.earned_hours,
+            "budgeted_quantity": self.budgeted_quantity,
+            "earned_quantity": self.earned_quantity,
+            "item_count": self.item_count,
+            "percent_complete": self.percent_complete
+        }
+
+# Summary tables carry no foreign keys: rows are removed in the same flush that
+# deletes their project, sub job or cost code
+class ProjectSummary(EVSummaryMixin, db.Model):
+    __tablename__ = "project_summary"
+    project_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+class SubJobSummary(EVSummaryMixin, db.Model):
+    __tablename__ = "sub_job_summary"
+    sub_job_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    project_id = db.Column(db.Integer, nullable=False, index=True)
+
+class CostCodeSummary(EVSummaryMixin, db.Model):
+    __tablename__ = "cost_code_summary"
+    cost_code_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    project_id = db.Column(db.Integer, nullable=False, index=True)
+
+
+class EVSnapshot(db.Model):
+    """
+    Earned values of every work item of a project at one cutoff date
+
+    The per-item values are packed columns (utils.packed_columns) in work
+    item ID order, one row per snapshot instead of one row per item. Like the
+    summaries, snapshots carry no foreign key to their project and are
+    removed in the flush that deletes it.
+    """
+    __tablename__ = "ev_snapshot"
+    __table_args__ = (
+        db.UniqueConstraint("project_id", "cutoff_date", name="uq_ev_snapshot_project_id_cutoff_date"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False)
+    cutoff_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    work_item_ids = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    earned_hours = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    earned_quantity = db.deferred(db.Column(db.LargeBinary, nullable=False))
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "cutoff_date": self.cutoff_date.isoformat(),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "item_count": self.item_count
+        }
+
+class EVSnapshotTotal(EVSummaryMixin, db.Model):
+    """
+    Totals of one project, sub job or discipline in a snapshot
+
+    One point of an earned-value curve: a curve is read from the
+    (project_id, level, scope_key, cutoff_date) index without touching the
+    packed per-item columns.
+    """
+    __tablename__ = "ev_snapshot_total"
+    __table_args__ = (
+        db.Index("ix_ev_snapshot_total_curve", "project_id", "level", "scope_key", "cutoff_date", unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey("ev_snapshot.id"), nullable=False, index=True)
+    project_id = db.Column(db.Integer, nullable=False)
+    cutoff_date = db.Column(db.Date, nullable=False)
+    # "project", "sub_job" or "discipline"; scope_key is "", the sub job ID or the discipline name
+    level = db.Column(db.String(20), nullable=False)
+    scope_key = db.Column(db.String(100), nullable=False, default="")
+
+# Work item columns folded into the summaries, paired with the summary column they feed
+SUMMARY_VALUE_FIELDS = (
+    ("budgeted_man_hours", "budgeted_hours"),
+    ("earned_man_hours", "earned_hours"),
+    ("budgeted_quantity", "budgeted_quantity"),
+    ("earned_quantity", "earned_quantity")
+)
+SUMMARY_KEY_FIELDS = ("project_id", "sub_job_id", "cost_code_id")
+
+def _pre_flush_value(obj, attribute):
+    """Return the value an attribute had before the current flush"""
+    history = inspect(obj).attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    if history.added:
+        return None
+    return getattr(obj, attribute)
+
+def add_summary_delta(deltas, project_id, sub_job_id, cost_code_id, values, item_count):
+    """
+    Accumulate a work item contribution into a deltas dictionary
+
+    Keys are (summary model, node id); values hold the owning project id, the
+    per-column deltas in SUMMARY_VALUE_FIELDS order and the item count delta.
+    """
+    for model, node_id in ((ProjectSummary, project_id), (SubJobSummary, sub_job_id), (CostCodeSummary, cost_code_id)):
+        if node_id is None:
+            continue
+        delta = deltas.setdefault((model, node_id), {
+            "project_id": project_id,
+            "values": [0.0] * len(SUMMARY_VALUE_FIELDS),
+            "item_count": 0
+        })
+        for i, value in enumerate(values):
+            delta["values"][i] += value or 0.0
+        delta["item_count"] += item_count
+
+def apply_summary_deltas(connection, deltas):
+    """Apply accumulated deltas to the summary tables with UPDATE, inserting missing rows"""
+    for (model, node_id), delta in deltas.items():
+        if delta["item_count"] == 0 and not any(delta["values"]):
+            continue
+        table = model.__table__
+        key_column = model.__mapper__.primary_key[0]
+        increments = {
+            summary_column: table.c[summary_column] + value
+            for (_, summary_column), value in zip(SUMMARY_VALUE_FIELDS, delta["values"])
+        }
+        increments["item_count"] = table.c.item_count + delta["item_count"]
+        result = connection.execute(table.update().where(key_column == node_id).values(**increments))
+        if result.rowcount == 0:
+            row = {key_column.name: node_id, "item_count": delta["item_count"]}
+            for (_, summary_column), value in zip(SUMMARY_VALUE_FIELDS, delta["values"]):
+                row[summary_column] = value
+            if "project_id" in table.c and key_column.name != "project_id":
+                row["project_id"] = delta["project_id"]
+            connection.execute(table.insert().values(**row))
+
+@db.event.listens_for(Session, "after_flush")
+def maintain_ev_summaries(session, flush_context):
+    """
+    Keep the summary tables in step with work item changes
+
+    Runs inside the flush transaction, so progress updates made through
+    WorkItem.update_progress_step / calculate_earned_values commit together
+    with their summary deltas.
+    """
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, WorkItem):
+            keys = [getattr(obj, field) for field in SUMMARY_KEY_FIELDS]
+            values = [getattr(obj, field) for field, _ in SUMMARY_VALUE_FIELDS]
+            add_summary_delta(deltas, *keys, values, 1)
+    for obj in session.dirty:
+        if isinstance(obj, WorkItem) and session.is_modified(obj):
+            old_keys = [_pre_flush_value(obj, field) for field in SUMMARY_KEY_FIELDS]
+            new_keys = [getattr(obj, field) for field in SUMMARY_KEY_FIELDS]
+            old_values = [_pre_flush_value(obj, field) or 0.0 for field, _ in SUMMARY_VALUE_FIELDS]
+            new_values = [getattr(obj, field) or 0.0 for field, _ in SUMMARY_VALUE_FIELDS]
+            if old_keys == new_keys and old_values == new_values:
+                continue
+            add_summary_delta(deltas, *old_keys, [-value for value in old_values], -1)
+            add_summary_delta(deltas, *new_keys, new_values, 1)
+    for obj in session.deleted:
+        if isinstance(obj, WorkItem):
+            keys = [_pre_flush_value(obj, field) for field in SUMMARY_KEY_FIELDS]
+            values = [-(_pre_flush_value(obj, field) or 0.0) for field, _ in SUMMARY_VALUE_FIELDS]
+            add_summary_delta(deltas, *keys, values, -1)
+
+    deleted_nodes = [obj for obj in session.deleted if isinstance(obj, (Project, SubJob, CostCode))]
+    if not deltas and not deleted_nodes:
+        return
+
+    connection = session.connection()
+    apply_summary_deltas(connection, deltas)
+
+    # Drop summary rows of deleted nodes
+    for obj in deleted_nodes:
+        if isinstance(obj, Project):
+            for model in (ProjectSummary, SubJobSummary, CostCodeSummary, EVSnapshotTotal, EVSnapshot):
+                connection.execute(model.__table__.delete().where(model.__table__.c.project_id == obj.id))
+        elif isinstance(obj, SubJob):
+            connection.execute(SubJobSummary.__table__.delete().where(SubJobSummary.__table__.c.sub_job_id == obj.id))
+        elif isinstance(obj, CostCode):
+            connection.execute(CostCodeSummary.__table__.delete().where(CostCodeSummary.__table__.c.cost_code_id == obj.id))
+
+
+
+class ProjectRevision(db.Model):
+    """
+    Data revision of one project, bumped by every flush that changes what its pages show
+
+    Row GLOBAL_REVISION_ID holds a counter bumped by every such flush. Touched
+    projects take its new value, so revisions only ever grow, even when a
+    deleted project's id is reused.
+    """
+    __tablename__ = "project_revision"
+    project_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    revision = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# project_revision row holding the revision of all data together (no project uses id 0)
+GLOBAL_REVISION_ID = 0
+
+def bump_project_revisions(connection, project_ids, deleted_project_ids=()):
+    """
+    Bump the global revision and give the touched projects its new value
+
+    Args:
+        connection: Connection of the flushing transaction
+        project_ids (set): IDs of projects whose data changed
+        deleted_project_ids (set): IDs of deleted projects, whose rows are dropped
+    """
+    table = ProjectRevision.__table__
+    now = datetime.utcnow()
+    result = connection.execute(
+        table.update().where(table.c.project_id == GLOBAL_REVISION_ID)
+        .values(revision=table.c.revision + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(project_id=GLOBAL_REVISION_ID, revision=1, updated_at=now))
+    revision = connection.execute(
+        db.select(table.c.revision).where(table.c.project_id == GLOBAL_REVISION_ID)
+    ).scalar()
+
+    project_ids = set(project_ids) - set(deleted_project_ids) - {None}
+    if project_ids:
+        existing = set(connection.execute(
+            db.select(table.c.project_id).where(table.c.project_id.in_(project_ids))
+        ).scalars())
+        if existing:
+            connection.execute(
+                table.update().where(table.c.project_id.in_(existing)).values(revision=revision, updated_at=now)
+            )
+        missing = project_ids - existing
+        if missing:
+            connection.execute(table.insert(), [
+                {"project_id": project_id, "revision": revision, "updated_at": now} for project_id in missing
+            ])
+    if deleted_project_ids:
+        connection.execute(table.delete().where(table.c.project_id.in_(set(deleted_project_ids))))
+
+@db.event.listens_for(Session, "after_flush")
+def maintain_project_revisions(session, flush_context):
+    """
+    Bump the revision of every project whose projects, sub jobs, cost codes,
+    work items, step progress or rules of credit changed in this flush
+
+    Runs inside the flush transaction, so a revision changes exactly when the
+    data it validates is committed.
+    """
+    project_ids = set()
+    deleted_project_ids = set()
+    work_item_ids = set()
+    rule_ids = set()
+
+    def changed(obj, deleted=False):
+        if isinstance(obj, Project):
+            project_ids.add(obj.id)
+            if deleted:
+                deleted_project_ids.add(obj.id)
+        elif isinstance(obj, (SubJob, CostCode, WorkItem)):
+            project_ids.add(obj.project_id)
+            project_ids.add(_pre_flush_value(obj, "project_id"))
+        elif isinstance(obj, WorkItemStepProgress):
+            work_item_ids.add(obj.work_item_id)
+        elif isinstance(obj, RuleOfCredit) and obj.id is not None:
+            rule_ids.add(obj.id)
+
+    for obj in session.new:
+        changed(obj)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            changed(obj)
+    for obj in session.deleted:
+        changed(obj, deleted=True)
+
+    if not (project_ids or work_item_ids or rule_ids):
+        return
+
+    connection = session.connection()
+    if work_item_ids:
+        project_ids.update(connection.execute(
+            db.select(WorkItem.__table__.c.project_id).where(WorkItem.__table__.c.id.in_(work_item_ids))
+        ).scalars())
+    if rule_ids:
+        project_ids.update(connection.execute(
+            db.select(CostCode.__table__.c.project_id).distinct().where(CostCode.__table__.c.rule_of_credit_id.in_(rule_ids))
+        ).scalars())
+    bump_project_revisions(connection, project_ids, deleted_project_ids)
+
+class ReportJob(db.Model):
+    """A report generation request handled by the background report job queue"""
+    __tablename__ = "report_job"
+    id = db.Column(db.String(32), primary_key=True)
+    report_type = db.Column(db.String(20), nullable=False)
+    project_id = db.Column(db.Integer, nullable=False)
+    sub_job_id = db.Column(db.Integer)
+    file_format = db.Column(db.String(10), nullable=False, default="pdf")
+    # Digest of the report type, scope and data version; names the cached artifact
+    cache_key = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    # Process running the job and its last sign of life, to recover jobs of stopped processes
+    owner = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+    
+    def serialize(self):
+        return {
+            "id": self.id,
+            "report_type": self.report_type,
+            "project_id": self.project_id,
+            "sub_job_id": self.sub_job_id,
+            "file_format": self.file_format,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ReportBatch(db.Model):
+    """A batch export of reports for many projects and sub jobs into one zip archive"""
+    __tablename__ = "report_batch"
+    id = db.Column(db.String(32), primary_key=True)
+    # Comma separated report types and file formats, e.g. "hours,quantities" and "pdf"
+    report_types = db.Column(db.String(100), nullable=False)
+    file_formats = db.Column(db.String(100), nullable=False)
+    # Comma separated project IDs, empty for every project
+    project_ids = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    # Progress in projects and sub jobs; each renders every requested type and format
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    # Process running the batch and its last sign of life, to fail batches of stopped processes
+    owner = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+    
+    def serialize(self):
+        return {
+            "id": self.id,
+            "report_types": self.report_types.split(","),
+            "file_formats": self.file_formats.split(","),
+            "project_ids": [int(project_id) for project_id in self.project_ids.split(",")] if self.project_ids else None,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
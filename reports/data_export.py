@@ -0,0 +1,127 @@
+"""
+CSV and JSON report export for Magellan EV Tracker v3.0
+- Rendered from the shared report row stream (reports.report_dataset), like the
+  PDF and Excel reports; both formats are written as the rows are read
+- CSV has one row per work item with its discipline and cost code, for
+  spreadsheets and imports; subtotals are left to the consumer
+- JSON nests disciplines -> cost codes -> work items with the subtotals of
+  every group, for integrations
+"""
+import contextlib
+import csv
+import io
+import json
+
+
+@contextlib.contextmanager
+def _text_output(output):
+    # Text view of a path or binary file object, without closing a caller's file
+    if isinstance(output, (str, bytes)) or hasattr(output, '__fspath__'):
+        with open(output, 'w', encoding='utf-8', newline='') as text_file:
+            yield text_file
+        return
+    text_file = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    try:
+        yield text_file
+        text_file.flush()
+    finally:
+        text_file.detach()
+
+
+def _totals_json(totals, report_type, dataset):
+    return {
+        'budgeted': round(getattr(totals, report_type.budgeted_field), 4),
+        'earned': round(getattr(totals, report_type.earned_field), 4),
+        'percent_complete': round(dataset.ratio(totals, report_type) * 100, 2)
+    }
+
+
+def _json_members(members):
+    # "key": value text of a JSON object's members, to write an object around streamed parts
+    return json.dumps(members)[1:-1]
+
+
+def render_csv(dataset, report_type, output):
+    """
+    Render a report dataset as CSV, one row per work item
+
+    Args:
+        dataset (ReportDataset): Report data
+        report_type (ReportType): Titles and columns of the report
+        output: File path or binary file object
+    """
+    step_columns = dataset.max_steps
+
+    with _text_output(output) as text_file:
+        writer = csv.writer(text_file)
+        header = ['Discipline', 'Cost Code', 'Cost Code Description', 'Work Item', 'Description', 'UOM',
+                  report_type.budgeted_label, report_type.earned_label, '% Complete']
+        for i in range(1, step_columns + 1):
+            header += [f'Step {i}', f'Step {i} %']
+        writer.writerow(header)
+
+        for discipline, cost_codes in dataset.disciplines():
+            for cost_code, rows in cost_codes:
+                step_names = [step.name for step in cost_code.steps]
+                padding = [''] * (2 * (step_columns - len(step_names)))
+                for row in rows:
+                    budgeted = getattr(row, report_type.budgeted_field)
+                    earned = getattr(row, report_type.earned_field)
+                    line = [
+                        discipline.name or '', cost_code.name, cost_code.description or '',
+                        row.work_item_id_str, row.description, row.unit_of_measure,
+                        f"{budgeted:.2f}", f"{earned:.2f}", f"{(earned / budgeted * 100) if budgeted > 0 else 0:.1f}"
+                    ]
+                    for name, percent in zip(step_names, row.step_progress):
+                        line += [name, f"{percent:.0f}"]
+                    writer.writerow(line + padding)
+
+
+def render_json(dataset, report_type, output):
+    """
+    Render a report dataset as a JSON document
+
+    The document is written while the rows stream, so each group's totals
+    follow its work items.
+
+    Args:
+        dataset (ReportDataset): Report data
+        report_type (ReportType): Titles and columns of the report
+        output: File path or binary file object
+    """
+    with _text_output(output) as text_file:
+        text_file.write('{' + _json_members({
+            'report': report_type.title,
+            'project': {'id': dataset.project_id, 'name': dataset.project_name},
+            'sub_job': {'id': dataset.sub_job_id, 'name': dataset.sub_job_name} if dataset.sub_job_id else None,
+            'budgeted_label': report_type.budgeted_label,
+            'earned_label': report_type.earned_label,
+            'totals': _totals_json(dataset.totals, report_type, dataset)
+        }) + ', "disciplines": [')
+        for discipline_index, (discipline, cost_codes) in enumerate(dataset.disciplines()):
+            if discipline_index:
+                text_file.write(', ')
+            text_file.write('{' + _json_members({'discipline': discipline.name}) + ', "cost_codes": [')
+            for cost_code_index, (cost_code, rows) in enumerate(cost_codes):
+                if cost_code_index:
+                    text_file.write(', ')
+                step_names = [step.name for step in cost_code.steps]
+                text_file.write('{' + _json_members({
+                    'cost_code': cost_code.name,
+                    'description': cost_code.description,
+                    'steps': step_names
+                }) + ', "work_items": [')
+                for row_index, row in enumerate(rows):
+                    if row_index:
+                        text_file.write(', ')
+                    text_file.write(json.dumps({
+                        'work_item': row.work_item_id_str,
+                        'description': row.description,
+                        'unit_of_measure': row.unit_of_measure,
+                        'budgeted': getattr(row, report_type.budgeted_field),
+                        'earned': getattr(row, report_type.earned_field),
+                        'steps_progress': dict(zip(step_names, row.step_progress))
+                    }))
+                text_file.write('], ' + _json_members({'totals': _totals_json(cost_code.totals, report_type, dataset)}) + '}')
+            text_file.write('], ' + _json_members({'totals': _totals_json(discipline.totals, report_type, dataset)}) + '}')
+        text_file.write(']}')
@@ -0,0 +1,152 @@
+"""
+Excel report export for Magellan EV Tracker v3.0
+- Hours and quantities reports as XLSX in the same discipline -> cost code ->
+  work item hierarchy, subtotals and Rules of Credit columns as the PDF reports
+- Written while iterating the ordered report query through the shared row
+  stream (reports.report_dataset), with the cost code and discipline subtotals
+  added up as the rows go by, into
+  xlsxwriter in constant_memory mode: each row is flushed to a temporary file
+  as soon as the next one starts, so memory does not grow with the project
+"""
+import datetime
+import xlsxwriter
+from reports.report_dataset import REPORT_TYPES, get_report_dataset
+
+# Columns before the Rules of Credit step columns
+FIXED_COLUMNS = 6
+
+# At least this many step columns, like the PDF layout
+MIN_STEP_COLUMNS = 7
+
+
+def _formats(workbook):
+    return {
+        'title': workbook.add_format({'bold': True, 'font_size': 16}),
+        'subtitle': workbook.add_format({'font_size': 12}),
+        'header': workbook.add_format({'bold': True, 'bg_color': '#F0F0F0', 'border': 1, 'align': 'center',
+                                       'valign': 'vcenter', 'text_wrap': True}),
+        'discipline': workbook.add_format({'bold': True, 'bg_color': '#DCDCDC', 'border': 1}),
+        'cost_code': workbook.add_format({'bg_color': '#F0F0F0', 'border': 1}),
+        'step_name': workbook.add_format({'bg_color': '#F0F0F0', 'border': 1, 'align': 'center', 'font_size': 8}),
+        'text': workbook.add_format({'border': 1, 'valign': 'top'}),
+        'wrap': workbook.add_format({'border': 1, 'valign': 'top', 'text_wrap': True}),
+        'center': workbook.add_format({'border': 1, 'valign': 'top', 'align': 'center'}),
+        'number': workbook.add_format({'border': 1, 'valign': 'top', 'num_format': '#,##0.00'}),
+        'percent': workbook.add_format({'border': 1, 'valign': 'top', 'num_format': '0.0%'}),
+        'step_percent': workbook.add_format({'border': 1, 'valign': 'top', 'align': 'center', 'num_format': '0%'}),
+        'total': workbook.add_format({'bold': True, 'bg_color': '#F0F0F0', 'border': 1}),
+        'total_number': workbook.add_format({'bold': True, 'bg_color': '#F0F0F0', 'border': 1, 'num_format': '#,##0.00'}),
+        'total_percent': workbook.add_format({'bold': True, 'bg_color': '#F0F0F0', 'border': 1, 'num_format': '0.0%'}),
+        'grand_total': workbook.add_format({'bold': True, 'bg_color': '#C8C8C8', 'border': 1}),
+        'grand_total_number': workbook.add_format({'bold': True, 'bg_color': '#C8C8C8', 'border': 1, 'num_format': '#,##0.00'}),
+        'grand_total_percent': workbook.add_format({'bold': True, 'bg_color': '#C8C8C8', 'border': 1, 'num_format': '0.0%'})
+    }
+
+
+def render_xlsx(dataset, report_type, output):
+    """
+    Render a report into an XLSX workbook, streaming its work items
+
+    Args:
+        dataset (ReportDataset): Report data
+        report_type (ReportType): Titles and columns of the report
+        output: File path or binary file object
+    """
+    title = report_type.title
+    step_columns = max(MIN_STEP_COLUMNS, dataset.max_steps)
+    last_column = FIXED_COLUMNS + step_columns - 1
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    try:
+        formats = _formats(workbook)
+        sheet = workbook.add_worksheet(title)
+        sheet.set_landscape()
+        sheet.fit_to_pages(1, 0)
+        sheet.set_column(0, 0, 16)
+        sheet.set_column(1, 1, 50)
+        sheet.set_column(2, 2, 8)
+        sheet.set_column(3, 5, 14)
+        sheet.set_column(FIXED_COLUMNS, last_column, 11)
+
+        # Title block; in constant_memory mode rows must be written top to bottom
+        row = 0
+        sheet.write(row, 0, title, formats['title'])
+        row += 1
+        sheet.write(row, 0, dataset.project_name, formats['subtitle'])
+        row += 1
+        if dataset.sub_job_id:
+            sub_job_text = f"Sub Job: {dataset.sub_job_name}"
+            if dataset.sub_job_description:
+                sub_job_text += f" - {dataset.sub_job_description}"
+            sheet.write(row, 0, sub_job_text)
+            row += 1
+        sheet.write(row, 0, f"Date: {datetime.datetime.now().strftime('%Y-%m-%d')}")
+        sheet.write(row, 3, 'Progress:')
+        sheet.write_number(row, 4, dataset.ratio(dataset.totals, report_type), formats['percent'])
+        row += 2
+
+        headers = ['Work Item', 'Description', 'UOM', report_type.budgeted_label, report_type.earned_label, '% Complete']
+        for column, header in enumerate(headers):
+            sheet.write(row, column, header, formats['header'])
+        sheet.merge_range(row, FIXED_COLUMNS, row, last_column, 'Rules of Credit', formats['header'])
+        sheet.freeze_panes(row + 1, 0)
+        row += 1
+
+        def total_row(row, label, totals, prefix):
+            sheet.merge_range(row, 0, row, 2, label, formats[prefix])
+            sheet.write_number(row, 3, getattr(totals, report_type.budgeted_field), formats[f'{prefix}_number'])
+            sheet.write_number(row, 4, getattr(totals, report_type.earned_field), formats[f'{prefix}_number'])
+            sheet.write_number(row, 5, dataset.ratio(totals, report_type), formats[f'{prefix}_percent'])
+            sheet.merge_range(row, FIXED_COLUMNS, row, last_column, '', formats[prefix])
+            return row + 1
+
+        for discipline, cost_codes in dataset.disciplines():
+            sheet.merge_range(row, 0, row, last_column, discipline.name or '', formats['discipline'])
+            row += 1
+            for cost_code, rows in cost_codes:
+                steps = cost_code.steps
+                sheet.merge_range(row, 0, row, FIXED_COLUMNS - 1, cost_code.label, formats['cost_code'])
+                for i in range(step_columns):
+                    sheet.write(row, FIXED_COLUMNS + i, steps[i].name if i < len(steps) else '', formats['step_name'])
+                row += 1
+                for item in rows:
+                    budgeted = getattr(item, report_type.budgeted_field)
+                    earned = getattr(item, report_type.earned_field)
+                    sheet.write_string(row, 0, item.work_item_id_str, formats['text'])
+                    sheet.write_string(row, 1, item.description, formats['wrap'])
+                    sheet.write_string(row, 2, item.unit_of_measure, formats['center'])
+                    sheet.write_number(row, 3, budgeted, formats['number'])
+                    sheet.write_number(row, 4, earned, formats['number'])
+                    sheet.write_number(row, 5, earned / budgeted if budgeted > 0 else 0, formats['percent'])
+                    for i, percent in enumerate(item.step_progress):
+                        sheet.write_number(row, FIXED_COLUMNS + i, percent / 100.0, formats['step_percent'])
+                    row += 1
+                row = total_row(row, 'Cost Code Total', cost_code.totals, 'total')
+            row = total_row(row, 'Discipline Total', discipline.totals, 'total')
+        total_row(row, 'Grand Total', dataset.totals, 'grand_total')
+    finally:
+        workbook.close()
+
+
+def generate_quantities_report_xlsx(project_id=None, sub_job_id=None, output=None):
+    """
+    Generate an Excel report for quantities data
+
+    Args:
+        project_id (int): Project ID to generate report for
+        sub_job_id (int): Sub Job ID to generate report for
+        output: File path or binary file object to write the workbook to
+    """
+    render_xlsx(get_report_dataset(project_id, sub_job_id), REPORT_TYPES['quantities'], output)
+
+
+def generate_hours_report_xlsx(project_id=None, sub_job_id=None, output=None):
+    """
+    Generate an Excel report for hours data
+
+    Args:
+        project_id (int): Project ID to generate report for
+        sub_job_id (int): Sub Job ID to generate report for
+        output: File path or binary file object to write the workbook to
+    """
+    render_xlsx(get_report_dataset(project_id, sub_job_id), REPORT_TYPES['hours'], output)
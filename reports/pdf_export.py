@@ -1,25 +1,42 @@
-import os
-import io
 import datetime
+import io
+from itertools import chain
 from fpdf import FPDF
+from reports.report_dataset import REPORT_TYPES, get_report_dataset
+from reports.pdf_template import (
+    ReportTemplate, TextMeasure, FONT_FAMILY, COL_WIDTHS, STEP_COLUMNS,
+    TABLE_WIDTH, COST_CODE_WIDTH, TOTAL_TITLE_WIDTH, RULES_WIDTH, STEP_WIDTHS,
+    ROW_HEIGHT, DESCRIPTION_LINE_HEIGHT, DESCRIPTION_PADDING, BOTTOM_MARGIN
+)
 
-class QuantitiesPDF(FPDF):
-    def __init__(self):
+# Work item rows are set in the regular report font: 9 pt, 7 pt for the steps
+ROW_TEXT = TextMeasure(FONT_FAMILY, 9)
+STEP_TEXT = TextMeasure(FONT_FAMILY, 7)
+
+class ReportPDF(FPDF):
+    def __init__(self, report_type):
         # Initialize with landscape orientation ('L')
         super().__init__(orientation='L')
+        self.report_type = report_type
+        # Logo and date are shared by every page; the logo file is read once per process
+        self.logo = ReportTemplate.logo()
+        self.report_date = datetime.datetime.now().strftime("%Y-%m-%d")
+        self.table_width = TABLE_WIDTH
+        # Page breaks are planned row by row (see ensure_space), never inside a row
+        self.set_auto_page_break(False, margin=BOTTOM_MARGIN)
+        self.body_top = None
         
     def header(self):
         # Logo - Use Fortis logo instead of Magellan
-        logo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'images', 'Fortis.png')
-        if os.path.exists(logo_path):
+        if self.logo:
             # Adjust logo position for landscape orientation
-            self.image(logo_path, 10, 8, 40)
+            self.image(io.BytesIO(self.logo), 10, 8, 40)
         
         # Set up header section with 3 rows as specified
-        # Top row: "Quantity Report"
-        self.set_font('Arial', 'B', 16)
+        # Top row: report title, e.g. "Quantity Report"
+        self.set_font(FONT_FAMILY, 'B', 16)
         self.set_xy(120, 8)
-        self.cell(60, 8, 'Quantity Report', 0, 1, 'C')
+        self.cell(60, 8, self.report_type.title, 0, 1, 'C')
         
         # Middle row: "Progress Detail"
         self.set_xy(120, 16)
@@ -27,12 +44,12 @@ class QuantitiesPDF(FPDF):
         
         # Bottom row: Project name (without project ID)
         if hasattr(self, 'project_name'):
-            self.set_font('Arial', '', 12)
+            self.set_font(FONT_FAMILY, '', 12)
             self.set_xy(120, 24)
             self.cell(60, 8, self.project_name, 0, 1, 'C')
         
         # Page info on the right
-        self.set_font('Arial', '', 9)
+        self.set_font(FONT_FAMILY, '', 9)
         self.set_xy(250, 8)
         self.cell(30, 5, f'Page: {self.page_no()}', 0, 1, 'R')
         
@@ -43,7 +60,7 @@ class QuantitiesPDF(FPDF):
         
         # Date info
         self.set_xy(250, 18)
-        self.cell(30, 5, f'Date: {datetime.datetime.now().strftime("%Y-%m-%d")}', 0, 1, 'R')
+        self.cell(30, 5, f'Date: {self.report_date}', 0, 1, 'R')
         
         # Line break after header
         self.ln(25)
@@ -51,7 +68,7 @@ class QuantitiesPDF(FPDF):
         
         # Add sub job information if available
         if hasattr(self, 'sub_job_name') and hasattr(self, 'sub_job_description'):
-            self.set_font('Arial', 'B', 10)
+            self.set_font(FONT_FAMILY, 'B', 10)
             self.set_xy(10, 38)
             self.cell(100, 5, f'Sub Job: {self.sub_job_name}', 0, 0, 'L')
             
@@ -66,14 +83,14 @@ class QuantitiesPDF(FPDF):
     def footer(self):
         # Position at 1.5 cm from bottom
         self.set_y(-15)
-        # Arial italic 8
-        self.set_font('Arial', 'I', 8)
+        # Italic 8
+        self.set_font(FONT_FAMILY, 'I', 8)
         # Page number
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
     def chapter_title(self, title):
-        # Arial 12
-        self.set_font('Arial', 'B', 12)
+        # Bold 12
+        self.set_font(FONT_FAMILY, 'B', 12)
         # Background color
         self.set_fill_color(200, 200, 200)
         # Title
@@ -85,14 +102,10 @@ class QuantitiesPDF(FPDF):
         # Colors, line width and bold font
         self.set_fill_color(240, 240, 240)
         self.set_text_color(0, 0, 0)
-        self.set_font('Arial', 'B', 9)
+        self.set_font(FONT_FAMILY, 'B', 9)
         self.set_line_width(0.3)
         
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Calculate total table width
-        self.table_width = sum(col_widths)
+        col_widths = COL_WIDTHS
         
         # Header row 1
         self.cell(col_widths[0], 7, 'Work Item', 1, 0, 'C', 1)
@@ -102,351 +115,155 @@ class QuantitiesPDF(FPDF):
         # Use multi-line cells for header text that needs wrapping
         current_x = self.get_x()
         current_y = self.get_y()
-        self.multi_cell(col_widths[3], 3.5, 'Budgeted Quantity', 1, 'C', 1)
+        self.multi_cell(col_widths[3], 3.5, self.report_type.budgeted_label, 1, 'C', 1)
         self.set_xy(current_x + col_widths[3], current_y)
         
         current_x = self.get_x()
         current_y = self.get_y()
-        self.multi_cell(col_widths[4], 3.5, 'Earned Quantity', 1, 'C', 1)
+        self.multi_cell(col_widths[4], 3.5, self.report_type.earned_label, 1, 'C', 1)
         self.set_xy(current_x + col_widths[4], current_y)
         
         self.cell(col_widths[5], 7, '% Complete', 1, 0, 'C', 1)
         
         # Rules of Credit header (spans 7 columns)
-        rules_width = sum(col_widths[6:])
-        self.cell(rules_width, 7, 'Rules of Credit', 1, 1, 'C', 1)
+        self.cell(RULES_WIDTH, 7, 'Rules of Credit', 1, 1, 'C', 1)
         
         # No space between header and table content
         self.set_xy(10, self.get_y())
+        if self.body_top is None:
+            self.body_top = self.get_y()
+    
+    def ensure_space(self, height, cost_code=None):
+        """
+        Start a new page unless a block of the given height fits on this one
+        
+        The new page repeats the table header and, inside a cost code, its
+        row with the Rules of Credit step names.
+        """
+        if self.get_y() + height <= self.h - BOTTOM_MARGIN:
+            return
+        self.add_page()
+        self.table_header()
+        if cost_code is not None:
+            self.cost_code_row(cost_code, continued=True)
+    
+    def description_lines(self, description):
+        """Measured lines of a description, cut to what fits on one page"""
+        lines = ROW_TEXT.wrap(description, COL_WIDTHS[1] - 2 * self.c_margin)
+        if self.body_top is not None:
+            # Leave room for the repeated cost code row above the work item
+            max_lines = int((self.h - BOTTOM_MARGIN - self.body_top - ROW_HEIGHT - 2 * DESCRIPTION_PADDING)
+                            // DESCRIPTION_LINE_HEIGHT)
+            if len(lines) > max_lines:
+                lines = lines[:max_lines]
+                lines[-1] = lines[-1][:-3] + '...'
+        return lines
+    
+    @staticmethod
+    def row_height(lines):
+        """Height of a work item row with the given description lines"""
+        return max(ROW_HEIGHT, len(lines) * DESCRIPTION_LINE_HEIGHT + 2 * DESCRIPTION_PADDING)
 
     def discipline_row(self, discipline):
         # Set font
-        self.set_font('Arial', 'B', 9)
+        self.set_font(FONT_FAMILY, 'B', 9)
         # Background color
         self.set_fill_color(220, 220, 220)
         # Discipline row - use exact table width to prevent overhang
         self.cell(self.table_width, 6, discipline, 1, 1, 'L', 1)
 
-    def cost_code_row(self, cost_code, steps):
+    def cost_code_row(self, cost_code, continued=False):
         # Set font
-        self.set_font('Arial', '', 9)
+        self.set_font(FONT_FAMILY, '', 9)
         # Background color
         self.set_fill_color(240, 240, 240)
         
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        cost_code_text = f"{cost_code.cost_code_id_str} - {cost_code.description}"
+        cost_code_text = cost_code.label
+        if continued:
+            cost_code_text += ' (continued)'
+        steps = cost_code.steps
         
         # Cost code cell (spans first 6 columns)
-        cost_code_width = sum(col_widths[:6])
-        self.cell(cost_code_width, 6, cost_code_text, 1, 0, 'L', 1)
+        self.cell(COST_CODE_WIDTH, 6, cost_code_text, 1, 0, 'L', 1)
         
         # Rules of Credit step names
-        self.set_font('Arial', '', 7)
-        steps_list = cost_code.rule_of_credit.get_steps() if cost_code.rule_of_credit else []
+        self.set_font(FONT_FAMILY, '', 7)
         
         # Add up to 7 step names
-        for i in range(7):
-            if i < len(steps_list):
-                self.cell(col_widths[i+6], 6, steps_list[i]['name'], 1, 0, 'C', 1)
-            else:
-                self.cell(col_widths[i+6], 6, '', 1, 0, 'C', 1)
+        for i in range(min(len(steps), STEP_COLUMNS)):
+            self.cell(STEP_WIDTHS[i], 6, steps[i].name, 1, 0, 'C', 1)
+        self.empty_step_cells(len(steps), 6, 'DF')
         
         self.ln()
 
-    def work_item_row(self, item):
+    def work_item_row(self, row, steps, lines, row_height):
         # Set font
-        self.set_font('Arial', '', 9)
-        
-        # Calculate progress
-        progress = 0
-        if item.budgeted_quantity and item.budgeted_quantity > 0:
-            progress = (item.earned_quantity or 0) / item.budgeted_quantity * 100
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Handle text wrapping for description - ensure no text bleeds over cell lines
-        description = item.description
-        if len(description) > 50:  # Increased character limit for landscape
-            # Calculate how many lines we need
-            lines = len(description) // 50 + (1 if len(description) % 50 > 0 else 0)
-            row_height = 6 * lines  # Adjust row height based on number of lines
-        else:
-            row_height = 6
-        
-        # Work item cells
-        self.cell(col_widths[0], row_height, str(item.work_item_id_str), 1, 0, 'L')
-        
-        # Multi-line cell for description
-        current_x = self.get_x()
-        current_y = self.get_y()
-        self.multi_cell(col_widths[1], row_height / (1 if len(description) <= 50 else lines), description, 1, 'L')
-        self.set_xy(current_x + col_widths[1], current_y)
-        
-        self.cell(col_widths[2], row_height, item.unit_of_measure or '', 1, 0, 'C')
-        self.cell(col_widths[3], row_height, f"{item.budgeted_quantity or 0:.2f}", 1, 0, 'R')
-        self.cell(col_widths[4], row_height, f"{item.earned_quantity or 0:.2f}", 1, 0, 'R')
-        self.cell(col_widths[5], row_height, f"{progress:.1f}%", 1, 0, 'R')
-        
-        # Rules of Credit progress steps
-        self.set_font('Arial', '', 7)
-        progress_data = item.get_steps_progress()
-        
-        # Get the rule of credit steps
-        steps = []
-        if item.cost_code and item.cost_code.rule_of_credit:
-            steps = item.cost_code.rule_of_credit.get_steps()
-        
-        for i in range(7):
-            if i < len(steps):
-                step_name = steps[i]['name']
-                progress_value = progress_data.get(step_name, 0)
-                self.cell(col_widths[i+6], row_height, f"{progress_value:.0f}%", 1, 0, 'C')
-            else:
-                self.cell(col_widths[i+6], row_height, '', 1, 0, 'C')
-        
-        self.ln()
-
-    def total_row(self, title, budgeted, earned, is_grand_total=False):
-        # Set font
-        self.set_font('Arial', 'B', 9)
-        # Background color
-        if is_grand_total:
-            self.set_fill_color(200, 200, 200)
-        else:
-            self.set_fill_color(240, 240, 240)
+        self.set_font(FONT_FAMILY, '', 9)
         
         # Calculate progress
+        budgeted = getattr(row, self.report_type.budgeted_field)
+        earned = getattr(row, self.report_type.earned_field)
         progress = 0
         if budgeted > 0:
-            progress = (earned / budgeted) * 100
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Title spans first 3 columns
-        title_width = sum(col_widths[:3])
-        self.cell(title_width, 6, title, 1, 0, 'L', 1)
-        
-        # Values
-        self.cell(col_widths[3], 6, f"{budgeted:.2f}", 1, 0, 'R', 1)
-        self.cell(col_widths[4], 6, f"{earned:.2f}", 1, 0, 'R', 1)
-        self.cell(col_widths[5], 6, f"{progress:.1f}%", 1, 0, 'R', 1)
-        
-        # Empty cells for Rules of Credit - use exact width to prevent overhang
-        rules_width = sum(col_widths[6:])
-        self.cell(rules_width, 6, '', 1, 1, 'C', 1)
-
-
-class HoursPDF(FPDF):
-    def __init__(self):
-        # Initialize with landscape orientation ('L')
-        super().__init__(orientation='L')
-        
-    def header(self):
-        # Logo - Use Fortis logo instead of Magellan
-        logo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'images', 'Fortis.png')
-        if os.path.exists(logo_path):
-            # Adjust logo position for landscape orientation
-            self.image(logo_path, 10, 8, 40)
-        
-        # Set up header section with 3 rows as specified
-        # Top row: "Hours Report"
-        self.set_font('Arial', 'B', 16)
-        self.set_xy(120, 8)
-        self.cell(60, 8, 'Hours Report', 0, 1, 'C')
-        
-        # Middle row: "Progress Detail"
-        self.set_xy(120, 16)
-        self.cell(60, 8, 'Progress Detail', 0, 1, 'C')
-        
-        # Bottom row: Project name (without project ID)
-        if hasattr(self, 'project_name'):
-            self.set_font('Arial', '', 12)
-            self.set_xy(120, 24)
-            self.cell(60, 8, self.project_name, 0, 1, 'C')
-        
-        # Page info on the right
-        self.set_font('Arial', '', 9)
-        self.set_xy(250, 8)
-        self.cell(30, 5, f'Page: {self.page_no()}', 0, 1, 'R')
-        
-        # Progress info
-        if hasattr(self, 'overall_progress'):
-            self.set_xy(250, 13)
-            self.cell(30, 5, f'Progress: {self.overall_progress:.1f}%', 0, 1, 'R')
-        
-        # Date info
-        self.set_xy(250, 18)
-        self.cell(30, 5, f'Date: {datetime.datetime.now().strftime("%Y-%m-%d")}', 0, 1, 'R')
-        
-        # Line break after header
-        self.ln(25)
-        self.line(10, 35, 287, 35)
-        
-        # Add sub job information if available
-        if hasattr(self, 'sub_job_name') and hasattr(self, 'sub_job_description'):
-            self.set_font('Arial', 'B', 10)
-            self.set_xy(10, 38)
-            self.cell(100, 5, f'Sub Job: {self.sub_job_name}', 0, 0, 'L')
-            
-            if self.sub_job_description:
-                self.set_xy(120, 38)
-                self.cell(167, 5, f'Description: {self.sub_job_description}', 0, 0, 'L')
-            
-            self.ln(8)
-        else:
-            self.ln(5)
-
-    def footer(self):
-        # Position at 1.5 cm from bottom
-        self.set_y(-15)
-        # Arial italic 8
-        self.set_font('Arial', 'I', 8)
-        # Page number
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-    def chapter_title(self, title):
-        # Arial 12
-        self.set_font('Arial', 'B', 12)
-        # Background color
-        self.set_fill_color(200, 200, 200)
-        # Title
-        self.cell(0, 6, title, 0, 1, 'L', 1)
-        # Line break
-        self.ln(4)
-
-    def table_header(self):
-        # Colors, line width and bold font
-        self.set_fill_color(240, 240, 240)
-        self.set_text_color(0, 0, 0)
-        self.set_font('Arial', 'B', 9)
-        self.set_line_width(0.3)
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Calculate total table width
-        self.table_width = sum(col_widths)
-        
-        # Header row 1
-        self.cell(col_widths[0], 7, 'Work Item', 1, 0, 'C', 1)
-        self.cell(col_widths[1], 7, 'Description', 1, 0, 'C', 1)
-        self.cell(col_widths[2], 7, 'UOM', 1, 0, 'C', 1)
-        
-        # Use multi-line cells for header text that needs wrapping
-        current_x = self.get_x()
-        current_y = self.get_y()
-        self.multi_cell(col_widths[3], 3.5, 'Budgeted Hours', 1, 'C', 1)
-        self.set_xy(current_x + col_widths[3], current_y)
-        
-        current_x = self.get_x()
-        current_y = self.get_y()
-        self.multi_cell(col_widths[4], 3.5, 'Earned Hours', 1, 'C', 1)
-        self.set_xy(current_x + col_widths[4], current_y)
-        
-        self.cell(col_widths[5], 7, '% Complete', 1, 0, 'C', 1)
-        
-        # Rules of Credit header (spans 7 columns)
-        rules_width = sum(col_widths[6:])
-        self.cell(rules_width, 7, 'Rules of Credit', 1, 1, 'C', 1)
-        
-        # No space between header and table content
-        self.set_xy(10, self.get_y())
-
-    def discipline_row(self, discipline):
-        # Set font
-        self.set_font('Arial', 'B', 9)
-        # Background color
-        self.set_fill_color(220, 220, 220)
-        # Discipline row - use exact table width to prevent overhang
-        self.cell(self.table_width, 6, discipline, 1, 1, 'L', 1)
-
-    def cost_code_row(self, cost_code, steps):
-        # Set font
-        self.set_font('Arial', '', 9)
-        # Background color
-        self.set_fill_color(240, 240, 240)
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        cost_code_text = f"{cost_code.cost_code_id_str} - {cost_code.description}"
-        
-        # Cost code cell (spans first 6 columns)
-        cost_code_width = sum(col_widths[:6])
-        self.cell(cost_code_width, 6, cost_code_text, 1, 0, 'L', 1)
+            progress = earned / budgeted * 100
         
-        # Rules of Credit step names
-        self.set_font('Arial', '', 7)
-        steps_list = cost_code.rule_of_credit.get_steps() if cost_code.rule_of_credit else []
-        
-        # Add up to 7 step names
-        for i in range(7):
-            if i < len(steps_list):
-                self.cell(col_widths[i+6], 6, steps_list[i]['name'], 1, 0, 'C', 1)
-            else:
-                self.cell(col_widths[i+6], 6, '', 1, 0, 'C', 1)
-        
-        self.ln()
-
-    def work_item_row(self, item):
-        # Set font
-        self.set_font('Arial', '', 9)
-        
-        # Calculate progress
-        progress = 0
-        if item.budgeted_man_hours and item.budgeted_man_hours > 0:
-            progress = (item.earned_man_hours or 0) / item.budgeted_man_hours * 100
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Handle text wrapping for description - ensure no text bleeds over cell lines
-        description = item.description
-        if len(description) > 50:  # Increased character limit for landscape
-            # Calculate how many lines we need
-            lines = len(description) // 50 + (1 if len(description) % 50 > 0 else 0)
-            row_height = 6 * lines  # Adjust row height based on number of lines
-        else:
-            row_height = 6
+        col_widths = COL_WIDTHS
         
         # Work item cells
-        self.cell(col_widths[0], row_height, str(item.work_item_id_str), 1, 0, 'L')
-        
-        # Multi-line cell for description
-        current_x = self.get_x()
-        current_y = self.get_y()
-        self.multi_cell(col_widths[1], row_height / (1 if len(description) <= 50 else lines), description, 1, 'L')
-        self.set_xy(current_x + col_widths[1], current_y)
-        
-        self.cell(col_widths[2], row_height, item.unit_of_measure or '', 1, 0, 'C')
-        self.cell(col_widths[3], row_height, f"{item.budgeted_man_hours or 0:.2f}", 1, 0, 'R')
-        self.cell(col_widths[4], row_height, f"{item.earned_man_hours or 0:.2f}", 1, 0, 'R')
-        self.cell(col_widths[5], row_height, f"{progress:.1f}%", 1, 0, 'R')
-        
-        # Rules of Credit progress steps
-        self.set_font('Arial', '', 7)
-        progress_data = item.get_steps_progress()
-        
-        # Get the rule of credit steps
-        steps = []
-        if item.cost_code and item.cost_code.rule_of_credit:
-            steps = item.cost_code.rule_of_credit.get_steps()
-        
-        for i in range(7):
-            if i < len(steps):
-                step_name = steps[i]['name']
-                progress_value = progress_data.get(step_name, 0)
-                self.cell(col_widths[i+6], row_height, f"{progress_value:.0f}%", 1, 0, 'C')
+        self.measured_cell(col_widths[0], row_height, row.work_item_id_str, 'L', ROW_TEXT)
+        
+        # Description: the pre-measured lines inside one border of the full row height
+        current_x = self.x
+        current_y = self.y
+        self.rect(current_x, current_y, col_widths[1], row_height)
+        baseline = current_y + DESCRIPTION_PADDING + 0.5 * DESCRIPTION_LINE_HEIGHT + 0.3 * self.font_size
+        for line in lines:
+            self.text(current_x + self.c_margin, baseline, line)
+            baseline += DESCRIPTION_LINE_HEIGHT
+        self.x = current_x + col_widths[1]
+        
+        self.measured_cell(col_widths[2], row_height, row.unit_of_measure, 'C', ROW_TEXT)
+        self.measured_cell(col_widths[3], row_height, f"{budgeted:.2f}", 'R', ROW_TEXT)
+        self.measured_cell(col_widths[4], row_height, f"{earned:.2f}", 'R', ROW_TEXT)
+        self.measured_cell(col_widths[5], row_height, f"{progress:.1f}%", 'R', ROW_TEXT)
+        
+        # Rules of Credit progress steps of the item's cost code
+        self.set_font(FONT_FAMILY, '', 7)
+        progress_data = row.step_progress
+        
+        for i in range(min(len(steps), STEP_COLUMNS)):
+            self.measured_cell(STEP_WIDTHS[i], row_height, f"{progress_data[i]:.0f}%", 'C', STEP_TEXT)
+        self.empty_step_cells(len(steps), row_height, 'D')
+        
+        self.ln(row_height)
+    
+    def measured_cell(self, width, height, text, align, measure):
+        """
+        Bordered single-line cell placed with the pre-computed text metrics
+        
+        Draws what cell(width, height, text, 1, 0, align) would, without its
+        per-call text layout; measure must match the current font.
+        """
+        self.rect(self.x, self.y, width, height)
+        if text:
+            if align == 'R':
+                text_x = self.x + width - self.c_margin - measure.width(text)
+            elif align == 'C':
+                text_x = self.x + (width - measure.width(text)) / 2
             else:
-                self.cell(col_widths[i+6], row_height, '', 1, 0, 'C')
-        
-        self.ln()
+                text_x = self.x + self.c_margin
+            self.text(text_x, self.y + 0.5 * height + 0.3 * self.font_size, text)
+        self.x += width
+    
+    def empty_step_cells(self, first, height, style):
+        # Unused step columns are bare rectangles; cell() would lay out empty text
+        for i in range(first, STEP_COLUMNS):
+            self.rect(self.x, self.y, STEP_WIDTHS[i], height, style)
+            self.x += STEP_WIDTHS[i]
 
     def total_row(self, title, budgeted, earned, is_grand_total=False):
         # Set font
-        self.set_font('Arial', 'B', 9)
+        self.set_font(FONT_FAMILY, 'B', 9)
         # Background color
         if is_grand_total:
             self.set_fill_color(200, 200, 200)
@@ -458,12 +275,10 @@ class HoursPDF(FPDF):
         if budgeted > 0:
             progress = (earned / budgeted) * 100
         
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
+        col_widths = COL_WIDTHS
         
         # Title spans first 3 columns
-        title_width = sum(col_widths[:3])
-        self.cell(title_width, 6, title, 1, 0, 'L', 1)
+        self.cell(TOTAL_TITLE_WIDTH, 6, title, 1, 0, 'L', 1)
         
         # Values
         self.cell(col_widths[3], 6, f"{budgeted:.2f}", 1, 0, 'R', 1)
@@ -471,301 +286,127 @@ class HoursPDF(FPDF):
         self.cell(col_widths[5], 6, f"{progress:.1f}%", 1, 0, 'R', 1)
         
         # Empty cells for Rules of Credit - use exact width to prevent overhang
-        rules_width = sum(col_widths[6:])
-        self.cell(rules_width, 6, '', 1, 1, 'C', 1)
+        self.cell(RULES_WIDTH, 6, '', 1, 1, 'C', 1)
 
 
-def generate_quantities_report_pdf(project_id=None, sub_job_id=None):
+def _render_report(pdf, dataset, output):
     """
-    Generate a PDF report for quantities data using FPDF2
+    Render a report dataset into a PDF and write it out
     
     Args:
-        project_id (int): Project ID to generate report for
-        sub_job_id (int): Sub Job ID to generate report for
+        pdf (ReportPDF): PDF with header fields set
+        dataset (ReportDataset): Report data
+        output: File path or binary file object, None to return the bytes
         
     Returns:
-        bytes: PDF file data
+        bytes: PDF file data when output is None
     """
-    from models import Project, SubJob, WorkItem, CostCode
-    
-    # Get data based on project_id or sub_job_id
-    if sub_job_id:
-        sub_job = SubJob.query.get_or_404(sub_job_id)
-        project = Project.query.get_or_404(sub_job.project_id)
-        work_items = WorkItem.query.filter_by(sub_job_id=sub_job_id).all()
-        # Store project and sub job information separately
-        project_name = project.name
-        sub_job_name = sub_job.name
-        sub_job_description = sub_job.description
-    elif project_id:
-        project = Project.query.get_or_404(project_id)
-        work_items = WorkItem.query.filter_by(project_id=project_id).all()
-        # Store project information
-        project_name = project.name
-        sub_job_name = None
-        sub_job_description = None
-    else:
-        raise ValueError("Either project_id or sub_job_id must be provided")
-    
-    # Group work items by discipline and cost code
-    grouped_items = {}
-    discipline_totals = {}
-    total_budgeted_quantity = 0
-    total_earned_quantity = 0
-    
-    for item in work_items:
-        if not item.cost_code:
-            continue
-            
-        discipline = item.cost_code.discipline
-        cost_code_id = item.cost_code_id
-        
-        # Initialize discipline if not exists
-        if discipline not in grouped_items:
-            grouped_items[discipline] = {}
-            discipline_totals[discipline] = {
-                'total_budgeted_quantity': 0,
-                'total_earned_quantity': 0
-            }
-        
-        # Initialize cost code if not exists
-        if cost_code_id not in grouped_items[discipline]:
-            grouped_items[discipline][cost_code_id] = {
-                'cost_code': item.cost_code,
-                'items': [],
-                'total_budgeted_quantity': 0,
-                'total_earned_quantity': 0
-            }
-        
-        # Add work item to group
-        grouped_items[discipline][cost_code_id]['items'].append(item)
-        
-        # Update totals
-        budgeted_quantity = item.budgeted_quantity or 0
-        earned_quantity = item.earned_quantity or 0
-        
-        grouped_items[discipline][cost_code_id]['total_budgeted_quantity'] += budgeted_quantity
-        grouped_items[discipline][cost_code_id]['total_earned_quantity'] += earned_quantity
-        
-        discipline_totals[discipline]['total_budgeted_quantity'] += budgeted_quantity
-        discipline_totals[discipline]['total_earned_quantity'] += earned_quantity
-        
-        total_budgeted_quantity += budgeted_quantity
-        total_earned_quantity += earned_quantity
-    
-    # Calculate overall progress
-    overall_progress = 0
-    if total_budgeted_quantity > 0:
-        overall_progress = (total_earned_quantity / total_budgeted_quantity) * 100
-    
-    # Create PDF
-    pdf = QuantitiesPDF()
-    pdf.project_name = project_name
-    pdf.overall_progress = overall_progress
-    
-    # Add sub job information if available
-    if sub_job_name:
-        pdf.sub_job_name = sub_job_name
-        pdf.sub_job_description = sub_job_description
+    report_type = pdf.report_type
     
     # Set up the PDF
-    pdf.set_auto_page_break(True, margin=15)
     pdf.add_page()
     
     # Add table header
     pdf.table_header()
     
-    # Add data rows
-    for discipline, cost_codes in grouped_items.items():
-        # Discipline header
-        pdf.discipline_row(discipline)
-        
-        for cost_code_id, data in cost_codes.items():
+    # Every row's height is measured before it is drawn, so a page break never
+    # splits a row, group headings are kept with their first work item, and
+    # the table header repeats at the top of every page. Rows are streamed;
+    # a group's first row is read before its heading to measure it.
+    for discipline, cost_codes in dataset.disciplines():
+        first_cost_code = True
+        for cost_code, rows in cost_codes:
+            first_row = next(rows)
+            lines = pdf.description_lines(first_row.description)
+            if first_cost_code:
+                pdf.ensure_space(2 * ROW_HEIGHT + pdf.row_height(lines))
+                pdf.discipline_row(discipline.name or '')
+                first_cost_code = False
             # Cost code row with Rules of Credit steps
-            pdf.cost_code_row(data['cost_code'], data['cost_code'].rule_of_credit.get_steps() if data['cost_code'].rule_of_credit else [])
-            
-            # Work items
-            for item in data['items']:
-                pdf.work_item_row(item)
-            
-            # Cost code total
+            pdf.ensure_space(ROW_HEIGHT + pdf.row_height(lines))
+            pdf.cost_code_row(cost_code)
+            for row in chain((first_row,), rows):
+                if row is not first_row:
+                    lines = pdf.description_lines(row.description)
+                row_height = pdf.row_height(lines)
+                pdf.ensure_space(row_height, cost_code)
+                pdf.work_item_row(row, cost_code.steps, lines, row_height)
+            pdf.ensure_space(ROW_HEIGHT, cost_code)
             pdf.total_row(
                 'Cost Code Total',
-                data['total_budgeted_quantity'],
-                data['total_earned_quantity']
+                getattr(cost_code.totals, report_type.budgeted_field),
+                getattr(cost_code.totals, report_type.earned_field)
             )
-        
-        # Discipline total
+        pdf.ensure_space(ROW_HEIGHT)
         pdf.total_row(
             'Discipline Total',
-            discipline_totals[discipline]['total_budgeted_quantity'],
-            discipline_totals[discipline]['total_earned_quantity']
+            getattr(discipline.totals, report_type.budgeted_field),
+            getattr(discipline.totals, report_type.earned_field)
         )
-    
-    # Grand total
+    pdf.ensure_space(ROW_HEIGHT)
     pdf.total_row(
         'Grand Total',
-        total_budgeted_quantity,
-        total_earned_quantity,
+        getattr(dataset.totals, report_type.budgeted_field),
+        getattr(dataset.totals, report_type.earned_field),
         is_grand_total=True
     )
     
-    # Create a BytesIO object to store the PDF data
-    pdf_buffer = io.BytesIO()
+    # Write straight to the destination instead of copying through a BytesIO
+    if output is None:
+        return bytes(pdf.output())
+    pdf.output(output)
+    return None
+
+
+def render_pdf(dataset, report_type, output=None):
+    """
+    Render a report dataset as a PDF using FPDF2
     
-    # Output PDF to the BytesIO buffer
-    pdf.output(pdf_buffer)
+    Args:
+        dataset (ReportDataset): Report data
+        report_type (ReportType): Titles and columns of the report
+        output: File path or binary file object to write the PDF to
+        
+    Returns:
+        bytes: PDF file data, or None when written to output
+    """
+    pdf = ReportPDF(report_type)
+    pdf.project_name = dataset.project_name
+    pdf.overall_progress = dataset.ratio(dataset.totals, report_type) * 100
     
-    # Reset buffer position to the beginning
-    pdf_buffer.seek(0)
+    # Add sub job information if available
+    if dataset.sub_job_id:
+        pdf.sub_job_name = dataset.sub_job_name
+        pdf.sub_job_description = dataset.sub_job_description
     
-    # Return the BytesIO object containing the PDF data
-    return pdf_buffer.getvalue()
+    return _render_report(pdf, dataset, output)
 
 
-def generate_hours_report_pdf(project_id=None, sub_job_id=None):
+def generate_quantities_report_pdf(project_id=None, sub_job_id=None, output=None):
     """
-    Generate a PDF report for hours data using FPDF2
+    Generate a PDF report for quantities data using FPDF2
     
     Args:
         project_id (int): Project ID to generate report for
         sub_job_id (int): Sub Job ID to generate report for
+        output: File path or binary file object to write the PDF to
         
     Returns:
-        bytes: PDF file data
+        bytes: PDF file data, or None when written to output
     """
-    from models import Project, SubJob, WorkItem, CostCode
-    
-    # Get data based on project_id or sub_job_id
-    if sub_job_id:
-        sub_job = SubJob.query.get_or_404(sub_job_id)
-        project = Project.query.get_or_404(sub_job.project_id)
-        work_items = WorkItem.query.filter_by(sub_job_id=sub_job_id).all()
-        # Store project and sub job information separately
-        project_name = project.name
-        sub_job_name = sub_job.name
-        sub_job_description = sub_job.description
-    elif project_id:
-        project = Project.query.get_or_404(project_id)
-        work_items = WorkItem.query.filter_by(project_id=project_id).all()
-        # Store project information
-        project_name = project.name
-        sub_job_name = None
-        sub_job_description = None
-    else:
-        raise ValueError("Either project_id or sub_job_id must be provided")
-    
-    # Group work items by discipline and cost code
-    grouped_items = {}
-    discipline_totals = {}
-    total_budgeted_hours = 0
-    total_earned_hours = 0
-    
-    for item in work_items:
-        if not item.cost_code:
-            continue
-            
-        discipline = item.cost_code.discipline
-        cost_code_id = item.cost_code_id
-        
-        # Initialize discipline if not exists
-        if discipline not in grouped_items:
-            grouped_items[discipline] = {}
-            discipline_totals[discipline] = {
-                'total_budgeted_hours': 0,
-                'total_earned_hours': 0
-            }
-        
-        # Initialize cost code if not exists
-        if cost_code_id not in grouped_items[discipline]:
-            grouped_items[discipline][cost_code_id] = {
-                'cost_code': item.cost_code,
-                'items': [],
-                'total_budgeted_hours': 0,
-                'total_earned_hours': 0
-            }
-        
-        # Add work item to group
-        grouped_items[discipline][cost_code_id]['items'].append(item)
-        
-        # Update totals
-        budgeted_hours = item.budgeted_man_hours or 0
-        earned_hours = item.earned_man_hours or 0
-        
-        grouped_items[discipline][cost_code_id]['total_budgeted_hours'] += budgeted_hours
-        grouped_items[discipline][cost_code_id]['total_earned_hours'] += earned_hours
-        
-        discipline_totals[discipline]['total_budgeted_hours'] += budgeted_hours
-        discipline_totals[discipline]['total_earned_hours'] += earned_hours
-        
-        total_budgeted_hours += budgeted_hours
-        total_earned_hours += earned_hours
-    
-    # Calculate overall progress
-    overall_progress = 0
-    if total_budgeted_hours > 0:
-        overall_progress = (total_earned_hours / total_budgeted_hours) * 100
-    
-    # Create PDF
-    pdf = HoursPDF()
-    pdf.project_name = project_name
-    pdf.overall_progress = overall_progress
-    
-    # Add sub job information if available
-    if sub_job_name:
-        pdf.sub_job_name = sub_job_name
-        pdf.sub_job_description = sub_job_description
-    
-    # Set up the PDF
-    pdf.set_auto_page_break(True, margin=15)
-    pdf.add_page()
-    
-    # Add table header
-    pdf.table_header()
+    return render_pdf(get_report_dataset(project_id, sub_job_id), REPORT_TYPES['quantities'], output)
+
+
+def generate_hours_report_pdf(project_id=None, sub_job_id=None, output=None):
+    """
+    Generate a PDF report for hours data using FPDF2
     
-    # Add data rows
-    for discipline, cost_codes in grouped_items.items():
-        # Discipline header
-        pdf.discipline_row(discipline)
-        
-        for cost_code_id, data in cost_codes.items():
-            # Cost code row with Rules of Credit steps
-            pdf.cost_code_row(data['cost_code'], data['cost_code'].rule_of_credit.get_steps() if data['cost_code'].rule_of_credit else [])
-            
-            # Work items
-            for item in data['items']:
-                pdf.work_item_row(item)
-            
-            # Cost code total
-            pdf.total_row(
-                'Cost Code Total',
-                data['total_budgeted_hours'],
-                data['total_earned_hours']
-            )
+    Args:
+        project_id (int): Project ID to generate report for
+        sub_job_id (int): Sub Job ID to generate report for
+        output: File path or binary file object to write the PDF to
         
-        # Discipline total
-        pdf.total_row(
-            'Discipline Total',
-            discipline_totals[discipline]['total_budgeted_hours'],
-            discipline_totals[discipline]['total_earned_hours']
-        )
-    
-    # Grand total
-    pdf.total_row(
-        'Grand Total',
-        total_budgeted_hours,
-        total_earned_hours,
-        is_grand_total=True
-    )
-    
-    # Create a BytesIO object to store the PDF data
-    pdf_buffer = io.BytesIO()
-    
-    # Output PDF to the BytesIO buffer
-    pdf.output(pdf_buffer)
-    
-    # Reset buffer position to the beginning
-    pdf_buffer.seek(0)
-    
-    # Return the BytesIO object containing the PDF data
-    return pdf_buffer.getvalue()
+    Returns:
+        bytes: PDF file data, or None when written to output
+    """
+    return render_pdf(get_report_dataset(project_id, sub_job_id), REPORT_TYPES['hours'], output)
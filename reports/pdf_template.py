@@ -0,0 +1,160 @@
+"""
+PDF report template for Magellan EV Tracker v3.0
+- Everything on a report page that does not depend on the data is prepared
+  once per process and shared by every ReportPDF:
+  - the logo file, read once instead of looked up and read on every page
+  - the fonts: core Helvetica, which fpdf2 otherwise substitutes for Arial
+    (with a warning) on every font change
+  - the table geometry: column widths, spans, x positions and row heights
+- TextMeasure wraps text with the core font metrics and caches word widths,
+  so a row's height is known before anything is drawn
+- Benchmark: benchmarks/pdf_report_pages.py
+"""
+from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+import logging
+import os
+import threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'images', 'Fortis.png')
+
+# Core font used by every report; Arial in a core-font PDF is Helvetica
+FONT_FAMILY = 'helvetica'
+
+# Landscape column widths: work item, description, UOM, budgeted, earned, % complete, 7 rule steps
+COL_WIDTHS = (25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15)
+
+# Columns before the Rules of Credit step columns
+FIXED_COLUMNS = 6
+STEP_COLUMNS = len(COL_WIDTHS) - FIXED_COLUMNS
+
+TABLE_WIDTH = sum(COL_WIDTHS)
+COST_CODE_WIDTH = sum(COL_WIDTHS[:FIXED_COLUMNS])
+TOTAL_TITLE_WIDTH = sum(COL_WIDTHS[:3])
+RULES_WIDTH = sum(COL_WIDTHS[FIXED_COLUMNS:])
+STEP_WIDTHS = COL_WIDTHS[FIXED_COLUMNS:]
+
+# Row heights in mm: single-line rows, and wrapped description lines with their top/bottom padding
+ROW_HEIGHT = 6
+DESCRIPTION_LINE_HEIGHT = 4.5
+DESCRIPTION_PADDING = 0.75
+
+# Page space kept free for the footer
+BOTTOM_MARGIN = 15
+
+# Word widths cached per TextMeasure before the cache is reset
+MAX_CACHED_WORDS = 20000
+
+_MISSING = object()
+
+
+class TextMeasure:
+    """
+    Word wrapping with the metrics of a core font at a fixed size
+
+    Gives the same widths as FPDF.get_string_width, without building text
+    fragments per call; widths of repeated words come from a cache.
+    """
+
+    def __init__(self, font_key, size_pt):
+        self._char_widths = CORE_FONTS_CHARWIDTHS[font_key]
+        # Glyph widths are in 1/1000 em; convert to mm at this size
+        self._scale = size_pt / 1000 * 25.4 / 72
+        self._space = self._char_widths[' '] * self._scale
+        self._words = {}
+
+    def width(self, text):
+        """Width of a string in mm"""
+        width = self._words.get(text)
+        if width is None:
+            char_widths = self._char_widths
+            width = sum(char_widths.get(char, 0) for char in text) * self._scale
+            if len(self._words) >= MAX_CACHED_WORDS:
+                self._words.clear()
+            self._words[text] = width
+        return width
+
+    def wrap(self, text, max_width):
+        """
+        Break text into lines no wider than max_width
+
+        Lines break between words and at newlines; a word wider than a whole
+        line is split between characters.
+
+        Args:
+            text (str): Text, may be None
+            max_width (float): Line width in mm
+
+        Returns:
+            list: Lines, empty for empty text
+        """
+        lines = []
+        for paragraph in (text or '').split('\n'):
+            line = ''
+            line_width = 0.0
+            for word in paragraph.split():
+                word_width = self.width(word)
+                if line and line_width + self._space + word_width <= max_width:
+                    line += ' ' + word
+                    line_width += self._space + word_width
+                    continue
+                if line:
+                    lines.append(line)
+                while word_width > max_width and len(word) > 1:
+                    head = self._split_word(word, max_width)
+                    lines.append(head)
+                    word = word[len(head):]
+                    word_width = self.width(word)
+                line, line_width = word, word_width
+            if line:
+                lines.append(line)
+        return lines
+
+    def _split_word(self, word, max_width):
+        # Longest prefix (at least one character) that fits
+        width = 0.0
+        for end, char in enumerate(word):
+            width += self._char_widths.get(char, 0) * self._scale
+            if width > max_width:
+                return word[:max(end, 1)]
+        return word
+
+
+class ReportTemplate:
+    """
+    Process-wide cache of the report page resources
+    """
+    _lock = threading.Lock()
+    _logo = _MISSING
+
+    @classmethod
+    def logo(cls):
+        """
+        Get the contents of the logo file
+
+        Draw it with pdf.image(io.BytesIO(logo), ...); fpdf2 parses it on the
+        first page of each document and reuses it on the other pages.
+
+        Returns:
+            bytes: Image file data, or None without a logo file
+        """
+        if cls._logo is _MISSING:
+            with cls._lock:
+                if cls._logo is _MISSING:
+                    logo = None
+                    if os.path.exists(LOGO_PATH):
+                        try:
+                            with open(LOGO_PATH, 'rb') as logo_file:
+                                logo = logo_file.read()
+                        except Exception as e:
+                            logger.error(f"Error loading report logo {LOGO_PATH}: {str(e)}")
+                    cls._logo = logo
+        return cls._logo
+
+    @classmethod
+    def reset(cls):
+        """Forget the cached logo, e.g. after the file was replaced"""
+        with cls._lock:
+            cls._logo = _MISSING
@@ -0,0 +1,365 @@
+"""
+Batch report export for Magellan EV Tracker v3.0
+- Renders the hours/quantities reports of every project and sub job (or of
+  chosen projects) on a pool of worker processes and writes them straight
+  into one zip archive, e.g. for the month-end export
+- One task is one project or sub job; each of its reports streams its rows,
+  so a worker's memory does not grow with the size of the project; workers
+  are also replaced after REPORT_BATCH_TASKS_PER_WORKER tasks
+- Workers open their own read-only database connection (SQLite mode=ro, a
+  read-only default transaction on PostgreSQL) and write each report to a
+  scratch file that the coordinator moves into the archive and deletes
+- Progress is recorded on the report_batch row while the batch runs
+- Like report jobs, pending batches record their owner process and a heartbeat;
+  batches of a process that stopped beating are marked failed by a live one
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from flask import Flask
+from models import db, Project, SubJob, ReportBatch
+from reports.report_dataset import REPORT_TYPES
+from reports.report_jobs import REPORT_RENDERERS, OwnerHeartbeat, generate_report, process_owner
+from werkzeug.utils import secure_filename
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+import zipfile
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_TASKS_PER_WORKER = 50
+
+# Errors kept on a batch; the rest are only counted
+MAX_BATCH_ERRORS = 20
+
+# Formats that are already compressed are stored in the zip as they are
+STORED_FORMATS = {'pdf', 'xlsx'}
+
+# A project (sub_job_id None) or sub job to render, with its folder and file name prefix in the archive
+BatchScope = namedtuple('BatchScope', ['project_id', 'sub_job_id', 'folder', 'name'])
+
+
+def batch_scopes(project_ids=None):
+    """
+    List the projects and sub jobs of a batch
+
+    Args:
+        project_ids (list, optional): Project IDs; every project when not given
+
+    Returns:
+        list: BatchScope per project followed by its sub jobs
+    """
+    projects = Project.query.order_by(Project.id)
+    sub_jobs = SubJob.query.order_by(SubJob.project_id, SubJob.id)
+    if project_ids:
+        projects = projects.filter(Project.id.in_(project_ids))
+        sub_jobs = sub_jobs.filter(SubJob.project_id.in_(project_ids))
+
+    sub_jobs_by_project = {}
+    for sub_job in sub_jobs.with_entities(SubJob.id, SubJob.project_id, SubJob.sub_job_id_str):
+        sub_jobs_by_project.setdefault(sub_job.project_id, []).append(sub_job)
+
+    scopes = []
+    for project in projects.with_entities(Project.id, Project.project_id_str):
+        folder = f"{project.id}_{secure_filename(project.project_id_str or '')}".rstrip('_')
+        scopes.append(BatchScope(project.id, None, folder, 'project'))
+        for sub_job in sub_jobs_by_project.get(project.id, []):
+            name = f"sub_job_{sub_job.id}_{secure_filename(sub_job.sub_job_id_str or '')}".rstrip('_')
+            scopes.append(BatchScope(project.id, sub_job.id, folder, name))
+    return scopes
+
+
+def read_only_database(engine):
+    """
+    Connection settings for a read-only copy of an engine's database
+
+    Args:
+        engine: SQLAlchemy engine of the app
+
+    Returns:
+        tuple: (database URI, engine options)
+    """
+    url = engine.url
+    if url.get_backend_name() == 'sqlite':
+        if not url.database or url.database == ':memory:':
+            raise ValueError("Batch export needs a database file or server, not an in-memory database")
+        path = url.database[5:] if url.database.startswith('file:') else url.database
+        return f"sqlite:///file:{os.path.abspath(path)}?mode=ro&uri=true", {'connect_args': {'timeout': 30}}
+    options = {'pool_size': 1, 'max_overflow': 0, 'pool_pre_ping': True}
+    if url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': '-c default_transaction_read_only=on'}
+    return url.render_as_string(hide_password=False), options
+
+
+def _init_worker(database_uri, engine_options):
+    # Each worker process gets a minimal app bound to its own read-only connection
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    app.app_context().push()
+
+
+def _render_scope(scope, report_types, file_formats, work_dir):
+    """
+    Render every requested report of one project or sub job (runs in a worker)
+
+    Returns:
+        tuple: ([(archive name, scratch file path)], [error message])
+    """
+    files = []
+    errors = []
+    try:
+        for report_type in report_types:
+            for file_format in file_formats:
+                archive_name = f"{scope.folder}/{scope.name}_{report_type}.{file_format}"
+                path = os.path.join(work_dir, f"{uuid.uuid4().hex}.{file_format}")
+                try:
+                    with open(path, 'wb') as report_file:
+                        generate_report(report_type, file_format, scope.project_id, scope.sub_job_id, report_file)
+                    files.append((archive_name, path))
+                except Exception as e:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    errors.append(f"{archive_name}: {str(e)}")
+    finally:
+        db.session.remove()
+    return files, errors
+
+
+def _check_batch(report_types, file_formats):
+    for report_type in report_types:
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type: {report_type}")
+    for file_format in file_formats:
+        if file_format not in REPORT_RENDERERS:
+            raise ValueError(f"Unknown report format: {file_format}")
+    if not report_types or not file_formats:
+        raise ValueError("At least one report type and file format are required")
+
+
+def run_report_batch(archive_path, report_types, file_formats, project_ids=None, workers=None,
+                     tasks_per_worker=DEFAULT_TASKS_PER_WORKER, progress=None):
+    """
+    Render a batch of reports on a process pool into a zip archive
+
+    Must run inside an app context. The archive is written under a temporary
+    name and renamed when complete.
+
+    Args:
+        archive_path (str): Path of the zip archive to write
+        report_types (list): Keys of REPORT_TYPES
+        file_formats (list): Keys of REPORT_RENDERERS
+        project_ids (list, optional): Project IDs; every project when not given
+        workers (int, optional): Worker processes
+        tasks_per_worker (int): Projects/sub jobs a worker renders before it is replaced
+        progress (callable, optional): Called as progress(completed, failed, total)
+            after each project or sub job
+
+    Returns:
+        dict: scopes, reports, failed, errors and seconds
+    """
+    _check_batch(report_types, file_formats)
+    started = time.perf_counter()
+    scopes = batch_scopes(project_ids)
+    database_uri, engine_options = read_only_database(db.engine)
+    workers = max(1, min(workers or DEFAULT_BATCH_WORKERS, len(scopes) or 1))
+    # Release the coordinator's connection; workers open their own
+    db.session.remove()
+
+    if progress:
+        progress(0, 0, len(scopes))
+
+    archive_dir = os.path.dirname(os.path.abspath(archive_path))
+    os.makedirs(archive_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='report_batch_', dir=archive_dir)
+    partial_path = f"{archive_path}.{uuid.uuid4().hex}.part"
+
+    # Spawned workers do not inherit the coordinator's threads, locks or connections
+    pool_options = {
+        'max_workers': workers,
+        'mp_context': multiprocessing.get_context('spawn'),
+        'initializer': _init_worker,
+        'initargs': (database_uri, engine_options)
+    }
+    if sys.version_info >= (3, 11):
+        pool_options['max_tasks_per_child'] = tasks_per_worker
+
+    completed = failed = reports = 0
+    errors = []
+    try:
+        with zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_DEFLATED) as archive, \
+                ProcessPoolExecutor(**pool_options) as executor:
+            futures = [
+                executor.submit(_render_scope, scope, report_types, file_formats, work_dir)
+                for scope in scopes
+            ]
+            for future in as_completed(futures):
+                try:
+                    files, scope_errors = future.result()
+                except Exception as e:
+                    files, scope_errors = [], [str(e)]
+                for archive_name, path in files:
+                    compress_type = zipfile.ZIP_STORED if archive_name.rsplit('.', 1)[-1] in STORED_FORMATS else zipfile.ZIP_DEFLATED
+                    archive.write(path, archive_name, compress_type=compress_type)
+                    os.remove(path)
+                reports += len(files)
+                completed += 1
+                if scope_errors:
+                    failed += 1
+                    errors.extend(scope_errors[:MAX_BATCH_ERRORS - len(errors)])
+                if progress:
+                    progress(completed, failed, len(scopes))
+        os.replace(partial_path, archive_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    seconds = time.perf_counter() - started
+    logger.info(f"Exported {reports} reports for {len(scopes)} projects/sub jobs to {archive_path} "
+                f"in {seconds:.1f}s with {workers} workers ({failed} failed)")
+    return {'scopes': len(scopes), 'reports': reports, 'failed': failed, 'errors': errors, 'seconds': seconds}
+
+
+class ReportBatchQueue:
+    """
+    Runs batch exports one at a time off the request thread
+
+    Configuration:
+        REPORT_BATCH_WORKERS: Worker processes per batch (default min(4, CPUs))
+        REPORT_BATCH_TASKS_PER_WORKER: Projects/sub jobs per worker process before it is replaced (default 50)
+        REPORT_BATCH_DIR: Archive directory (default <instance>/report_batches)
+        REPORT_HEARTBEAT_SECONDS: Seconds between heartbeats of pending batches (default 30)
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.archive_dir = None
+        self._executor = None
+        # Batches cut off by a stopped process are marked failed rather than silently rerun
+        self._heartbeat = OwnerHeartbeat(
+            ReportBatch,
+            lambda now: {'status': 'failed', 'error': 'Interrupted by a restart', 'finished_at': now},
+            name='report-batch-heartbeat'
+        )
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Bind the queue to a Flask app
+
+        Args:
+            app: Flask application instance
+        """
+        self.app = app
+        self.archive_dir = app.config.get('REPORT_BATCH_DIR') or os.path.join(app.instance_path, 'report_batches')
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-batch')
+        self._heartbeat.init_app(app)
+        app.extensions['report_batches'] = self
+
+    def archive_path(self, batch_id):
+        """Path of the zip archive of a batch"""
+        return os.path.join(self.archive_dir, f"{batch_id}.zip")
+
+    def submit(self, report_types, file_formats, project_ids=None):
+        """
+        Queue a batch export
+
+        Args:
+            report_types (list): Keys of REPORT_TYPES
+            file_formats (list): Keys of REPORT_RENDERERS
+            project_ids (list, optional): Project IDs; every project when not given
+
+        Returns:
+            ReportBatch: New batch
+        """
+        _check_batch(report_types, file_formats)
+        self._heartbeat.start()
+        try:
+            batch = ReportBatch(
+                id=uuid.uuid4().hex,
+                report_types=",".join(report_types),
+                file_formats=",".join(file_formats),
+                project_ids=",".join(str(project_id) for project_id in project_ids) if project_ids else None,
+                status='queued',
+                owner=process_owner(),
+                heartbeat_at=datetime.utcnow()
+            )
+            db.session.add(batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error queuing report batch: {str(e)}")
+            raise
+
+        self._executor.submit(self._run, batch.id)
+        logger.info(f"Queued report batch {batch.id}: {batch.report_types} as {batch.file_formats}")
+        return batch
+
+    def get_batch(self, batch_id):
+        """
+        Get a batch by ID
+
+        Args:
+            batch_id (str): Batch ID
+
+        Returns:
+            ReportBatch: Batch or None if not found
+        """
+        # Clients poll here, so batches of a stopped process are marked failed even without new submissions
+        self._heartbeat.start()
+        return db.session.get(ReportBatch, batch_id)
+
+    def _run(self, batch_id):
+        with self.app.app_context():
+            batch = db.session.get(ReportBatch, batch_id)
+            if batch is None or batch.status != 'queued':
+                return
+            batch.status = 'running'
+            db.session.commit()
+            report_types = batch.report_types.split(",")
+            file_formats = batch.file_formats.split(",")
+            project_ids = [int(project_id) for project_id in batch.project_ids.split(",")] if batch.project_ids else None
+
+            def record_progress(completed, failed, total):
+                db.session.execute(
+                    db.update(ReportBatch).where(ReportBatch.id == batch_id)
+                    .values(completed=completed, failed=failed, total=total)
+                )
+                db.session.commit()
+
+            status, error = 'done', None
+            try:
+                result = run_report_batch(
+                    self.archive_path(batch_id), report_types, file_formats, project_ids,
+                    workers=self.app.config.get('REPORT_BATCH_WORKERS'),
+                    tasks_per_worker=self.app.config.get('REPORT_BATCH_TASKS_PER_WORKER', DEFAULT_TASKS_PER_WORKER),
+                    progress=record_progress
+                )
+                if result['errors']:
+                    error = "\n".join(result['errors'])
+            except Exception as e:
+                db.session.rollback()
+                status, error = 'failed', str(e)
+                logger.error(f"Error running report batch {batch_id}: {str(e)}")
+
+            batch = db.session.get(ReportBatch, batch_id)
+            batch.status = status
+            batch.error = error
+            batch.finished_at = datetime.utcnow()
+            db.session.commit()
+
+
+# Shared queue, bound to the app in simple_app.py
+report_batches = ReportBatchQueue()
@@ -0,0 +1,161 @@
+"""
+Report dataset for Magellan EV Tracker v3.0
+- One report dataset per project or sub job feeds every report format
+  (PDF, XLSX, CSV, JSON) through the same grouped row stream
+- The dataset holds only what a report needs before its first row: the
+  header, the cost codes with their rule steps and the grand totals
+- Work items are streamed from the ordered report query (reports.report_rows)
+  and grouped by discipline and cost code as they are read, with subtotals
+  added up as the rows go by, so memory does not grow with the project
+- Nothing is cached across requests; finished reports are cached as
+  artifacts by reports.report_jobs
+"""
+from collections import namedtuple
+from itertools import groupby
+from operator import itemgetter
+from models import Project, SubJob
+from reports.report_rows import iter_report_items, load_report_cost_codes, load_report_totals, ReportTotals
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Titles, column labels and row fields of a report type
+ReportType = namedtuple('ReportType', ['title', 'budgeted_label', 'earned_label', 'budgeted_field', 'earned_field'])
+
+REPORT_TYPES = {
+    'quantities': ReportType('Quantity Report', 'Budgeted Quantity', 'Earned Quantity',
+                             'budgeted_quantity', 'earned_quantity'),
+    'hours': ReportType('Hours Report', 'Budgeted Hours', 'Earned Hours',
+                        'budgeted_hours', 'earned_hours')
+}
+
+# Work item row of a report; step_progress holds its percentages in the order of its cost code's steps
+ReportRow = namedtuple('ReportRow', [
+    'work_item_id_str', 'description', 'unit_of_measure',
+    'budgeted_quantity', 'earned_quantity', 'budgeted_hours', 'earned_hours', 'step_progress'
+])
+
+
+class ReportGroup:
+    """
+    Discipline or cost code of a report with its subtotals
+
+    The totals are complete once the group's rows have been read.
+    """
+    __slots__ = ('name', 'description', 'steps', 'totals')
+
+    def __init__(self, name, description=None, steps=()):
+        self.name = name
+        self.description = description
+        self.steps = steps
+        self.totals = ReportTotals()
+
+    @property
+    def label(self):
+        """Row label, e.g. 'CC-100 - Excavation' for a cost code"""
+        return f"{self.name} - {self.description}" if self.description is not None else (self.name or '')
+
+
+class ReportDataset:
+    """
+    Header, cost codes and grand totals of a project or sub job report
+
+    The work items are read by disciplines(), grouped like itertools.groupby:
+
+        for discipline, cost_codes in dataset.disciplines():
+            for cost_code, rows in cost_codes:
+                for row in rows:
+                    ...
+
+    Each level must be read in order, and a group's totals are complete once
+    its rows have been read.
+    """
+
+    def __init__(self, project, sub_job=None, cost_codes=None, totals=None):
+        self.project_id = project.id
+        self.project_name = project.name
+        self.sub_job_id = sub_job.id if sub_job else None
+        self.sub_job_name = sub_job.name if sub_job else None
+        self.sub_job_description = sub_job.description if sub_job else None
+        # Cost code ID -> (CostCode, tuple of RuleStep)
+        self.cost_codes = cost_codes if cost_codes is not None else {}
+        self.totals = totals if totals is not None else ReportTotals()
+
+    @property
+    def max_steps(self):
+        """Largest number of rule steps of any cost code in the report"""
+        return max((len(steps) for _, steps in self.cost_codes.values()), default=0)
+
+    @staticmethod
+    def ratio(totals, report_type):
+        """Earned / budgeted of some totals for a report type, 0 without a budget"""
+        budgeted = getattr(totals, report_type.budgeted_field)
+        return getattr(totals, report_type.earned_field) / budgeted if budgeted > 0 else 0
+
+    def iter_items(self):
+        """Stream the (discipline, cost code ID, ReportItem) tuples of the report in order"""
+        return iter_report_items(self.project_id, self.sub_job_id)
+
+    def disciplines(self):
+        """
+        Stream the report grouped by discipline and cost code
+
+        Yields:
+            tuple: (discipline ReportGroup, iterator of (cost code ReportGroup, iterator of ReportRow))
+        """
+        for discipline_name, items in groupby(self.iter_items(), key=itemgetter(0)):
+            discipline = ReportGroup(discipline_name)
+            yield discipline, self._cost_codes(discipline, items)
+
+    def _cost_codes(self, discipline, items):
+        for cost_code_id, cost_code_items in groupby(items, key=itemgetter(1)):
+            cost_code_row, steps = self.cost_codes[cost_code_id]
+            cost_code = ReportGroup(cost_code_row.cost_code_id_str, cost_code_row.description, steps)
+            yield cost_code, self._rows(discipline, cost_code, cost_code_items)
+
+    @staticmethod
+    def _rows(discipline, cost_code, items):
+        steps = cost_code.steps
+        for _, _, item in items:
+            values = (
+                item.budgeted_quantity or 0.0, item.earned_quantity or 0.0,
+                item.budgeted_man_hours or 0.0, item.earned_man_hours or 0.0
+            )
+            cost_code.totals.add(*values)
+            discipline.totals.add(*values)
+            yield ReportRow(
+                str(item.work_item_id_str), item.description or '', item.unit_of_measure or '', *values,
+                tuple(item.steps_progress.get(step.name, 0) for step in steps)
+            )
+
+
+def get_report_dataset(project_id=None, sub_job_id=None):
+    """
+    Get the report dataset of a project or sub job
+
+    Reads the header, the cost codes and the grand totals; the work items are
+    streamed when the report is rendered.
+
+    Args:
+        project_id (int): Project ID, used when sub_job_id is not given
+        sub_job_id (int, optional): Sub Job ID
+
+    Returns:
+        ReportDataset: Dataset over the current data
+    """
+    if sub_job_id:
+        sub_job = SubJob.query.get_or_404(sub_job_id)
+        project_id = sub_job.project_id
+    elif project_id:
+        sub_job = None
+    else:
+        raise ValueError("Either project_id or sub_job_id must be provided")
+
+    project = Project.query.get_or_404(project_id)
+    return ReportDataset(
+        project,
+        sub_job,
+        cost_codes=load_report_cost_codes(project_id, sub_job_id),
+        totals=load_report_totals(project_id, sub_job_id)
+    )
@@ -0,0 +1,416 @@
+"""
+Background report job queue for Magellan EV Tracker v3.0
+- Generates hours and quantities reports (PDF, XLSX, CSV or JSON) on a local thread
+  pool, off the request thread, with jobs tracked in the report_job table (no external broker)
+- Every format is rendered from the same streamed report rows (reports.report_dataset)
+- Finished files are stored on disk under a cache key derived from the project's
+  data revision, so unchanged data is served straight from the artifact
+- Artifacts live in one directory per report type and project or sub job; writing
+  a new artifact deletes the superseded ones of the same report and format
+- Identical requests share one queued or running job
+- Every pending job records the process that owns it, which refreshes its
+  heartbeat; jobs whose owner stopped beating (e.g. a restarted gunicorn
+  worker) are claimed and queued again by one live process
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from models import db, ReportJob
+from reports.report_dataset import REPORT_TYPES, get_report_dataset
+from reports.pdf_export import render_pdf
+from reports.excel_export import render_xlsx
+from reports.data_export import render_csv, render_json
+from services.revision_service import RevisionService
+from sqlalchemy import or_, select, update
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# File format -> renderer writing a (ReportDataset, ReportType) to a file
+REPORT_RENDERERS = {
+    'pdf': render_pdf,
+    'xlsx': render_xlsx,
+    'csv': render_csv,
+    'json': render_json
+}
+
+REPORT_MIMETYPES = {
+    'pdf': 'application/pdf',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'json': 'application/json'
+}
+
+DEFAULT_REPORT_WORKERS = 2
+
+# Part of every cache key; bump when a report layout changes so old artifacts are not served
+REPORT_FORMAT_VERSION = 3
+
+# Statuses of jobs that still have an owning process
+PENDING_STATUSES = ('queued', 'running')
+
+# Owners refresh their pending jobs every REPORT_HEARTBEAT_SECONDS; a pending job
+# whose heartbeat is STALE_HEARTBEATS intervals old belongs to a process that is gone
+DEFAULT_HEARTBEAT_SECONDS = 30
+STALE_HEARTBEATS = 4
+
+# (PID, owner tag) of the current process, renewed after a fork
+_process_owner = None
+
+
+def process_owner():
+    """
+    Owner tag of the current process
+
+    Host, PID and a random suffix, so a restarted worker that reuses a PID
+    does not take over the jobs of its predecessor.
+
+    Returns:
+        str: Owner tag
+    """
+    global _process_owner
+    pid = os.getpid()
+    if _process_owner is None or _process_owner[0] != pid:
+        _process_owner = (pid, f"{socket.gethostname()[:60]}:{pid}:{uuid.uuid4().hex[:8]}")
+    return _process_owner[1]
+
+
+def generate_report(report_type, file_format, project_id=None, sub_job_id=None, output=None):
+    """
+    Render a report over the current data
+
+    Args:
+        report_type (str): Key of REPORT_TYPES
+        file_format (str): Key of REPORT_RENDERERS
+        project_id (int): Project ID, used when sub_job_id is not given
+        sub_job_id (int, optional): Sub Job ID
+        output: File path or binary file object
+    """
+    dataset = get_report_dataset(project_id, sub_job_id)
+    REPORT_RENDERERS[file_format](dataset, REPORT_TYPES[report_type], output)
+
+
+class OwnerHeartbeat:
+    """
+    Background thread that keeps the pending rows of a job table alive for the
+    process that owns them and claims the rows of owners that stopped beating
+
+    Args:
+        model: Job model with status, owner and heartbeat_at columns
+        claim_values (callable): Called with the claim time; returns the column
+            values set on each claimed row
+        on_claim (callable, optional): Called with each claimed row ID after commit
+        name (str): Thread name
+    """
+
+    def __init__(self, model, claim_values, on_claim=None, name='job-heartbeat'):
+        self.model = model
+        self.claim_values = claim_values
+        self.on_claim = on_claim
+        self.name = name
+        self.app = None
+        self.interval = DEFAULT_HEARTBEAT_SECONDS
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Bind the heartbeat to a Flask app
+
+        Args:
+            app: Flask application instance
+        """
+        self.app = app
+        self.interval = app.config.get('REPORT_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+
+    def start(self):
+        """Start the heartbeat thread of this process unless it is running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def beat(self):
+        """
+        Refresh the pending rows of this process and claim stale rows of other owners
+
+        Must run inside an app context.
+
+        Returns:
+            list: IDs of the claimed rows
+        """
+        model = self.model
+        owner = process_owner()
+        now = datetime.utcnow()
+        pending = model.status.in_(PENDING_STATUSES)
+        stale = or_(
+            model.heartbeat_at.is_(None),
+            model.heartbeat_at < now - timedelta(seconds=self.interval * STALE_HEARTBEATS)
+        )
+        try:
+            db.session.execute(
+                update(model).where(pending, model.owner == owner).values(heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            claimed = []
+            for row_id in db.session.execute(select(model.id).where(pending, stale)).scalars().all():
+                # Conditional update, so of several live processes only one claims a row
+                result = db.session.execute(
+                    update(model).where(model.id == row_id, pending, stale)
+                    .values(owner=owner, heartbeat_at=now, **self.claim_values(now))
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    claimed.append(row_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error refreshing {model.__tablename__} heartbeats: {str(e)}")
+            raise
+
+        if claimed:
+            logger.info(f"Claimed {len(claimed)} {model.__tablename__} rows of stopped processes")
+        if self.on_claim:
+            for row_id in claimed:
+                self.on_claim(row_id)
+        return claimed
+
+    def _loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.beat()
+            except Exception:
+                pass  # Logged by beat; try again on the next beat
+            time.sleep(self.interval)
+
+
+class ReportJobQueue:
+    """
+    Local worker pool for report generation
+
+    Configuration:
+        REPORT_WORKERS: Number of worker threads (default 2)
+        REPORT_CACHE_DIR: Artifact directory (default <instance>/report_cache)
+        REPORT_HEARTBEAT_SECONDS: Seconds between heartbeats of pending jobs (default 30)
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.cache_dir = None
+        self._executor = None
+        self._lock = threading.Lock()
+        # Jobs of stopped processes are queued again here
+        self._heartbeat = OwnerHeartbeat(
+            ReportJob, lambda now: {'status': 'queued'}, self._requeue, name='report-job-heartbeat'
+        )
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Bind the queue to a Flask app
+
+        Args:
+            app: Flask application instance
+        """
+        self.app = app
+        self.cache_dir = app.config.get('REPORT_CACHE_DIR') or os.path.join(app.instance_path, 'report_cache')
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get('REPORT_WORKERS', DEFAULT_REPORT_WORKERS),
+            thread_name_prefix='report-worker'
+        )
+        self._heartbeat.init_app(app)
+        app.extensions['report_jobs'] = self
+
+    def cache_key(self, report_type, project_id, sub_job_id=None, file_format='pdf'):
+        """
+        Cache key of a report over the current data
+
+        The project's data revision changes with every write to its sub jobs,
+        cost codes, work items or their rules, so computing the key is one
+        primary key read. The date is part of the key because the report header
+        prints it. The key doubles as the download's ETag.
+
+        Args:
+            report_type (str): Key of REPORT_TYPES
+            project_id (int): Project ID
+            sub_job_id (int, optional): Sub Job ID
+            file_format (str): Key of REPORT_RENDERERS
+
+        Returns:
+            str: Hex SHA-256 digest
+        """
+        current = RevisionService.get_revision(project_id)
+        revision = current.revision if current else 0
+        key = (f"{REPORT_FORMAT_VERSION}:{report_type}:{file_format}:{project_id}:{sub_job_id or ''}:"
+               f"{revision}:{date.today().isoformat()}")
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def artifact_dir(self, report_type, project_id, sub_job_id=None):
+        """Directory of the cached report files of one report type and project or sub job"""
+        scope = f"{project_id}_{sub_job_id}" if sub_job_id else f"{project_id}"
+        return os.path.join(self.cache_dir, report_type, scope)
+
+    def artifact_path(self, cache_key, report_type, project_id, sub_job_id=None, file_format='pdf'):
+        """Path of the cached report file for a cache key"""
+        return os.path.join(self.artifact_dir(report_type, project_id, sub_job_id), f"{cache_key}.{file_format}")
+
+    def submit(self, report_type, project_id, sub_job_id=None, file_format='pdf'):
+        """
+        Queue a report, reusing a cached artifact or a pending identical job
+
+        Args:
+            report_type (str): Key of REPORT_TYPES
+            project_id (int): Project ID
+            sub_job_id (int, optional): Sub Job ID
+            file_format (str): Key of REPORT_RENDERERS
+
+        Returns:
+            ReportJob: New job, already 'done' when the artifact is cached
+        """
+        self._check_report(report_type, file_format)
+        self._heartbeat.start()
+
+        cache_key = self.cache_key(report_type, project_id, sub_job_id, file_format)
+        try:
+            with self._lock:
+                pending = ReportJob.query.filter(
+                    ReportJob.cache_key == cache_key,
+                    ReportJob.status.in_(('queued', 'running'))
+                ).first()
+                if pending:
+                    return pending
+
+                job = ReportJob(
+                    id=uuid.uuid4().hex,
+                    report_type=report_type,
+                    project_id=project_id,
+                    sub_job_id=sub_job_id,
+                    file_format=file_format,
+                    cache_key=cache_key,
+                    status='queued',
+                    owner=process_owner(),
+                    heartbeat_at=datetime.utcnow()
+                )
+                if os.path.exists(self.artifact_path(cache_key, report_type, project_id, sub_job_id, file_format)):
+                    job.status = 'done'
+                    job.finished_at = datetime.utcnow()
+                db.session.add(job)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error queuing {report_type} report for project {project_id}: {str(e)}")
+            raise
+
+        if job.status == 'queued':
+            self._executor.submit(self._run, job.id)
+            logger.info(f"Queued {report_type} report job {job.id} for project {project_id}, sub job {sub_job_id}")
+        else:
+            logger.info(f"Serving cached {report_type} report {cache_key} for project {project_id}, sub job {sub_job_id}")
+        return job
+
+    def build(self, report_type, project_id, sub_job_id=None, file_format='pdf'):
+        """
+        Build a report on the calling thread, or reuse its cached artifact
+
+        Args:
+            report_type (str): Key of REPORT_TYPES
+            project_id (int): Project ID
+            sub_job_id (int, optional): Sub Job ID
+            file_format (str): Key of REPORT_RENDERERS
+
+        Returns:
+            str: Path of the report artifact
+        """
+        self._check_report(report_type, file_format)
+        cache_key = self.cache_key(report_type, project_id, sub_job_id, file_format)
+        path = self.artifact_path(cache_key, report_type, project_id, sub_job_id, file_format)
+        if not os.path.exists(path):
+            self._write_artifact(report_type, file_format, project_id, sub_job_id, path)
+        return path
+
+    def get_job(self, job_id):
+        """
+        Get a job by ID
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            ReportJob: Job or None if not found
+        """
+        # Clients poll here, so jobs of a stopped process are picked up even without new submissions
+        self._heartbeat.start()
+        return db.session.get(ReportJob, job_id)
+
+    @staticmethod
+    def _check_report(report_type, file_format):
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type: {report_type}")
+        if file_format not in REPORT_RENDERERS:
+            raise ValueError(f"Unknown report format: {file_format}")
+
+    def _write_artifact(self, report_type, file_format, project_id, sub_job_id, path):
+        # Write to a private file and rename, so readers never see a partial report
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(partial_path, 'wb') as report_file:
+                generate_report(report_type, file_format, project_id, sub_job_id, report_file)
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        self._evict_superseded(path, report_type, file_format, project_id, sub_job_id)
+
+    def _evict_superseded(self, path, report_type, file_format, project_id, sub_job_id):
+        # Older revisions and days are never served again. The artifact of the current
+        # key is kept too, in case a job for an older revision finished after it.
+        current_key = self.cache_key(report_type, project_id, sub_job_id, file_format)
+        keep = {os.path.basename(path), f"{current_key}.{file_format}"}
+        directory = os.path.dirname(path)
+        for name in os.listdir(directory):
+            if name.endswith(f".{file_format}") and name not in keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass  # Evicted by another worker
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(ReportJob, job_id)
+            if job is None or job.status != 'queued':
+                return
+            job.status = 'running'
+            db.session.commit()
+
+            try:
+                path = self.artifact_path(job.cache_key, job.report_type, job.project_id, job.sub_job_id, job.file_format)
+                if not os.path.exists(path):
+                    self._write_artifact(job.report_type, job.file_format, job.project_id, job.sub_job_id, path)
+                job.status = 'done'
+                logger.info(f"Finished {job.report_type} report job {job.id}")
+            except Exception as e:
+                db.session.rollback()
+                job.status = 'failed'
+                job.error = str(e)
+                logger.error(f"Error generating {job.report_type} report job {job.id}: {str(e)}")
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+    def _requeue(self, job_id):
+        self._executor.submit(self._run, job_id)
+        logger.info(f"Requeued report job {job_id} of a stopped process")
+
+
+# Shared queue, bound to the app in simple_app.py
+report_jobs = ReportJobQueue()
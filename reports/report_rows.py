@@ -0,0 +1,154 @@
+"""
+Streaming report rows for Magellan EV Tracker v3.0
+- Reads the work items of a project or sub job with one ordered query
+  (discipline, cost code, work item) fetched in yield_per batches
+- Step progress is outer-joined in the same query and folded per item
+- Rows are plain ReportItem objects, so reading a whole project never holds
+  ORM objects; reports.report_dataset groups them with subtotals as they stream
+- Grand totals come from one aggregate over the same rows, so a report header
+  can show them before the first row is read
+"""
+from models import db, WorkItem, WorkItemStepProgress, CostCode
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from utils.rule_step_cache import RuleStepCache
+
+# Rows fetched from the database cursor per batch
+REPORT_FETCH_SIZE = 1000
+
+
+class ReportItem:
+    """
+    Plain work item row of a report, detached from the session
+    """
+    __slots__ = (
+        'id', 'work_item_id_str', 'description', 'unit_of_measure',
+        'budgeted_quantity', 'earned_quantity', 'budgeted_man_hours', 'earned_man_hours',
+        'steps_progress'
+    )
+
+    def __init__(self, id, work_item_id_str, description, unit_of_measure, budgeted_quantity,
+                 earned_quantity, budgeted_man_hours, earned_man_hours):
+        self.id = id
+        self.work_item_id_str = work_item_id_str
+        self.description = description
+        self.unit_of_measure = unit_of_measure
+        self.budgeted_quantity = budgeted_quantity
+        self.earned_quantity = earned_quantity
+        self.budgeted_man_hours = budgeted_man_hours
+        self.earned_man_hours = earned_man_hours
+        self.steps_progress = {}
+
+    def get_steps_progress(self):
+        """Return steps progress as a dictionary, like WorkItem.get_steps_progress"""
+        return self.steps_progress
+
+
+class ReportTotals:
+    """
+    Budgeted/earned hours and quantities of one report group
+    """
+    __slots__ = ('budgeted_quantity', 'earned_quantity', 'budgeted_hours', 'earned_hours')
+
+    def __init__(self):
+        self.budgeted_quantity = 0
+        self.earned_quantity = 0
+        self.budgeted_hours = 0
+        self.earned_hours = 0
+
+    def add(self, budgeted_quantity, earned_quantity, budgeted_hours, earned_hours):
+        self.budgeted_quantity += budgeted_quantity
+        self.earned_quantity += earned_quantity
+        self.budgeted_hours += budgeted_hours
+        self.earned_hours += earned_hours
+
+
+def _scope_filter(query, project_id, sub_job_id):
+    if sub_job_id:
+        return query.where(WorkItem.sub_job_id == sub_job_id)
+    return query.where(WorkItem.project_id == project_id)
+
+
+def load_report_cost_codes(project_id=None, sub_job_id=None):
+    """
+    Load the cost codes used by a report's work items with their rule steps
+
+    Args:
+        project_id (int): Project ID, used when sub_job_id is not given
+        sub_job_id (int, optional): Sub Job ID
+
+    Returns:
+        dict: Cost code ID -> (CostCode, tuple of RuleStep)
+    """
+    used_ids = _scope_filter(select(WorkItem.cost_code_id).distinct(), project_id, sub_job_id)
+    cost_codes = CostCode.query.options(joinedload(CostCode.rule_of_credit)).filter(CostCode.id.in_(used_ids))
+    return {
+        cost_code.id: (cost_code, RuleStepCache.get_steps(cost_code.rule_of_credit))
+        for cost_code in cost_codes
+    }
+
+
+def load_report_totals(project_id=None, sub_job_id=None):
+    """
+    Sum the work items of a report in one aggregate query
+
+    Args:
+        project_id (int): Project ID, used when sub_job_id is not given
+        sub_job_id (int, optional): Sub Job ID
+
+    Returns:
+        ReportTotals: Grand totals of the report
+    """
+    query = select(
+        func.coalesce(func.sum(WorkItem.budgeted_quantity), 0.0),
+        func.coalesce(func.sum(WorkItem.earned_quantity), 0.0),
+        func.coalesce(func.sum(WorkItem.budgeted_man_hours), 0.0),
+        func.coalesce(func.sum(WorkItem.earned_man_hours), 0.0)
+    ).join(CostCode, CostCode.id == WorkItem.cost_code_id)
+    totals = ReportTotals()
+    totals.add(*db.session.execute(_scope_filter(query, project_id, sub_job_id)).one())
+    return totals
+
+
+def iter_report_items(project_id=None, sub_job_id=None):
+    """
+    Stream the work items of a report in (discipline, cost code, work item) order
+
+    Args:
+        project_id (int): Project ID, used when sub_job_id is not given
+        sub_job_id (int, optional): Sub Job ID
+
+    Yields:
+        tuple: (discipline, cost code ID, ReportItem)
+    """
+    query = select(
+        CostCode.discipline,
+        CostCode.id,
+        WorkItem.id,
+        WorkItem.work_item_id_str,
+        WorkItem.description,
+        WorkItem.unit_of_measure,
+        WorkItem.budgeted_quantity,
+        WorkItem.earned_quantity,
+        WorkItem.budgeted_man_hours,
+        WorkItem.earned_man_hours,
+        WorkItemStepProgress.step_name,
+        WorkItemStepProgress.percent_complete
+    ).join(CostCode, CostCode.id == WorkItem.cost_code_id).outerjoin(
+        WorkItemStepProgress, WorkItemStepProgress.work_item_id == WorkItem.id
+    )
+    query = _scope_filter(query, project_id, sub_job_id).order_by(
+        CostCode.discipline, CostCode.cost_code_id_str, CostCode.id, WorkItem.work_item_id_str, WorkItem.id
+    ).execution_options(yield_per=REPORT_FETCH_SIZE)
+
+    current = None
+    for row in db.session.execute(query):
+        discipline, cost_code_id, item_id = row[0], row[1], row[2]
+        if current is None or current[2].id != item_id:
+            if current is not None:
+                yield current
+            current = (discipline, cost_code_id, ReportItem(*row[2:10]))
+        if row[10] is not None:
+            current[2].steps_progress[row[10]] = row[11] or 0.0
+    if current is not None:
+        yield current
@@ -9,18 +9,30 @@ Fixed routes.py for Magellan EV Tracker v3.0
 - Fixed projects route to properly load relationships and pass projects_with_data structure
 - Fixed syntax error in API routes
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, jsonify, send_file, abort
 from services.project_service import ProjectService
 from services.sub_job_service import SubJobService
 from services.work_item_service import WorkItemService
 from services.cost_code_service import CostCodeService
 from services.rule_of_credit_service import RuleOfCreditService
 from services.url_service import UrlService
+from services.dashboard_service import DashboardService
+from services.revision_service import RevisionService
+from services.work_item_import_service import WorkItemImportService
+from services.snapshot_service import SnapshotService, CURVE_LEVELS
+from services.evm_service import EVMService
 from models import db, Project, SubJob, WorkItem, CostCode, RuleOfCredit, DISCIPLINE_CHOICES
+import csv
+import io
+import os
+from datetime import date
+from reports.report_jobs import report_jobs, REPORT_MIMETYPES, REPORT_RENDERERS
+from reports.report_dataset import REPORT_TYPES
+from reports.report_batch import report_batches
+from utils.conditional import conditional_get, not_modified
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured once by utils.logging_config in simple_app.py
 logger = logging.getLogger(__name__)
 
 main_bp = Blueprint('main', __name__)
@@ -28,11 +40,14 @@ main_bp = Blueprint('main', __name__)
 # Use the complete discipline list from models
 DEFAULT_DISCIPLINES = DISCIPLINE_CHOICES
 
+# Rows per request of the incrementally loaded work items table
+WORK_ITEMS_PAGE_SIZE = 100
+
 @main_bp.route('/')
 def index():
     """Home page route - matches v1.32 pattern"""
     try:
-        projects = ProjectService.get_all_projects()
+        projects = ProjectService.get_project_options()
         work_items = WorkItemService.get_recent_work_items(10)  # Get 10 most recent work items
         return render_template('index.html', projects=projects, work_items=work_items)
     except Exception as e:
@@ -44,22 +59,11 @@ def index():
 def dashboard():
     """Dashboard route - added to match application expectations"""
     try:
-        # Log database queries for debugging
-        logger.info("Loading dashboard")
-        
-        # Use the count methods from each service
-        projects_count = ProjectService.count_projects() if hasattr(ProjectService, 'count_projects') else 0
-        sub_jobs_count = SubJobService.count_sub_jobs() if hasattr(SubJobService, 'count_sub_jobs') else 0
-        work_items_count = WorkItemService.count_work_items() if hasattr(WorkItemService, 'count_work_items') else 0
-        rules_count = RuleOfCreditService.count_rules_of_credit() if hasattr(RuleOfCreditService, 'count_rules_of_credit') else 0
+        # One combined COUNT query when the data revision changed since the counters were cached
+        counts = DashboardService.get_counts()
+        logger.debug(f"Dashboard counts: {counts}")
         
-        logger.info(f"Dashboard counts: Projects={projects_count}, SubJobs={sub_jobs_count}, WorkItems={work_items_count}, Rules={rules_count}")
-        
-        return render_template('dashboard.html', 
-                              projects_count=projects_count,
-                              sub_jobs_count=sub_jobs_count,
-                              work_items_count=work_items_count,
-                              rules_count=rules_count)
+        return render_template('dashboard.html', **counts)
     except Exception as e:
         logger.error(f"Error loading dashboard: {str(e)}")
         flash(f"Error loading dashboard: {str(e)}", "error")
@@ -71,7 +75,7 @@ def reports():
     """Reports route - added to resolve BuildError for 'main.reports'"""
     try:
         logger.info("Loading reports page")
-        projects = ProjectService.get_all_projects()
+        projects = ProjectService.get_project_options()
         logger.info(f"Found {len(projects)} projects for reports page")
         return render_template('reports.html', projects=projects)
     except Exception as e:
@@ -81,61 +85,17 @@ def reports():
 
 # Project routes
 @main_bp.route('/projects')
+@conditional_get(lambda: RevisionService.get_revision())
 def projects():
     try:
         # Log database queries for debugging
-        logger.info("Fetching all projects")
-        
-        # Get all projects with eager loading of relationships
-        # This ensures sub_jobs and work_items are loaded in the same session
-        projects = db.session.query(Project).all()
-        logger.info(f"Found {len(projects)} projects")
-        
-        # Create projects_with_data structure expected by the template
-        projects_with_data = []
+        logger.debug("Fetching all projects")
         
-        for project in projects:
-            logger.info(f"Processing project: {project.id}, {project.name}, {project.project_id_str}")
-            
-            # Ensure sub_jobs are loaded
-            sub_jobs = list(project.sub_jobs)  # Force loading of lazy relationship
-            logger.info(f"Project {project.id} has {len(sub_jobs)} sub jobs")
-            
-            # Calculate statistics
-            total_budgeted_hours = 0
-            total_earned_hours = 0
-            overall_progress = 0
-            
-            # Force loading of work_items relationship
-            work_items = list(project.work_items)
-            logger.info(f"Project {project.id} has {len(work_items)} work items")
-            
-            # Calculate hours from work items
-            for work_item in work_items:
-                if hasattr(work_item, 'budgeted_man_hours') and work_item.budgeted_man_hours is not None:
-                    total_budgeted_hours += work_item.budgeted_man_hours
-                if hasattr(work_item, 'earned_man_hours') and work_item.earned_man_hours is not None:
-                    total_earned_hours += work_item.earned_man_hours
-            
-            # Calculate overall progress
-            if total_budgeted_hours > 0:
-                overall_progress = (total_earned_hours / total_budgeted_hours) * 100
-            
-            # Add project data to the list
-            project_data = {
-                'project': project,
-                'overall_progress': overall_progress,
-                'total_budgeted_hours': total_budgeted_hours,
-                'total_earned_hours': total_earned_hours
-            }
-            
-            projects_with_data.append(project_data)
-            
-            logger.info(f"Project {project.id} stats: progress={overall_progress}%, budgeted={total_budgeted_hours}, earned={total_earned_hours}")
-            logger.info(f"Project {project.id} has sub_jobs: {len(project.sub_jobs)}, work_items: {len(project.work_items)}")
+        # Totals for every project come from the materialized project summaries
+        projects_with_data = ProjectService.get_projects_with_totals()
         
         # Log the final structure for debugging
-        logger.info(f"Passing {len(projects_with_data)} projects_with_data to template")
+        logger.debug(f"Passing {len(projects_with_data)} projects_with_data to template")
         
         return render_template('projects.html', projects_with_data=projects_with_data)
     except Exception as e:
@@ -172,6 +132,7 @@ def add_project():
     return render_template('add_project.html')
 
 @main_bp.route('/view_project/<int:project_id>')
+@conditional_get(lambda project_id: RevisionService.get_revision(project_id))
 def view_project(project_id):
     try:
         # Use the correct method name from ProjectService
@@ -189,51 +150,92 @@ def view_project(project_id):
 
 @main_bp.route('/work_items')
 def work_items():
-    """Work items route - added to resolve BuildError"""
+    """Work items page; rows are fetched incrementally from /api/work_items"""
     try:
+        project_id = request.args.get('project_id', type=int)
         sub_job_id = request.args.get('sub_job_id', type=int)
+        sub_job = None
+        project = None
         
         if sub_job_id:
-            # Get work items for a specific sub job
             sub_job = SubJobService.get_sub_job_by_id(sub_job_id)
             if not sub_job:
                 flash("Sub job not found", "error")
                 return redirect(url_for('main.projects'))
-                
-            work_items = WorkItemService.get_sub_job_work_items(sub_job_id)
-            project = ProjectService.get_project_details(sub_job.project_id)
-            
-            logger.info(f"Found {len(work_items)} work items for sub job {sub_job_id}")
-            
-            return render_template('work_items.html', 
-                                  work_items=work_items, 
-                                  sub_job=sub_job, 
-                                  project=project)
+            project_id = project_id or sub_job.project_id
+        if project_id:
+            project = ProjectService.get_project_details(project_id)
+        
+        # Only the filter options are rendered here; the table pages itself in
+        projects = ProjectService.get_project_options()
+        if project_id:
+            sub_jobs = SubJobService.get_project_sub_jobs(project_id, profile='default')
+            cost_codes = CostCodeService.get_project_cost_codes(project_id)
         else:
-            # Get all work items
-            work_items = WorkItemService.get_all_work_items()
-            logger.info(f"Found {len(work_items)} work items (all sub jobs)")
-            
-            return render_template('work_items.html', 
-                                  work_items=work_items, 
-                                  sub_job=None, 
-                                  project=None)
+            sub_jobs = SubJobService.get_all_sub_jobs()
+            cost_codes = []
+        
+        return render_template('work_items.html',
+                              sub_job=sub_job,
+                              project=project,
+                              projects=projects,
+                              sub_jobs=sub_jobs,
+                              cost_codes=cost_codes,
+                              disciplines=DEFAULT_DISCIPLINES,
+                              page_size=WORK_ITEMS_PAGE_SIZE)
     except Exception as e:
         logger.error(f"Error loading work items: {str(e)}")
         flash(f"Error loading work items: {str(e)}", "error")
-        return render_template('work_items.html', 
-                              work_items=[], 
-                              sub_job=None, 
-                              project=None)
+        return render_template('work_items.html',
+                              sub_job=None,
+                              project=None,
+                              projects=[],
+                              sub_jobs=[],
+                              cost_codes=[],
+                              disciplines=DEFAULT_DISCIPLINES,
+                              page_size=WORK_ITEMS_PAGE_SIZE)
+
+@main_bp.route('/api/work_items')
+def api_work_items():
+    """
+    Keyset-paginated work item listing
+    
+    Query parameters: project_id, sub_job_id, discipline, cost_code_id, status,
+    search, sort_by, order (asc/desc), cursor (next_cursor of the previous page)
+    and limit.
+    """
+    try:
+        page = WorkItemService.get_work_items_page(
+            project_id=request.args.get('project_id', type=int),
+            sub_job_id=request.args.get('sub_job_id', type=int),
+            discipline=request.args.get('discipline') or None,
+            cost_code_id=request.args.get('cost_code_id', type=int),
+            status=request.args.get('status') or None,
+            search=request.args.get('search') or None,
+            sort_by=request.args.get('sort_by') or 'id',
+            descending=request.args.get('order') == 'desc',
+            cursor=request.args.get('cursor') or None,
+            limit=request.args.get('limit', WORK_ITEMS_PAGE_SIZE, type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error listing work items: {str(e)}")
+        return jsonify({'error': 'Error listing work items'}), 500
+    
+    return jsonify({
+        'items': [WorkItemService.serialize_list_item(item) for item in page['items']],
+        'next_cursor': page['next_cursor']
+    })
 
 @main_bp.route('/cost_codes')
 def cost_codes():
     try:
         project_id = request.args.get('project_id', type=int)
-        projects = ProjectService.get_all_projects()
+        projects = ProjectService.get_project_options()
         
         # Log the request for debugging
-        logger.info(f"Loading cost codes for project_id: {project_id}")
+        logger.debug(f"Loading cost codes for project_id: {project_id}")
         
         if project_id:
             project = ProjectService.get_project_details(project_id)
@@ -241,9 +243,10 @@ def cost_codes():
             cost_codes = CostCodeService.get_project_cost_codes(project_id)
             logger.info(f"Found {len(cost_codes)} cost codes for project {project_id}")
             
-            # Debug log each cost code
-            for cc in cost_codes:
-                logger.info(f"Cost code: {cc.id}, {cc.cost_code_id_str}, project_id={cc.project_id}")
+            # Row-level detail only when DEBUG logging is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                for cc in cost_codes:
+                    logger.debug(f"Cost code: {cc.id}, {cc.cost_code_id_str}, project_id={cc.project_id}")
                 
             return render_template('cost_codes.html', 
                                   cost_codes=cost_codes, 
@@ -300,14 +303,14 @@ def add_cost_code():
             except Exception as e:
                 logger.error(f"Error creating cost code: {str(e)}")
                 flash(f"Error creating cost code: {str(e)}", "error")
-                projects = ProjectService.get_all_projects()
+                projects = ProjectService.get_project_options()
                 return render_template('add_cost_code.html', 
                                       projects=projects, 
                                       rules=rules, 
                                       selected_project_id=project_id, 
                                       disciplines=DEFAULT_DISCIPLINES)
         
-        projects = ProjectService.get_all_projects()
+        projects = ProjectService.get_project_options()
         return render_template('add_cost_code.html', 
                               projects=projects, 
                               rules=rules, 
@@ -339,6 +342,7 @@ def rules_of_credit():
 
 # API routes for reports page
 @main_bp.route('/api/get_sub_jobs/<int:project_id>')
+@conditional_get(lambda project_id: RevisionService.get_revision(project_id))
 def api_get_sub_jobs(project_id):
     """API endpoint to get sub jobs for a project (used by reports.html)"""
     try:
@@ -357,15 +361,308 @@ def api_get_sub_jobs(project_id):
         logger.error(f"Error getting sub jobs for project {project_id}: {str(e)}")
         return jsonify([])
 
+@main_bp.route('/api/work_items/progress/bulk', methods=['POST'])
+def api_bulk_progress():
+    """
+    Apply end-of-shift progress for many work items in one transaction
+    
+    Accepts a JSON list (or {"rows": [...]}) of objects, or CSV as an uploaded
+    'file' or a text/csv body, with work_item_id_str, step_name and percent.
+    """
+    try:
+        if 'file' in request.files:
+            text = io.TextIOWrapper(request.files['file'].stream, encoding='utf-8-sig')
+            rows = list(csv.DictReader(text))
+        elif request.mimetype == 'text/csv':
+            rows = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+        else:
+            payload = request.get_json(silent=True)
+            rows = payload.get('rows') if isinstance(payload, dict) else payload
+        
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return jsonify({'success': False, 'error': 'Expected a list of progress rows'}), 400
+        
+        result = WorkItemService.bulk_update_progress(rows)
+        result['success'] = True
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error applying bulk progress: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@main_bp.route('/api/work_items/import', methods=['POST'])
+def api_import_work_items():
+    """
+    Import work items for a project from an uploaded CSV or XLSX estimate export
+    
+    Form fields: 'file', 'project_id' and optional 'dry_run' to only validate.
+    Invalid rows are reported and skipped; the valid rows commit together.
+    """
+    upload = request.files.get('file')
+    project_id = request.form.get('project_id', type=int)
+    if upload is None or not project_id:
+        return jsonify({'success': False, 'error': 'file and project_id are required'}), 400
+    if not ProjectService.get_project_details(project_id):
+        return jsonify({'success': False, 'error': f'Project {project_id} not found'}), 404
+    
+    try:
+        rows = WorkItemImportService.iter_file_rows(upload.stream, upload.filename)
+        result = WorkItemImportService.import_work_items(
+            rows, project_id, dry_run=request.form.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        )
+        result['success'] = True
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing work items: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # Export routes for reports
+def send_report(report_type, project_id, sub_job_id=None, file_format='pdf'):
+    """
+    Stream a report file from the artifact cache, building it first if the data changed
+    
+    The artifact cache key is the ETag, so a client holding the current
+    report gets 304 Not Modified without the report being looked up or built.
+    """
+    cache_key = report_jobs.cache_key(report_type, project_id, sub_job_id, file_format)
+    if not_modified(cache_key):
+        response = current_app.response_class(status=304)
+        response.set_etag(cache_key)
+        return response
+    
+    # The artifact is named by the key current when it was built
+    path = report_jobs.build(report_type, project_id, sub_job_id, file_format)
+    scope = f"{project_id}_{sub_job_id}" if sub_job_id else f"{project_id}"
+    response = send_file(
+        path,
+        mimetype=REPORT_MIMETYPES[file_format],
+        as_attachment=True,
+        download_name=f"{report_type}_report_{scope}.{file_format}",
+        etag=os.path.splitext(os.path.basename(path))[0]
+    )
+    response.cache_control.no_cache = True
+    return response
+
+def parse_date_arg(value):
+    """Parse an optional ISO date (YYYY-MM-DD) from a request; raises ValueError when malformed"""
+    return date.fromisoformat(value) if value else None
+
+@main_bp.route('/api/projects/<int:project_id>/snapshots', methods=['GET', 'POST'])
+def api_project_snapshots(project_id):
+    """List a project's earned-value snapshots, or take one (JSON body: optional cutoff_date)"""
+    if request.method == 'GET':
+        snapshots = SnapshotService.get_snapshots(project_id)
+        return jsonify({'success': True, 'snapshots': [snapshot.serialize() for snapshot in snapshots]})
+    
+    data = request.get_json(silent=True) or request.form
+    try:
+        cutoff_date = parse_date_arg(data.get('cutoff_date'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'cutoff_date must be YYYY-MM-DD'}), 400
+    
+    try:
+        snapshot = SnapshotService.take_snapshot(project_id, cutoff_date)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error taking snapshot of project {project_id}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, 'snapshot': snapshot.serialize()}), 201
+
+@main_bp.route('/api/projects/<int:project_id>/ev_curve')
+def api_project_ev_curve(project_id):
+    """Earned-value curve of a project, or of ?sub_job_id= / ?discipline=, optionally within ?start= and ?end="""
+    try:
+        start_date = parse_date_arg(request.args.get('start'))
+        end_date = parse_date_arg(request.args.get('end'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD'}), 400
+    
+    points = SnapshotService.get_curve(
+        project_id,
+        sub_job_id=request.args.get('sub_job_id', type=int),
+        discipline=request.args.get('discipline'),
+        start_date=start_date,
+        end_date=end_date
+    )
+    return jsonify({'success': True, 'points': points})
+
+@main_bp.route('/api/projects/<int:project_id>/ev_curves/<level>')
+def api_project_ev_curves(project_id, level):
+    """Earned-value curves of every sub job or discipline of a project, e.g. /api/projects/1/ev_curves/discipline"""
+    if level not in CURVE_LEVELS:
+        abort(404)
+    try:
+        start_date = parse_date_arg(request.args.get('start'))
+        end_date = parse_date_arg(request.args.get('end'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD'}), 400
+    
+    curves = SnapshotService.get_curves(project_id, level, start_date=start_date, end_date=end_date)
+    return jsonify({'success': True, 'level': level, 'curves': curves})
+
+@main_bp.route('/api/projects/<int:project_id>/evm')
+def api_project_evm(project_id):
+    """EVM metrics of a project, its sub jobs and cost codes (?work_items=1 adds every work item) at ?status_date="""
+    try:
+        status_date = parse_date_arg(request.args.get('status_date'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'status_date must be YYYY-MM-DD'}), 400
+    
+    try:
+        metrics = EVMService.get_metrics(project_id, status_date)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    if metrics is None:
+        return jsonify({'success': False, 'error': 'Project not found'}), 404
+    payload = metrics.serialize(include_work_items=request.args.get('work_items', type=int) == 1)
+    payload['success'] = True
+    return jsonify(payload)
+
+@main_bp.route('/api/work_items/<int:work_item_id>/history')
+def api_work_item_history(work_item_id):
+    """Earned hours and quantity of a work item at every snapshot of its project"""
+    return jsonify({'success': True, 'history': SnapshotService.get_work_item_history(work_item_id)})
+
+def report_job_payload(job):
+    """Serialize a report job with its status and download URLs"""
+    payload = job.serialize()
+    payload['status_url'] = url_for('main.api_report_job_status', job_id=job.id)
+    if job.status == 'done':
+        payload['download_url'] = url_for('main.download_report_job', job_id=job.id)
+    return payload
+
+@main_bp.route('/api/reports/jobs', methods=['POST'])
+def api_submit_report_job():
+    """Queue a report for background generation in any REPORT_RENDERERS format"""
+    data = request.get_json(silent=True) or request.form
+    report_type = data.get('report_type')
+    file_format = data.get('file_format') or 'pdf'
+    try:
+        project_id = int(data.get('project_id'))
+        sub_job_id = int(data['sub_job_id']) if data.get('sub_job_id') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'project_id is required'}), 400
+    
+    try:
+        job = report_jobs.submit(report_type, project_id, sub_job_id, file_format)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error queuing report job: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    payload = report_job_payload(job)
+    payload['success'] = True
+    return jsonify(payload), 202
+
+@main_bp.route('/api/reports/jobs/<job_id>')
+def api_report_job_status(job_id):
+    """Poll the status of a report job"""
+    job = report_jobs.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Report job not found'}), 404
+    payload = report_job_payload(job)
+    payload['success'] = True
+    return jsonify(payload)
+
+@main_bp.route('/reports/jobs/<job_id>/download')
+def download_report_job(job_id):
+    """Download the artifact of a finished report job"""
+    job = report_jobs.get_job(job_id)
+    if not job or job.status != 'done':
+        flash("Report is not ready", "error")
+        return redirect(url_for('main.reports'))
+    path = report_jobs.artifact_path(job.cache_key, job.report_type, job.project_id, job.sub_job_id, job.file_format)
+    if not os.path.exists(path):
+        # Evicted after the data changed; the report has to be requested again
+        flash("Report is out of date, please generate it again", "error")
+        return redirect(url_for('main.reports'))
+    scope = f"{job.project_id}_{job.sub_job_id}" if job.sub_job_id else f"{job.project_id}"
+    return send_file(
+        path,
+        mimetype=REPORT_MIMETYPES[job.file_format],
+        as_attachment=True,
+        download_name=f"{job.report_type}_report_{scope}.{job.file_format}"
+    )
+
+def report_batch_payload(batch):
+    """Serialize a report batch with its status and download URLs"""
+    payload = batch.serialize()
+    payload['status_url'] = url_for('main.api_report_batch_status', batch_id=batch.id)
+    if batch.status == 'done':
+        payload['download_url'] = url_for('main.download_report_batch', batch_id=batch.id)
+    return payload
+
+@main_bp.route('/api/reports/batches', methods=['POST'])
+def api_submit_report_batch():
+    """Queue a batch export of reports for every (or the given) project and sub job into a zip archive"""
+    data = request.get_json(silent=True) or {}
+    report_types = data.get('report_types') or list(REPORT_TYPES)
+    file_formats = data.get('file_formats') or ['pdf']
+    try:
+        project_ids = [int(project_id) for project_id in data.get('project_ids') or []]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'project_ids must be a list of project IDs'}), 400
+    
+    try:
+        batch = report_batches.submit(report_types, file_formats, project_ids or None)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error queuing report batch: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    payload = report_batch_payload(batch)
+    payload['success'] = True
+    return jsonify(payload), 202
+
+@main_bp.route('/api/reports/batches/<batch_id>')
+def api_report_batch_status(batch_id):
+    """Poll the progress of a report batch"""
+    batch = report_batches.get_batch(batch_id)
+    if not batch:
+        return jsonify({'success': False, 'error': 'Report batch not found'}), 404
+    payload = report_batch_payload(batch)
+    payload['success'] = True
+    return jsonify(payload)
+
+@main_bp.route('/reports/batches/<batch_id>/download')
+def download_report_batch(batch_id):
+    """Download the zip archive of a finished report batch"""
+    batch = report_batches.get_batch(batch_id)
+    if not batch or batch.status != 'done':
+        flash("Report batch is not ready", "error")
+        return redirect(url_for('main.reports'))
+    return send_file(
+        report_batches.archive_path(batch.id),
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=f"reports_{batch.created_at.strftime('%Y%m%d')}_{batch.id[:8]}.zip"
+    )
+
+@main_bp.route('/export/<report_type>/<file_format>/<int:project_id>')
+@main_bp.route('/export/<report_type>/<file_format>/<int:project_id>/<int:sub_job_id>')
+def export_report(report_type, file_format, project_id, sub_job_id=None):
+    """Export a report in any format, e.g. /export/hours/csv/1"""
+    if report_type not in REPORT_TYPES or file_format not in REPORT_RENDERERS:
+        abort(404)
+    try:
+        logger.info(f"Exporting {report_type} {file_format} for project {project_id}, sub_job {sub_job_id}")
+        return send_report(report_type, project_id, sub_job_id, file_format)
+    except Exception as e:
+        logger.error(f"Error exporting {report_type} {file_format}: {str(e)}")
+        flash(f"Error exporting {report_type} report: {str(e)}", "error")
+        return redirect(url_for('main.reports'))
+
 @main_bp.route('/export/quantities/pdf/<int:project_id>')
 @main_bp.route('/export/quantities/pdf/<int:project_id>/<int:sub_job_id>')
 def export_quantities_pdf(project_id, sub_job_id=None):
     """Export quantities report as PDF"""
     try:
         logger.info(f"Exporting quantities PDF for project {project_id}, sub_job {sub_job_id}")
-        flash("PDF export functionality will be implemented in a future version.", "info")
-        return redirect(url_for('main.reports'))
+        return send_report('quantities', project_id, sub_job_id)
     except Exception as e:
         logger.error(f"Error exporting quantities PDF: {str(e)}")
         flash(f"Error exporting quantities PDF: {str(e)}", "error")
@@ -377,8 +674,7 @@ def export_quantities_excel(project_id, sub_job_id=None):
     """Export quantities report as Excel"""
     try:
         logger.info(f"Exporting quantities Excel for project {project_id}, sub_job {sub_job_id}")
-        flash("Excel export functionality will be implemented in a future version.", "info")
-        return redirect(url_for('main.reports'))
+        return send_report('quantities', project_id, sub_job_id, 'xlsx')
     except Exception as e:
         logger.error(f"Error exporting quantities Excel: {str(e)}")
         flash(f"Error exporting quantities Excel: {str(e)}", "error")
@@ -390,8 +686,7 @@ def export_hours_pdf(project_id, sub_job_id=None):
     """Export hours report as PDF"""
     try:
         logger.info(f"Exporting hours PDF for project {project_id}, sub_job {sub_job_id}")
-        flash("PDF export functionality will be implemented in a future version.", "info")
-        return redirect(url_for('main.reports'))
+        return send_report('hours', project_id, sub_job_id)
     except Exception as e:
         logger.error(f"Error exporting hours PDF: {str(e)}")
         flash(f"Error exporting hours PDF: {str(e)}", "error")
@@ -403,8 +698,7 @@ def export_hours_excel(project_id, sub_job_id=None):
     """Export hours report as Excel"""
     try:
         logger.info(f"Exporting hours Excel for project {project_id}, sub_job {sub_job_id}")
-        flash("Excel export functionality will be implemented in a future version.", "info")
-        return redirect(url_for('main.reports'))
+        return send_report('hours', project_id, sub_job_id, 'xlsx')
     except Exception as e:
         logger.error(f"Error exporting hours Excel: {str(e)}")
         flash(f"Error exporting hours Excel: {str(e)}", "error")
@@ -6,3 +6,6 @@ from .sub_job_service import SubJobService
 from .cost_code_service import CostCodeService
 from .work_item_service import WorkItemService
 from .rule_of_credit_service import RuleOfCreditService
+from .rollup_service import RollupService
+from .summary_service import SummaryService
+from .earned_value_service import EarnedValueService
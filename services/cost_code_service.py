@@ -77,9 +77,10 @@ class CostCodeService:
             cost_codes = CostCode.query.filter_by(project_id=project_id).all()
             logger.info(f"Retrieved {len(cost_codes)} cost codes for project {project_id}")
             
-            # Log each cost code for debugging
-            for cc in cost_codes:
-                logger.info(f"Cost code: {cc.id}, {cc.cost_code_id_str}, project_id={cc.project_id}")
+            # Row-level detail only when DEBUG logging is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                for cc in cost_codes:
+                    logger.debug(f"Cost code: {cc.id}, {cc.cost_code_id_str}, project_id={cc.project_id}")
                 
             return cost_codes
         except Exception as e:
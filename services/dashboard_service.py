@@ -0,0 +1,56 @@
+"""
+DashboardService for Magellan EV Tracker v3.0
+- Dashboard counters read with one combined COUNT query instead of one per table
+- Results are kept in the service cache keyed by the global data revision
+  (services.revision_service), so every worker sees a write on its next request
+"""
+from models import Project, SubJob, WorkItem, RuleOfCredit, db
+from services.revision_service import RevisionService
+from utils.service_cache import service_cache
+from sqlalchemy import func, select
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache namespace of the dashboard counters
+DASHBOARD_CACHE = 'dashboard'
+
+EMPTY_COUNTS = {'projects_count': 0, 'sub_jobs_count': 0, 'work_items_count': 0, 'rules_count': 0}
+
+
+class DashboardService:
+    """
+    Service for the dashboard counters
+    """
+
+    @staticmethod
+    def _count_all():
+        counts = db.session.execute(select(
+            select(func.count(Project.id)).scalar_subquery().label('projects_count'),
+            select(func.count(SubJob.id)).scalar_subquery().label('sub_jobs_count'),
+            select(func.count(WorkItem.id)).scalar_subquery().label('work_items_count'),
+            select(func.count(RuleOfCredit.id)).scalar_subquery().label('rules_count')
+        )).one()
+        return dict(counts._mapping)
+
+    @staticmethod
+    def get_counts():
+        """
+        Get the number of projects, sub jobs, work items and rules of credit
+
+        Returns:
+            dict: projects_count, sub_jobs_count, work_items_count and rules_count
+        """
+        try:
+            current = RevisionService.get_revision()
+            # Without a revision row there is nothing to key on, so always count
+            if current is None:
+                counts = DashboardService._count_all()
+            else:
+                counts = service_cache.get_or_load((DASHBOARD_CACHE, 'counts', current.revision), DashboardService._count_all)
+            logger.debug(f"Dashboard counts: {counts}")
+            return dict(counts)
+        except Exception as e:
+            logger.error(f"Error counting dashboard totals: {str(e)}")
+            return dict(EMPTY_COUNTS)
@@ -0,0 +1,173 @@
+"""
+EarnedValueService for Magellan EV Tracker v3.0
+- Recalculates earned values for every work item under a rule of credit in one batch
+- Step progress and rule weights are loaded into NumPy arrays and combined with a
+  single matrix-vector product instead of per-row calculate_earned_values calls
+- Results are written back with one executemany UPDATE and folded into the summaries;
+  the affected projects' data revisions are bumped since no ORM flush sees the change
+"""
+from models import (db, WorkItem, WorkItemStepProgress, CostCode, RuleOfCredit, add_summary_delta, apply_summary_deltas,
+                    bump_project_revisions)
+from utils.rule_step_cache import RuleStepCache
+from sqlalchemy import bindparam, select
+import numpy as np
+import logging
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class EarnedValueService:
+    """
+    Service for batch earned-value recalculation
+    """
+
+    @staticmethod
+    def compute_earned_values(progress, weights, budgeted_hours, budgeted_quantity):
+        """
+        Compute earned values for many work items at once
+
+        Args:
+            progress (numpy.ndarray): (items x steps) completion percentages
+            weights (numpy.ndarray): (steps,) rule of credit weights in percent
+            budgeted_hours (numpy.ndarray): (items,) budgeted man hours, NaN for missing
+            budgeted_quantity (numpy.ndarray): (items,) budgeted quantities, NaN for missing
+
+        Returns:
+            tuple: earned_hours, percent_complete_hours, earned_quantity, percent_complete_quantity arrays
+        """
+        # Weighted completion of every item in percent, as calculate_earned_values computes it
+        weighted_percentage = (progress / 100.0) @ weights
+
+        has_hours = np.nan_to_num(budgeted_hours) > 0
+        earned_hours = np.where(has_hours, weighted_percentage / 100.0 * np.nan_to_num(budgeted_hours), 0.0)
+        percent_complete_hours = np.where(has_hours, weighted_percentage, 0.0)
+
+        has_quantity = np.nan_to_num(budgeted_quantity) > 0
+        earned_quantity = np.where(has_quantity, weighted_percentage / 100.0 * np.nan_to_num(budgeted_quantity), 0.0)
+        percent_complete_quantity = np.where(has_quantity, weighted_percentage, 0.0)
+
+        return earned_hours, percent_complete_hours, earned_quantity, percent_complete_quantity
+
+    @staticmethod
+    def recalculate_rule(rule_id, project_id=None):
+        """
+        Recalculate earned values of every work item whose cost code uses a rule
+
+        Args:
+            rule_id (int): Rule of Credit ID
+            project_id (int, optional): Limit the recalculation to one project
+
+        Returns:
+            dict: Rule ID, number of work items updated and elapsed seconds
+        """
+        started = time.perf_counter()
+        try:
+            rule = db.session.get(RuleOfCredit, rule_id)
+            steps = RuleStepCache.get_steps(rule)
+            weights = np.array([step.weight for step in steps], dtype=float)
+
+            work_item = WorkItem.__table__
+            query = select(
+                work_item.c.id,
+                work_item.c.project_id,
+                work_item.c.sub_job_id,
+                work_item.c.cost_code_id,
+                work_item.c.budgeted_man_hours,
+                work_item.c.budgeted_quantity,
+                work_item.c.earned_man_hours,
+                work_item.c.earned_quantity
+            ).join(CostCode.__table__, CostCode.__table__.c.id == work_item.c.cost_code_id).where(
+                CostCode.__table__.c.rule_of_credit_id == rule_id
+            )
+            if project_id is not None:
+                query = query.where(work_item.c.project_id == project_id)
+            rows = db.session.execute(query.order_by(work_item.c.id)).all()
+
+            if rows:
+                columns = list(zip(*rows))
+                ids = np.array(columns[0], dtype=np.int64)
+                keys = np.array(columns[1:4], dtype=np.int64).T
+                budgeted_hours = np.array(columns[4], dtype=float)
+                budgeted_quantity = np.array(columns[5], dtype=float)
+                old_earned_hours = np.nan_to_num(np.array(columns[6], dtype=float))
+                old_earned_quantity = np.nan_to_num(np.array(columns[7], dtype=float))
+
+                # Progress matrix: one row per item, one column per rule step
+                progress = np.zeros((len(rows), len(steps)))
+                if steps:
+                    step_progress = WorkItemStepProgress.__table__
+                    progress_query = select(
+                        step_progress.c.work_item_id,
+                        step_progress.c.step_name,
+                        step_progress.c.percent_complete
+                    ).where(
+                        step_progress.c.work_item_id.in_(query.with_only_columns(work_item.c.id)),
+                        step_progress.c.step_name.in_([step.name for step in steps])
+                    )
+                    # A name listed more than once is credited once per step, like WorkItem.calculate_earned_values
+                    step_columns = {}
+                    for i, step in enumerate(steps):
+                        step_columns.setdefault(step.name, []).append(i)
+                    progress_rows = db.session.execute(progress_query).all()
+                    if progress_rows:
+                        item_ids, step_names, percentages = zip(*progress_rows)
+                        row_indexes = np.searchsorted(ids, np.array(item_ids, dtype=np.int64))
+                        column_indexes = np.array([step_columns[name][0] for name in step_names])
+                        progress[row_indexes, column_indexes] = np.array(percentages, dtype=float)
+                        for columns in step_columns.values():
+                            if len(columns) > 1:
+                                progress[:, columns[1:]] = progress[:, columns[:1]]
+
+                earned_hours, percent_complete_hours, earned_quantity, percent_complete_quantity = \
+                    EarnedValueService.compute_earned_values(progress, weights, budgeted_hours, budgeted_quantity)
+
+                db.session.execute(
+                    work_item.update().where(work_item.c.id == bindparam("item_id")).values(
+                        earned_man_hours=bindparam("earned_man_hours"),
+                        percent_complete_hours=bindparam("percent_complete_hours"),
+                        earned_quantity=bindparam("earned_quantity"),
+                        percent_complete_quantity=bindparam("percent_complete_quantity")
+                    ),
+                    [
+                        {
+                            "item_id": item_id,
+                            "earned_man_hours": hours,
+                            "percent_complete_hours": hours_percent,
+                            "earned_quantity": quantity,
+                            "percent_complete_quantity": quantity_percent
+                        }
+                        for item_id, hours, hours_percent, quantity, quantity_percent in zip(
+                            ids.tolist(), earned_hours.tolist(), percent_complete_hours.tolist(),
+                            earned_quantity.tolist(), percent_complete_quantity.tolist()
+                        )
+                    ]
+                )
+
+                # Fold the earned deltas into the summaries, grouped per (project, sub job, cost code)
+                groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+                inverse = inverse.reshape(-1)
+                hours_delta = np.bincount(inverse, weights=earned_hours - old_earned_hours, minlength=len(groups))
+                quantity_delta = np.bincount(inverse, weights=earned_quantity - old_earned_quantity, minlength=len(groups))
+                deltas = {}
+                for (group_project_id, sub_job_id, cost_code_id), hours, quantity in zip(
+                        groups.tolist(), hours_delta.tolist(), quantity_delta.tolist()):
+                    add_summary_delta(deltas, group_project_id, sub_job_id, cost_code_id, [0.0, hours, 0.0, quantity], 0)
+                apply_summary_deltas(db.session.connection(), deltas)
+                bump_project_revisions(db.session.connection(), set(groups[:, 0].tolist()))
+
+            # Commit also expires loaded work items that still hold the old earned values
+            db.session.commit()
+
+            result = {
+                "rule_id": rule_id,
+                "items": len(rows),
+                "seconds": time.perf_counter() - started
+            }
+            logger.info(f"Recalculated {result['items']} work items for rule {rule_id} in {result['seconds']:.3f}s")
+            return result
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recalculating earned values for rule {rule_id}: {str(e)}")
+            raise
@@ -0,0 +1,375 @@
+"""
+EVMService for Magellan EV Tracker v3.0
+- Earned value management metrics in man hours for every level of the tree:
+  project -> sub job -> cost code -> work item
+  - BAC: budgeted hours, EV: earned hours, AC: actual hours
+  - PV: budgeted hours times the share of the planned duration elapsed at the
+    status date, linear between planned start and finish (the work item's
+    dates, else the project's); work items without a plan add no PV
+  - SV = EV - PV, CV = EV - AC, SPI = EV / PV, CPI = EV / AC
+  - EAC = BAC / CPI (BAC while nothing is spent), ETC = EAC - AC,
+    VAC = BAC - EAC, TCPI = (BAC - EV) / (BAC - AC)
+- One query loads a project's work items into NumPy columns; group totals
+  come from np.bincount and every ratio is computed on whole arrays at once,
+  so no Python code runs per work item
+- Results are cached per project data revision and status date
+"""
+from datetime import date
+from models import db, Project, WorkItem
+from services.revision_service import RevisionService
+from utils.service_cache import ServiceCache
+from sqlalchemy import select
+import numpy as np
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Metrics of large projects hold several arrays per level, so they get their own small cache
+METRICS_CACHE_TTL = 300  # seconds
+METRICS_CACHE_SIZE = 16  # projects and status dates
+
+metrics_cache = ServiceCache(ttl=METRICS_CACHE_TTL, max_size=METRICS_CACHE_SIZE)
+
+# Summed columns; every other metric is derived from them
+SUM_COLUMNS = ('budgeted_hours', 'planned_hours', 'earned_hours', 'actual_hours',
+               'budgeted_quantity', 'earned_quantity', 'item_count')
+
+# Derived columns, in the order computed by derive_metrics
+DERIVED_COLUMNS = ('percent_complete', 'percent_planned', 'schedule_variance', 'cost_variance',
+                   'spi', 'cpi', 'eac', 'etc', 'vac', 'tcpi')
+
+# Work item attributes the metrics are computed from, in columns_from_rows order
+COLUMN_FIELDS = ('id', 'sub_job_id', 'cost_code_id', 'budgeted_man_hours', 'earned_man_hours', 'actual_man_hours',
+                 'budgeted_quantity', 'earned_quantity', 'planned_start', 'planned_finish')
+
+# Standard EVM names of the summed hour columns, added to every metrics dictionary
+EVM_ALIASES = (('bac', 'budgeted_hours'), ('pv', 'planned_hours'), ('ev', 'earned_hours'), ('ac', 'actual_hours'))
+
+
+def _ratio(numerator, denominator):
+    # Element-wise numerator / denominator, NaN where the denominator is not positive
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def planned_fraction(start, finish, status_ordinal):
+    """
+    Share of the planned duration elapsed at the status date
+
+    Args:
+        start (numpy.ndarray): Planned start day ordinals, NaN without a plan
+        finish (numpy.ndarray): Planned finish day ordinals, NaN without a plan
+        status_ordinal (int): Status date as a day ordinal
+
+    Returns:
+        numpy.ndarray: Fractions in [0, 1]; 0 without a plan
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Work is planned through the whole finish day
+        duration = finish - start + 1
+        fraction = np.clip((status_ordinal - start + 1) / duration, 0.0, 1.0)
+    return np.where(np.isnan(fraction), 0.0, fraction)
+
+
+def derive_metrics(sums):
+    """
+    Compute the derived EVM metrics from summed columns
+
+    Args:
+        sums (dict): SUM_COLUMNS name -> numpy array (one element per node)
+
+    Returns:
+        dict: DERIVED_COLUMNS name -> numpy array; NaN where a metric is undefined
+    """
+    bac = sums['budgeted_hours']
+    pv = sums['planned_hours']
+    ev = sums['earned_hours']
+    ac = sums['actual_hours']
+
+    cpi = _ratio(ev, ac)
+    # Nothing spent yet: the budget stands; spent without earning: no estimate
+    eac = np.where(ac > 0, _ratio(bac, cpi), bac)
+    return {
+        'percent_complete': np.nan_to_num(_ratio(ev, bac)) * 100,
+        'percent_planned': np.nan_to_num(_ratio(pv, bac)) * 100,
+        'schedule_variance': ev - pv,
+        'cost_variance': ev - ac,
+        'spi': _ratio(ev, pv),
+        'cpi': cpi,
+        'eac': eac,
+        'etc': eac - ac,
+        'vac': bac - eac,
+        'tcpi': _ratio(bac - ev, bac - ac)
+    }
+
+
+class EVMLevel:
+    """
+    Metrics of every node of one tree level as columns, looked up by node ID
+    """
+
+    def __init__(self, ids, sums):
+        self.ids = ids
+        self.columns = dict(sums)
+        self.columns.update(derive_metrics(sums))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, index):
+        """Metrics of the node at a position as a dictionary; undefined metrics are None"""
+        metrics = {}
+        for name, values in self.columns.items():
+            value = values[index].item()
+            metrics[name] = None if value != value else value
+        metrics['item_count'] = int(metrics['item_count'])
+        for alias, name in EVM_ALIASES:
+            metrics[alias] = metrics[name]
+        return metrics
+
+    def get(self, node_id):
+        """
+        Metrics of one node
+
+        Args:
+            node_id (int): Node ID
+
+        Returns:
+            dict: Metrics, or None if the node has no work items
+        """
+        index = int(np.searchsorted(self.ids, node_id))
+        if index == len(self.ids) or self.ids[index] != node_id:
+            return None
+        return self.row(index)
+
+    def rows(self):
+        """Metrics of every node keyed by node ID"""
+        return {node_id: self.row(index) for index, node_id in enumerate(self.ids.tolist())}
+
+
+class EVMMetrics:
+    """
+    EVM metrics of a project at a status date, for the project and each of
+    its sub jobs, cost codes and work items
+    """
+
+    def __init__(self, project_id, status_date, project, sub_jobs, cost_codes, work_items):
+        self.project_id = project_id
+        self.status_date = status_date
+        self.project = project
+        self.sub_jobs = sub_jobs
+        self.cost_codes = cost_codes
+        self.work_items = work_items
+
+    def serialize(self, include_work_items=False):
+        metrics = {
+            "project_id": self.project_id,
+            "status_date": self.status_date.isoformat(),
+            "project": self.project.row(0),
+            "sub_jobs": self.sub_jobs.rows(),
+            "cost_codes": self.cost_codes.rows()
+        }
+        if include_work_items:
+            metrics["work_items"] = self.work_items.rows()
+        return metrics
+
+
+class EVMService:
+    """
+    Service for earned value management metrics
+    """
+
+    @staticmethod
+    def columns_from_rows(rows):
+        """
+        Turn work item rows into the columns the metrics are computed from
+
+        Args:
+            rows (list): Tuples of the COLUMN_FIELDS values of each work item, in any order
+
+        Returns:
+            dict: NumPy arrays in work item ID order; planned dates as day ordinals, NaN when missing
+        """
+        (ids, sub_job_ids, cost_code_ids, budgeted_hours, earned_hours, actual_hours,
+         budgeted_quantity, earned_quantity, planned_start, planned_finish) = (
+            zip(*rows) if rows else ((),) * len(COLUMN_FIELDS)
+        )
+
+        def ordinals(dates):
+            return np.array([day.toordinal() if day else np.nan for day in dates], dtype=float)
+
+        def numbers(values):
+            # None becomes NaN, then 0
+            return np.nan_to_num(np.array(values, dtype=float))
+
+        columns = {
+            'id': np.array(ids, dtype=np.int64),
+            'sub_job_id': np.array(sub_job_ids, dtype=np.int64),
+            'cost_code_id': np.array(cost_code_ids, dtype=np.int64),
+            'budgeted_hours': numbers(budgeted_hours),
+            'earned_hours': numbers(earned_hours),
+            'actual_hours': numbers(actual_hours),
+            'budgeted_quantity': numbers(budgeted_quantity),
+            'earned_quantity': numbers(earned_quantity),
+            'planned_start': ordinals(planned_start),
+            'planned_finish': ordinals(planned_finish)
+        }
+        # Sorting here is cheaper than an ORDER BY, which needs a temporary B-tree for a project filter
+        order = np.argsort(columns['id'], kind='stable')
+        return {name: values[order] for name, values in columns.items()}
+
+    @staticmethod
+    def load_columns(project_id):
+        """
+        Load the columns of a project's work items with one query
+
+        Args:
+            project_id (int): Project ID
+
+        Returns:
+            dict: NumPy arrays in work item ID order (see columns_from_rows)
+        """
+        # A Core select on the table skips the ORM row processing, most of the cost for large projects
+        table = WorkItem.__table__
+        rows = db.session.connection().execute(
+            select(*(table.c[field] for field in COLUMN_FIELDS)).where(table.c.project_id == project_id)
+        ).all()
+        return EVMService.columns_from_rows(rows)
+
+    @staticmethod
+    def compute_metrics(project_id, columns, status_date, project_start=None, project_finish=None):
+        """
+        Compute the metrics of every level from work item columns
+
+        Args:
+            project_id (int): Project ID
+            columns (dict): Work item columns (see load_columns)
+            status_date (date): Date planned value is measured at
+            project_start (date, optional): Planned start of items without their own
+            project_finish (date, optional): Planned finish of items without their own
+
+        Returns:
+            EVMMetrics: Metrics of the project, sub jobs, cost codes and work items
+        """
+        start = columns['planned_start']
+        finish = columns['planned_finish']
+        if project_start is not None:
+            start = np.where(np.isnan(start), project_start.toordinal(), start)
+        if project_finish is not None:
+            finish = np.where(np.isnan(finish), project_finish.toordinal(), finish)
+
+        item_sums = {
+            'budgeted_hours': columns['budgeted_hours'],
+            'planned_hours': columns['budgeted_hours'] * planned_fraction(start, finish, status_date.toordinal()),
+            'earned_hours': columns['earned_hours'],
+            'actual_hours': columns['actual_hours'],
+            'budgeted_quantity': columns['budgeted_quantity'],
+            'earned_quantity': columns['earned_quantity'],
+            'item_count': np.ones(len(columns['id']))
+        }
+
+        def group(keys):
+            node_ids, inverse = np.unique(keys, return_inverse=True)
+            return EVMLevel(node_ids, {
+                name: np.bincount(inverse, weights=values, minlength=len(node_ids))
+                for name, values in item_sums.items()
+            })
+
+        project_sums = {name: np.array([values.sum()]) for name, values in item_sums.items()}
+        return EVMMetrics(
+            project_id,
+            status_date,
+            EVMLevel(np.array([project_id], dtype=np.int64), project_sums),
+            group(columns['sub_job_id']),
+            group(columns['cost_code_id']),
+            EVMLevel(columns['id'], item_sums)
+        )
+
+    @staticmethod
+    def get_metrics(project_id, status_date=None):
+        """
+        Get the EVM metrics of a project and everything in it
+
+        Cached per project data revision and status date, so repeated calls
+        (project page, sub job pages, work item pages) share one computation.
+        The loaded work item columns are cached per revision on their own, so
+        another status date only repeats the vectorized computation.
+
+        Args:
+            project_id (int): Project ID
+            status_date (date, optional): Date planned value is measured at, defaults to today
+
+        Returns:
+            EVMMetrics: Metrics, or None if the project does not exist
+        """
+        status_date = status_date or date.today()
+
+        def load_project():
+            project = db.session.execute(
+                select(Project.planned_start, Project.planned_finish).where(Project.id == project_id)
+            ).first()
+            if project is None:
+                return None
+            return project.planned_start, project.planned_finish, EVMService.load_columns(project_id)
+
+        def compute(loaded):
+            if loaded is None:
+                return None
+            planned_start, planned_finish, columns = loaded
+            return EVMService.compute_metrics(project_id, columns, status_date, planned_start, planned_finish)
+
+        try:
+            current = RevisionService.get_revision(project_id)
+            # Without a revision row there is nothing to key on, so always recompute
+            if current is None:
+                return compute(load_project())
+            return metrics_cache.get_or_load(
+                ('evm', project_id, current.revision, status_date.toordinal()),
+                lambda: compute(metrics_cache.get_or_load(('evm_columns', project_id, current.revision), load_project))
+            )
+        except Exception as e:
+            logger.error(f"Error computing EVM metrics of project {project_id}: {str(e)}")
+            raise
+
+    @staticmethod
+    def empty_metrics():
+        """
+        Metrics of a node without work items
+
+        Returns:
+            dict: Zero totals; undefined ratios are None
+        """
+        return EVMLevel(np.zeros(1, dtype=np.int64), {name: np.zeros(1) for name in SUM_COLUMNS}).row(0)
+
+    @staticmethod
+    def get_work_item_metrics(work_item, status_date=None):
+        """
+        Get the EVM metrics of one work item
+
+        Read from the project's cached metrics; a work item that is not in
+        them (e.g. not committed yet) is computed on its own.
+
+        Args:
+            work_item (WorkItem): Work item
+            status_date (date, optional): Date planned value is measured at, defaults to today
+
+        Returns:
+            dict: Metrics of the work item
+        """
+        status_date = status_date or date.today()
+        project_metrics = EVMService.get_metrics(work_item.project_id, status_date) if work_item.id else None
+        metrics = project_metrics.work_items.get(work_item.id) if project_metrics else None
+        if metrics is not None:
+            return metrics
+
+        project = db.session.get(Project, work_item.project_id) if work_item.project_id else None
+        values = [getattr(work_item, field) for field in COLUMN_FIELDS]
+        # An unsaved work item may not have its ID or parent IDs yet
+        values[:3] = [value or 0 for value in values[:3]]
+        columns = EVMService.columns_from_rows([values])
+        item_metrics = EVMService.compute_metrics(
+            work_item.project_id, columns, status_date,
+            project.planned_start if project else None, project.planned_finish if project else None
+        )
+        return item_metrics.work_items.row(0)
@@ -0,0 +1,60 @@
+"""
+Named eager-loading profiles for the service layer of Magellan EV Tracker v3.0
+- Every relationship in models.py is lazy, so listing pages that touch a
+  relationship per row issue one SELECT per row (N+1)
+- A profile names the loader options a page needs so services can fetch
+  them up front with selectinload/joinedload and count subqueries
+- Profiles are callables because backref attributes such as WorkItem.cost_code
+  only exist once the mappers are configured
+"""
+from models import Project, SubJob, WorkItem, CostCode
+from sqlalchemy.orm import joinedload, selectinload, undefer
+
+# Work item listings: 'list' covers the cost code column of the work item tables,
+# 'progress' also brings the rule of credit and step progress for progress/report views
+WORK_ITEM_PROFILES = {
+    'default': lambda: (),
+    'list': lambda: (
+        joinedload(WorkItem.cost_code),
+    ),
+    'progress': lambda: (
+        joinedload(WorkItem.cost_code).joinedload(CostCode.rule_of_credit),
+        selectinload(WorkItem.step_progress),
+    ),
+}
+
+# Sub job listings: 'with_counts' loads the work item count as a correlated subquery
+SUB_JOB_PROFILES = {
+    'default': lambda: (),
+    'with_counts': lambda: (
+        undefer(SubJob.work_item_count),
+    ),
+}
+
+# Project listings: 'with_counts' loads the sub job count as a correlated subquery
+PROJECT_PROFILES = {
+    'default': lambda: (),
+    'with_counts': lambda: (
+        undefer(Project.sub_job_count),
+    ),
+}
+
+
+def apply_load_profile(query, profiles, profile):
+    """
+    Apply a named loading profile to a query
+    
+    Args:
+        query: SQLAlchemy query
+        profiles (dict): Profile name -> callable returning loader options
+        profile (str): Profile name, None for the default profile
+        
+    Returns:
+        Query with the profile's loader options
+    """
+    if profile is None:
+        profile = 'default'
+    if profile not in profiles:
+        raise ValueError(f"Unknown load profile: {profile}")
+    options = profiles[profile]()
+    return query.options(*options) if options else query
@@ -2,13 +2,28 @@
 Fixed ProjectService with count_projects method for Magellan EV Tracker v3.0
 - Added missing count_projects method required by dashboard
 - Enhanced error handling and logging
+- Project options for selects come from the service cache, keyed by the
+  global data revision (services.revision_service)
+- get_project_metrics returns the earned value management metrics (services.evm_service)
 """
-from models import Project, db
+from collections import namedtuple
+from models import Project, ProjectSummary, db
+from services.summary_service import SummaryService
+from services.evm_service import EVMService
+from services.load_profiles import PROJECT_PROFILES, apply_load_profile
+from services.revision_service import RevisionService
+from utils.service_cache import service_cache
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Cache namespace of the project option list
+PROJECT_CACHE = 'projects'
+
+# Detached (id, name) pair for select boxes; safe to share between requests
+ProjectOption = namedtuple('ProjectOption', ['id', 'name'])
+
 class ProjectService:
     """
     Service for project-related operations
@@ -30,6 +45,28 @@ class ProjectService:
             logger.error(f"Error retrieving all projects: {str(e)}")
             return []
     
+    @staticmethod
+    def get_project_options():
+        """
+        Get the id and name of every project for select boxes
+        
+        Returns:
+            list: List of ProjectOption ordered by id
+        """
+        def load_options():
+            rows = db.session.query(Project.id, Project.name).order_by(Project.id).all()
+            return [ProjectOption(row.id, row.name) for row in rows]
+        
+        try:
+            current = RevisionService.get_revision()
+            # Without a revision row there is nothing to key on, so always load
+            if current is None:
+                return load_options()
+            return service_cache.get_or_load((PROJECT_CACHE, 'options', current.revision), load_options)
+        except Exception as e:
+            logger.error(f"Error retrieving project options: {str(e)}")
+            return []
+    
     @staticmethod
     def get_project_details(project_id):
         """
@@ -50,6 +87,61 @@ class ProjectService:
             logger.error(f"Error retrieving project {project_id}: {str(e)}")
             return None
     
+    @staticmethod
+    def get_projects_with_totals():
+        """
+        Get all projects with their budgeted/earned hours and progress
+        
+        Totals are read from the materialized project summaries, one row per
+        project, instead of scanning the work items.
+        
+        Returns:
+            list: List of dictionaries with the project and its totals
+        """
+        try:
+            query = apply_load_profile(Project.query, PROJECT_PROFILES, 'with_counts')
+            projects = query.order_by(Project.id).all()
+            summaries = SummaryService.get_project_summaries()
+            
+            projects_with_data = []
+            for project in projects:
+                totals = summaries.get(project.id) or SummaryService.empty_summary(ProjectSummary, project_id=project.id)
+                projects_with_data.append({
+                    'project': project,
+                    'overall_progress': totals.percent_complete,
+                    'total_budgeted_hours': totals.budgeted_hours,
+                    'total_earned_hours': totals.earned_hours,
+                    'total_budgeted_quantity': totals.budgeted_quantity,
+                    'total_earned_quantity': totals.earned_quantity,
+                    'work_item_count': totals.item_count
+                })
+            
+            logger.info(f"Retrieved totals for {len(projects_with_data)} projects")
+            return projects_with_data
+        except Exception as e:
+            logger.error(f"Error retrieving project totals: {str(e)}")
+            return []
+    
+    @staticmethod
+    def get_project_metrics(project_id, status_date=None):
+        """
+        Get the earned value management metrics of a project
+        
+        Args:
+            project_id (int): Project ID
+            status_date (date, optional): Date planned value is measured at, defaults to today
+            
+        Returns:
+            dict: Budgeted/earned hours and quantities, percent complete and
+                PV, EV, AC, SV, CV, SPI, CPI, EAC, ETC, VAC and TCPI
+        """
+        try:
+            metrics = EVMService.get_metrics(project_id, status_date)
+            return metrics.project.row(0) if metrics else EVMService.empty_metrics()
+        except Exception as e:
+            logger.error(f"Error retrieving metrics of project {project_id}: {str(e)}")
+            return EVMService.empty_metrics()
+    
     @staticmethod
     def count_projects():
         """
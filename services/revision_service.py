@@ -0,0 +1,40 @@
+"""
+RevisionService for Magellan EV Tracker v3.0
+- Reads the per-project data revisions maintained by models.maintain_project_revisions
+- A revision lookup is one primary key read on project_revision; it never
+  touches the work item tables
+"""
+from models import db, ProjectRevision, GLOBAL_REVISION_ID
+from sqlalchemy import select
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class RevisionService:
+    """
+    Service for project data revisions
+    """
+
+    @staticmethod
+    def get_revision(project_id=None):
+        """
+        Get the data revision of a project, or of all data
+
+        Args:
+            project_id (int, optional): Project ID; None for the global revision
+
+        Returns:
+            Row: (revision, updated_at), or None when the project has no revision row
+        """
+        if project_id is None:
+            project_id = GLOBAL_REVISION_ID
+        try:
+            return db.session.execute(
+                select(ProjectRevision.revision, ProjectRevision.updated_at)
+                .where(ProjectRevision.project_id == project_id)
+            ).first()
+        except Exception as e:
+            logger.error(f"Error retrieving revision of project {project_id}: {str(e)}")
+            return None
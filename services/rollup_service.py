@@ -0,0 +1,215 @@
+"""
+RollupService for Magellan EV Tracker v3.0
+- Computes budgeted/earned hours and quantities with grouped SQL SUM aggregates
+- One round trip returns totals per project, sub job, discipline and cost code
+- Replaces the per-row Python sums in the Project and SubJob model properties
+- Step-level progress per cost code from the normalized step progress table
+"""
+from models import db, WorkItem, WorkItemStepProgress, CostCode
+from sqlalchemy import func
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class RollupTotals:
+    """
+    Budgeted and earned totals for one node of the project tree
+    """
+
+    def __init__(self, budgeted_hours=0.0, earned_hours=0.0, budgeted_quantity=0.0,
+                 earned_quantity=0.0, item_count=0):
+        self.budgeted_hours = budgeted_hours
+        self.earned_hours = earned_hours
+        self.budgeted_quantity = budgeted_quantity
+        self.earned_quantity = earned_quantity
+        self.item_count = item_count
+
+    def add(self, budgeted_hours, earned_hours, budgeted_quantity, earned_quantity, item_count):
+        self.budgeted_hours += budgeted_hours
+        self.earned_hours += earned_hours
+        self.budgeted_quantity += budgeted_quantity
+        self.earned_quantity += earned_quantity
+        self.item_count += item_count
+
+    @property
+    def percent_complete(self):
+        """Percent complete based on earned vs budgeted hours"""
+        if not self.budgeted_hours:
+            return 0
+        return (self.earned_hours / self.budgeted_hours) * 100
+
+    def serialize(self):
+        return {
+            "budgeted_hours": self.budgeted_hours,
+            "earned_hours": self.earned_hours,
+            "budgeted_quantity": self.budgeted_quantity,
+            "earned_quantity": self.earned_quantity,
+            "item_count": self.item_count,
+            "percent_complete": self.percent_complete
+        }
+
+
+class Rollup:
+    """
+    Totals for every level of the tree, built from one grouped query.
+
+    Disciplines are keyed by (project_id, discipline) because the same
+    discipline name is reused across projects.
+    """
+
+    def __init__(self):
+        self.grand_total = RollupTotals()
+        self.projects = {}
+        self.sub_jobs = {}
+        self.disciplines = {}
+        self.cost_codes = {}
+        # Owning project of each sub job and cost code seen in the rollup
+        self.sub_job_project_ids = {}
+        self.cost_code_project_ids = {}
+
+    def project(self, project_id):
+        return self.projects.get(project_id) or RollupTotals()
+
+    def sub_job(self, sub_job_id):
+        return self.sub_jobs.get(sub_job_id) or RollupTotals()
+
+    def discipline(self, project_id, discipline):
+        return self.disciplines.get((project_id, discipline)) or RollupTotals()
+
+    def cost_code(self, cost_code_id):
+        return self.cost_codes.get(cost_code_id) or RollupTotals()
+
+
+class RollupService:
+    """
+    Service for earned-value rollups computed in the database
+    """
+
+    @staticmethod
+    def get_rollup(project_id=None, sub_job_id=None):
+        """
+        Compute totals for every project, sub job, discipline and cost code
+
+        The database groups work items at the finest grain (project, sub job,
+        cost code) and the coarser levels are folded from those few rows, so
+        the whole tree costs a single query.
+
+        Args:
+            project_id (int, optional): Limit the rollup to one project
+            sub_job_id (int, optional): Limit the rollup to one sub job
+
+        Returns:
+            Rollup: Totals keyed by id at each level
+        """
+        query = db.session.query(
+            WorkItem.project_id,
+            WorkItem.sub_job_id,
+            WorkItem.cost_code_id,
+            CostCode.discipline,
+            func.coalesce(func.sum(WorkItem.budgeted_man_hours), 0.0),
+            func.coalesce(func.sum(WorkItem.earned_man_hours), 0.0),
+            func.coalesce(func.sum(WorkItem.budgeted_quantity), 0.0),
+            func.coalesce(func.sum(WorkItem.earned_quantity), 0.0),
+            func.count(WorkItem.id)
+        ).outerjoin(CostCode, CostCode.id == WorkItem.cost_code_id)
+
+        if project_id is not None:
+            query = query.filter(WorkItem.project_id == project_id)
+        if sub_job_id is not None:
+            query = query.filter(WorkItem.sub_job_id == sub_job_id)
+
+        query = query.group_by(
+            WorkItem.project_id,
+            WorkItem.sub_job_id,
+            WorkItem.cost_code_id,
+            CostCode.discipline
+        )
+
+        rollup = Rollup()
+        for row in query:
+            row_project_id, row_sub_job_id, row_cost_code_id, discipline = row[:4]
+            values = row[4:]
+
+            rollup.grand_total.add(*values)
+            rollup.projects.setdefault(row_project_id, RollupTotals()).add(*values)
+            rollup.sub_jobs.setdefault(row_sub_job_id, RollupTotals()).add(*values)
+            rollup.cost_codes.setdefault(row_cost_code_id, RollupTotals()).add(*values)
+            rollup.sub_job_project_ids[row_sub_job_id] = row_project_id
+            rollup.cost_code_project_ids[row_cost_code_id] = row_project_id
+            if discipline is not None:
+                rollup.disciplines.setdefault((row_project_id, discipline), RollupTotals()).add(*values)
+
+        return rollup
+
+    @staticmethod
+    def get_project_totals(project_id):
+        """
+        Get totals for a single project
+
+        Args:
+            project_id (int): Project ID
+
+        Returns:
+            RollupTotals: Project totals
+        """
+        if project_id is None:
+            return RollupTotals()
+        return RollupService.get_rollup(project_id=project_id).project(project_id)
+
+    @staticmethod
+    def get_sub_job_totals(sub_job_id):
+        """
+        Get totals for a single sub job
+
+        Args:
+            sub_job_id (int): Sub Job ID
+
+        Returns:
+            RollupTotals: Sub job totals
+        """
+        if sub_job_id is None:
+            return RollupTotals()
+        return RollupService.get_rollup(sub_job_id=sub_job_id).sub_job(sub_job_id)
+
+    @staticmethod
+    def get_step_rollups(project_id):
+        """
+        Get rule of credit step completion per cost code for a project
+
+        Items without a progress row for a step count as 0% for that step,
+        so average_percent is taken over every item of the cost code.
+
+        Args:
+            project_id (int): Project ID
+
+        Returns:
+            dict: Per cost code ID, a dictionary of step name -> items_reported,
+                average_percent and hours_complete (step percent x budgeted hours)
+        """
+        item_counts = dict(
+            db.session.query(WorkItem.cost_code_id, func.count(WorkItem.id))
+            .filter(WorkItem.project_id == project_id)
+            .group_by(WorkItem.cost_code_id)
+        )
+
+        query = db.session.query(
+            WorkItem.cost_code_id,
+            WorkItemStepProgress.step_name,
+            func.count(WorkItemStepProgress.work_item_id),
+            func.coalesce(func.sum(WorkItemStepProgress.percent_complete), 0.0),
+            func.coalesce(func.sum(WorkItemStepProgress.percent_complete * WorkItem.budgeted_man_hours), 0.0) / 100.0
+        ).join(WorkItem, WorkItem.id == WorkItemStepProgress.work_item_id).filter(
+            WorkItem.project_id == project_id
+        ).group_by(WorkItem.cost_code_id, WorkItemStepProgress.step_name)
+
+        step_rollups = {}
+        for cost_code_id, step_name, items_reported, percent_sum, hours_complete in query:
+            item_count = item_counts.get(cost_code_id) or items_reported
+            step_rollups.setdefault(cost_code_id, {})[step_name] = {
+                "items_reported": items_reported,
+                "average_percent": percent_sum / item_count if item_count else 0,
+                "hours_complete": hours_complete
+            }
+        return step_rollups
@@ -4,6 +4,8 @@ Fixed RuleOfCreditService with count_rules_of_credit method for Magellan EV Trac
 - Enhanced error handling and logging
 """
 from models import RuleOfCredit, db
+from services.earned_value_service import EarnedValueService
+from utils.rule_step_cache import RuleStepCache
 import logging
 
 # Configure logging
@@ -122,6 +124,34 @@ class RuleOfCreditService:
             logger.error(f"Error updating rule of credit {rule_id}: {str(e)}")
             raise
     
+    @staticmethod
+    def update_rule_steps(rule_id, steps):
+        """
+        Replace the steps of a rule of credit
+        
+        Args:
+            rule_id (int): Rule of Credit ID
+            steps (list): Steps as dicts with name and weight
+            
+        Returns:
+            RuleOfCredit: Updated rule of credit
+        """
+        try:
+            rule = RuleOfCredit.query.get(rule_id)
+            if rule:
+                rule.set_steps(steps)
+                db.session.commit()
+                RuleStepCache.invalidate(rule.id)
+                logger.info(f"Rule of credit steps updated successfully: {rule.id}, {rule.name}")
+                
+                # Bring every work item using this rule in line with its new weights
+                EarnedValueService.recalculate_rule(rule_id)
+            return rule
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error updating steps of rule of credit {rule_id}: {str(e)}")
+            raise
+    
     @staticmethod
     def delete_rule_of_credit(rule_id):
         """
@@ -138,6 +168,7 @@ class RuleOfCreditService:
             if rule:
                 db.session.delete(rule)
                 db.session.commit()
+                RuleStepCache.invalidate(rule_id)
                 logger.info(f"Rule of credit deleted successfully: {rule_id}")
                 return True
             return False
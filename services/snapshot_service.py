@@ -0,0 +1,300 @@
+"""
+SnapshotService for Magellan EV Tracker v3.0
+- Records earned-value snapshots: the earned hours and quantity of every work
+  item of a project at a cutoff date, for S-curves and period-over-period progress
+- Per-item values are stored as packed columns (utils.packed_columns), one
+  ev_snapshot row per project and cutoff date instead of one row per item
+- Project, sub job and discipline totals of each snapshot are written next to
+  it (ev_snapshot_total), so a curve is one index range read of one row per
+  cutoff date; the packed columns are only read for a work item's history
+- Snapshots are taken periodically with `flask snapshot-ev` (e.g. weekly from
+  cron) or through the API; retaking a cutoff date replaces its snapshot
+"""
+from bisect import bisect_left
+from datetime import date
+from models import db, Project, WorkItem, CostCode, EVSnapshot, EVSnapshotTotal
+from services.rollup_service import RollupTotals
+from utils.packed_columns import pack_ids, pack_floats, unpack_ids, unpack_floats
+from sqlalchemy import delete, select
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Work item rows fetched per round trip while taking a snapshot
+SNAPSHOT_BATCH_SIZE = 5000
+
+# Curve levels and the ev_snapshot_total.level they read
+CURVE_LEVELS = ('project', 'sub_job', 'discipline')
+
+
+class SnapshotService:
+    """
+    Service for earned-value snapshots and curves
+    """
+
+    @staticmethod
+    def take_snapshot(project_id, cutoff_date=None):
+        """
+        Record the earned values of every work item of a project
+
+        Args:
+            project_id (int): Project ID
+            cutoff_date (date, optional): Cutoff date, defaults to today
+
+        Returns:
+            EVSnapshot: The new snapshot
+
+        Raises:
+            ValueError: If the project does not exist
+        """
+        cutoff_date = cutoff_date or date.today()
+        try:
+            if db.session.get(Project, project_id) is None:
+                raise ValueError(f"Project {project_id} not found")
+
+            rows = db.session.execute(
+                select(WorkItem.id, WorkItem.sub_job_id, CostCode.discipline, WorkItem.budgeted_man_hours,
+                       WorkItem.earned_man_hours, WorkItem.budgeted_quantity, WorkItem.earned_quantity)
+                .join(CostCode, CostCode.id == WorkItem.cost_code_id)
+                .where(WorkItem.project_id == project_id)
+                .order_by(WorkItem.id)
+                .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+            )
+            work_item_ids = []
+            earned_hours = []
+            earned_quantity = []
+            totals = {('project', ''): RollupTotals()}
+            for row in rows:
+                work_item_ids.append(row.id)
+                earned_hours.append(row.earned_man_hours)
+                earned_quantity.append(row.earned_quantity)
+                values = (row.budgeted_man_hours or 0.0, row.earned_man_hours or 0.0,
+                          row.budgeted_quantity or 0.0, row.earned_quantity or 0.0, 1)
+                for scope in (('project', ''), ('sub_job', str(row.sub_job_id)), ('discipline', row.discipline)):
+                    scope_totals = totals.get(scope)
+                    if scope_totals is None:
+                        scope_totals = totals[scope] = RollupTotals()
+                    scope_totals.add(*values)
+
+            SnapshotService._delete_snapshots(project_id, cutoff_date)
+            snapshot = EVSnapshot(
+                project_id=project_id,
+                cutoff_date=cutoff_date,
+                item_count=len(work_item_ids),
+                work_item_ids=pack_ids(work_item_ids),
+                earned_hours=pack_floats(earned_hours),
+                earned_quantity=pack_floats(earned_quantity)
+            )
+            db.session.add(snapshot)
+            db.session.flush()
+            db.session.execute(EVSnapshotTotal.__table__.insert(), [
+                {
+                    "snapshot_id": snapshot.id,
+                    "project_id": project_id,
+                    "cutoff_date": cutoff_date,
+                    "level": level,
+                    "scope_key": scope_key,
+                    "budgeted_hours": scope_totals.budgeted_hours,
+                    "earned_hours": scope_totals.earned_hours,
+                    "budgeted_quantity": scope_totals.budgeted_quantity,
+                    "earned_quantity": scope_totals.earned_quantity,
+                    "item_count": scope_totals.item_count
+                }
+                for (level, scope_key), scope_totals in totals.items()
+            ])
+            db.session.commit()
+            logger.info(f"Took snapshot of project {project_id} at {cutoff_date}: {len(work_item_ids)} work items")
+            return snapshot
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error taking snapshot of project {project_id}: {str(e)}")
+            raise
+
+    @staticmethod
+    def take_all_snapshots(cutoff_date=None):
+        """
+        Take a snapshot of every project, each in its own transaction
+
+        Args:
+            cutoff_date (date, optional): Cutoff date, defaults to today
+
+        Returns:
+            dict: Snapshots taken and errors by project ID
+        """
+        project_ids = db.session.execute(select(Project.id).order_by(Project.id)).scalars().all()
+        snapshots = []
+        errors = {}
+        for project_id in project_ids:
+            try:
+                snapshots.append(SnapshotService.take_snapshot(project_id, cutoff_date))
+            except Exception as e:
+                errors[project_id] = str(e)
+        return {"snapshots": snapshots, "errors": errors}
+
+    @staticmethod
+    def delete_snapshot(project_id, cutoff_date):
+        """
+        Delete the snapshot of a project at a cutoff date
+
+        Args:
+            project_id (int): Project ID
+            cutoff_date (date): Cutoff date
+
+        Returns:
+            bool: True if a snapshot was deleted
+        """
+        try:
+            deleted = SnapshotService._delete_snapshots(project_id, cutoff_date)
+            db.session.commit()
+            return deleted > 0
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error deleting snapshot of project {project_id} at {cutoff_date}: {str(e)}")
+            raise
+
+    @staticmethod
+    def _delete_snapshots(project_id, cutoff_date):
+        """Delete a snapshot and its totals without committing; returns the number of snapshots deleted"""
+        snapshot_ids = db.session.execute(
+            select(EVSnapshot.id).where(EVSnapshot.project_id == project_id, EVSnapshot.cutoff_date == cutoff_date)
+        ).scalars().all()
+        if not snapshot_ids:
+            return 0
+        # ORM deletes, so a retaken snapshot does not meet its predecessor in the identity map
+        db.session.execute(delete(EVSnapshotTotal).where(EVSnapshotTotal.snapshot_id.in_(snapshot_ids)))
+        db.session.execute(
+            delete(EVSnapshot).where(EVSnapshot.id.in_(snapshot_ids)).execution_options(synchronize_session="fetch")
+        )
+        return len(snapshot_ids)
+
+    @staticmethod
+    def get_snapshots(project_id):
+        """
+        Get the snapshots of a project, without their packed columns
+
+        Args:
+            project_id (int): Project ID
+
+        Returns:
+            list: EVSnapshot rows ordered by cutoff date
+        """
+        try:
+            return EVSnapshot.query.filter_by(project_id=project_id).order_by(EVSnapshot.cutoff_date).all()
+        except Exception as e:
+            logger.error(f"Error retrieving snapshots of project {project_id}: {str(e)}")
+            return []
+
+    @staticmethod
+    def get_curves(project_id, level='project', scope_key=None, start_date=None, end_date=None):
+        """
+        Get earned-value curves of a project, its sub jobs or its disciplines
+
+        Each point holds the totals at one cutoff date plus the hours and
+        quantity earned since the previous snapshot of the same scope (also
+        for the first point after start_date).
+
+        Args:
+            project_id (int): Project ID
+            level (str): 'project', 'sub_job' or 'discipline'
+            scope_key (str, optional): Only this sub job ID or discipline
+            start_date (date, optional): First cutoff date
+            end_date (date, optional): Last cutoff date
+
+        Returns:
+            dict: Lists of points keyed by scope key ('' for the project curve)
+
+        Raises:
+            ValueError: If the level is unknown
+        """
+        if level not in CURVE_LEVELS:
+            raise ValueError(f"Unknown curve level {level}")
+        query = EVSnapshotTotal.query.filter_by(project_id=project_id, level=level)
+        if scope_key is not None:
+            query = query.filter_by(scope_key=str(scope_key))
+        if end_date is not None:
+            query = query.filter(EVSnapshotTotal.cutoff_date <= end_date)
+
+        curves = {}
+        previous_totals = {}
+        try:
+            for total in query.order_by(EVSnapshotTotal.scope_key, EVSnapshotTotal.cutoff_date):
+                # Points before start_date are read (one small row per cutoff date) for the period deltas only
+                previous = previous_totals.get(total.scope_key)
+                previous_totals[total.scope_key] = total
+                if start_date is not None and total.cutoff_date < start_date:
+                    continue
+                point = total.serialize()
+                point["cutoff_date"] = total.cutoff_date.isoformat()
+                point["earned_hours_period"] = total.earned_hours - (previous.earned_hours if previous else 0.0)
+                point["earned_quantity_period"] = total.earned_quantity - (previous.earned_quantity if previous else 0.0)
+                curves.setdefault(total.scope_key, []).append(point)
+            return curves
+        except Exception as e:
+            logger.error(f"Error retrieving {level} curves of project {project_id}: {str(e)}")
+            return {}
+
+    @staticmethod
+    def get_curve(project_id, sub_job_id=None, discipline=None, start_date=None, end_date=None):
+        """
+        Get the earned-value curve of a project, one of its sub jobs or one discipline
+
+        Args:
+            project_id (int): Project ID
+            sub_job_id (int, optional): Sub job ID
+            discipline (str, optional): Discipline name (ignored with a sub job)
+            start_date (date, optional): First cutoff date
+            end_date (date, optional): Last cutoff date
+
+        Returns:
+            list: Points ordered by cutoff date
+        """
+        if sub_job_id is not None:
+            level, scope_key = 'sub_job', str(sub_job_id)
+        elif discipline is not None:
+            level, scope_key = 'discipline', discipline
+        else:
+            level, scope_key = 'project', ''
+        curves = SnapshotService.get_curves(project_id, level, scope_key, start_date, end_date)
+        return curves.get(scope_key, [])
+
+    @staticmethod
+    def get_work_item_history(work_item_id, project_id=None):
+        """
+        Get the earned values of one work item at every snapshot of its project
+
+        Args:
+            work_item_id (int): Work item ID
+            project_id (int, optional): Project ID, looked up from the work item when omitted
+
+        Returns:
+            list: (cutoff_date, earned_hours, earned_quantity) dictionaries ordered by
+            cutoff date, skipping snapshots taken before the item existed
+        """
+        try:
+            if project_id is None:
+                project_id = db.session.execute(
+                    select(WorkItem.project_id).where(WorkItem.id == work_item_id)
+                ).scalar()
+                if project_id is None:
+                    return []
+            rows = db.session.execute(
+                select(EVSnapshot.cutoff_date, EVSnapshot.work_item_ids, EVSnapshot.earned_hours, EVSnapshot.earned_quantity)
+                .where(EVSnapshot.project_id == project_id)
+                .order_by(EVSnapshot.cutoff_date)
+            )
+            history = []
+            for row in rows:
+                work_item_ids = unpack_ids(row.work_item_ids)
+                index = bisect_left(work_item_ids, work_item_id)
+                if index == len(work_item_ids) or work_item_ids[index] != work_item_id:
+                    continue
+                history.append({
+                    "cutoff_date": row.cutoff_date.isoformat(),
+                    "earned_hours": unpack_floats(row.earned_hours)[index],
+                    "earned_quantity": unpack_floats(row.earned_quantity)[index]
+                })
+            return history
+        except Exception as e:
+            logger.error(f"Error retrieving snapshot history of work item {work_item_id}: {str(e)}")
+            return []
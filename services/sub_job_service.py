@@ -2,8 +2,11 @@
 Fixed SubJobService with count_sub_jobs method for Magellan EV Tracker v3.0
 - Added missing count_sub_jobs method required by dashboard
 - Enhanced error handling and logging
+- get_sub_job_metrics returns the earned value management metrics (services.evm_service)
 """
 from models import SubJob, db
+from services.evm_service import EVMService
+from services.load_profiles import SUB_JOB_PROFILES, apply_load_profile
 import logging
 
 # Configure logging
@@ -51,24 +54,49 @@ class SubJobService:
             return None
     
     @staticmethod
-    def get_project_sub_jobs(project_id):
+    def get_project_sub_jobs(project_id, profile='with_counts'):
         """
         Get all sub jobs for a project
         
         Args:
             project_id (int): Project ID
+            profile (str): Eager-loading profile from services.load_profiles
             
         Returns:
             list: List of sub jobs for the project
         """
         try:
-            sub_jobs = SubJob.query.filter_by(project_id=project_id).all()
+            query = apply_load_profile(SubJob.query, SUB_JOB_PROFILES, profile)
+            sub_jobs = query.filter_by(project_id=project_id).all()
             logger.info(f"Retrieved {len(sub_jobs)} sub jobs for project {project_id}")
             return sub_jobs
         except Exception as e:
             logger.error(f"Error retrieving sub jobs for project {project_id}: {str(e)}")
             return []
     
+    @staticmethod
+    def get_sub_job_metrics(sub_job_id, status_date=None):
+        """
+        Get the earned value management metrics of a sub job
+        
+        Read from its project's metrics, which are computed for every sub job at once.
+        
+        Args:
+            sub_job_id (int): Sub Job ID
+            status_date (date, optional): Date planned value is measured at, defaults to today
+            
+        Returns:
+            dict: Metrics as returned by ProjectService.get_project_metrics
+        """
+        try:
+            project_id = db.session.query(SubJob.project_id).filter(SubJob.id == sub_job_id).scalar()
+            metrics = EVMService.get_metrics(project_id, status_date) if project_id else None
+            sub_job_metrics = metrics.sub_jobs.get(sub_job_id) if metrics else None
+            return sub_job_metrics or EVMService.empty_metrics()
+        except Exception as e:
+            logger.error(f"Error retrieving metrics of sub job {sub_job_id}: {str(e)}")
+            return EVMService.empty_metrics()
+    
     @staticmethod
     def create_sub_job(project_id, name, sub_job_id_str, description, area, budgeted_hours=0.0):
         """
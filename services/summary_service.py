@@ -0,0 +1,209 @@
+"""
+SummaryService for Magellan EV Tracker v3.0
+- Reads the materialized project, sub job and cost code summary tables
+- Rebuilds the summaries from scratch and reports drift against the work items
+- The summaries themselves are maintained by deltas in models.maintain_ev_summaries
+"""
+from models import db, ProjectSummary, SubJobSummary, CostCodeSummary, SUMMARY_VALUE_FIELDS
+from services.rollup_service import RollupService
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Summary column names compared during drift checks
+SUMMARY_COLUMNS = [summary_column for _, summary_column in SUMMARY_VALUE_FIELDS] + ["item_count"]
+
+
+class SummaryService:
+    """
+    Service for the materialized earned-value summaries
+    """
+
+    @staticmethod
+    def get_project_summaries():
+        """
+        Get the summary row of every project
+
+        Returns:
+            dict: ProjectSummary rows keyed by project ID
+        """
+        try:
+            return {summary.project_id: summary for summary in ProjectSummary.query.all()}
+        except Exception as e:
+            logger.error(f"Error retrieving project summaries: {str(e)}")
+            return {}
+
+    @staticmethod
+    def get_project_summary(project_id):
+        """
+        Get the summary row of a project
+
+        Args:
+            project_id (int): Project ID
+
+        Returns:
+            ProjectSummary: Summary row, or an empty unsaved row if the project has no work items
+        """
+        summary = db.session.get(ProjectSummary, project_id)
+        return summary or SummaryService.empty_summary(ProjectSummary, project_id=project_id)
+
+    @staticmethod
+    def get_sub_job_summary(sub_job_id):
+        """
+        Get the summary row of a sub job
+
+        Args:
+            sub_job_id (int): Sub Job ID
+
+        Returns:
+            SubJobSummary: Summary row, or an empty unsaved row if the sub job has no work items
+        """
+        summary = db.session.get(SubJobSummary, sub_job_id)
+        return summary or SummaryService.empty_summary(SubJobSummary, sub_job_id=sub_job_id)
+
+    @staticmethod
+    def get_sub_job_summaries(project_id):
+        """
+        Get the summary rows of a project's sub jobs
+
+        Args:
+            project_id (int): Project ID
+
+        Returns:
+            dict: SubJobSummary rows keyed by sub job ID
+        """
+        summaries = SubJobSummary.query.filter_by(project_id=project_id).all()
+        return {summary.sub_job_id: summary for summary in summaries}
+
+    @staticmethod
+    def get_cost_code_summaries(project_id):
+        """
+        Get the summary rows of a project's cost codes
+
+        Args:
+            project_id (int): Project ID
+
+        Returns:
+            dict: CostCodeSummary rows keyed by cost code ID
+        """
+        summaries = CostCodeSummary.query.filter_by(project_id=project_id).all()
+        return {summary.cost_code_id: summary for summary in summaries}
+
+    @staticmethod
+    def empty_summary(model, **keys):
+        """
+        Build an unsaved all-zero summary row for a node without work items
+
+        Args:
+            model: ProjectSummary, SubJobSummary or CostCodeSummary
+            **keys: Key columns of the row
+
+        Returns:
+            Summary row with zero totals
+        """
+        summary = model(**keys)
+        for column in SUMMARY_COLUMNS:
+            setattr(summary, column, 0)
+        return summary
+
+    @staticmethod
+    def _expected_rows(project_id=None):
+        """Recompute the summary rows from the work items"""
+        rollup = RollupService.get_rollup(project_id=project_id)
+        expected = {}
+        for node_id, totals in rollup.projects.items():
+            expected[(ProjectSummary, node_id)] = (node_id, totals)
+        for node_id, totals in rollup.sub_jobs.items():
+            expected[(SubJobSummary, node_id)] = (rollup.sub_job_project_ids[node_id], totals)
+        for node_id, totals in rollup.cost_codes.items():
+            expected[(CostCodeSummary, node_id)] = (rollup.cost_code_project_ids[node_id], totals)
+        return expected
+
+    @staticmethod
+    def rebuild(project_id=None, commit=True):
+        """
+        Recompute the summary tables from the work items
+
+        Args:
+            project_id (int, optional): Only rebuild this project's summaries
+            commit (bool): Commit the session; schema migrations pass False to
+                keep the rebuild inside their own transaction
+
+        Returns:
+            int: Number of summary rows written
+        """
+        try:
+            for model in (ProjectSummary, SubJobSummary, CostCodeSummary):
+                query = model.query
+                if project_id is not None:
+                    query = query.filter_by(project_id=project_id)
+                query.delete(synchronize_session=False)
+
+            rows = []
+            for (model, node_id), (owner_project_id, totals) in SummaryService._expected_rows(project_id).items():
+                key_column = model.__mapper__.primary_key[0].name
+                row = {key_column: node_id, "item_count": totals.item_count}
+                if key_column != "project_id":
+                    row["project_id"] = owner_project_id
+                row["budgeted_hours"] = totals.budgeted_hours
+                row["earned_hours"] = totals.earned_hours
+                row["budgeted_quantity"] = totals.budgeted_quantity
+                row["earned_quantity"] = totals.earned_quantity
+                rows.append((model, row))
+
+            for model in (ProjectSummary, SubJobSummary, CostCodeSummary):
+                mappings = [row for row_model, row in rows if row_model is model]
+                if mappings:
+                    db.session.bulk_insert_mappings(model, mappings)
+            if commit:
+                db.session.commit()
+            logger.info(f"Rebuilt {len(rows)} summary rows" + (f" for project {project_id}" if project_id else ""))
+            return len(rows)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error rebuilding summaries: {str(e)}")
+            raise
+
+    @staticmethod
+    def check_drift(project_id=None, tolerance=1e-6):
+        """
+        Compare the stored summaries with totals recomputed from the work items
+
+        Args:
+            project_id (int, optional): Only check this project's summaries
+            tolerance (float): Largest absolute difference accepted as equal
+
+        Returns:
+            list: One dictionary per drifted row with the stored and expected values
+        """
+        expected = SummaryService._expected_rows(project_id)
+        drift = []
+        for model in (ProjectSummary, SubJobSummary, CostCodeSummary):
+            query = model.query
+            if project_id is not None:
+                query = query.filter_by(project_id=project_id)
+            key_column = model.__mapper__.primary_key[0].name
+            stored = {getattr(summary, key_column): summary for summary in query}
+
+            node_ids = set(stored) | {node_id for expected_model, node_id in expected if expected_model is model}
+            for node_id in node_ids:
+                summary = stored.get(node_id)
+                totals = expected.get((model, node_id), (None, None))[1]
+                stored_values = summary.serialize() if summary else dict.fromkeys(SUMMARY_COLUMNS, 0)
+                expected_values = totals.serialize() if totals else dict.fromkeys(SUMMARY_COLUMNS, 0)
+                differences = {
+                    column: (stored_values[column], expected_values[column])
+                    for column in SUMMARY_COLUMNS
+                    if abs((stored_values[column] or 0) - (expected_values[column] or 0)) > tolerance
+                }
+                if differences:
+                    drift.append({
+                        "table": model.__tablename__,
+                        "id": node_id,
+                        "differences": differences
+                    })
+
+        if drift:
+            logger.warning(f"Found {len(drift)} drifted summary rows")
+        return drift
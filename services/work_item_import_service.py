@@ -0,0 +1,384 @@
+"""
+WorkItemImportService for Magellan EV Tracker v3.0
+- Streams work items from CSV or XLSX estimate exports row by row (openpyxl
+  read-only mode for XLSX), so memory stays bounded by the chunk size
+- Sub jobs, cost codes and existing work item IDs are loaded once per import
+  into in-memory maps; rows are validated against them without further queries
+- Valid rows are inserted with bulk_insert_mappings in chunks, with initial
+  earned values computed per chunk by EarnedValueService.compute_earned_values
+- Bulk inserts bypass the flush listeners, so the summary deltas and the
+  project revision are applied explicitly in the same transaction
+"""
+from models import (db, WorkItem, WorkItemStepProgress, SubJob, CostCode, RuleOfCredit,
+                    add_summary_delta, apply_summary_deltas, bump_project_revisions)
+from services.earned_value_service import EarnedValueService
+from utils.rule_step_cache import RuleStepCache
+from sqlalchemy import select
+from datetime import date, datetime
+import numpy as np
+import csv
+import io
+import logging
+import os
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Work items inserted per bulk_insert_mappings call
+IMPORT_CHUNK_SIZE = 2000
+
+# Row errors kept in the result; further errors are only counted
+MAX_IMPORT_ERRORS = 1000
+
+# Import field -> accepted header names, compared lower-cased with spaces as underscores
+IMPORT_COLUMNS = {
+    'work_item_id_str': ('work_item_id_str', 'work_item_id', 'work_item', 'item_id'),
+    'description': ('description', 'work_item_description'),
+    'sub_job': ('sub_job_id_str', 'sub_job_id', 'sub_job'),
+    'cost_code': ('cost_code_id_str', 'cost_code_id', 'cost_code'),
+    'budgeted_quantity': ('budgeted_quantity', 'quantity', 'qty'),
+    'unit_of_measure': ('unit_of_measure', 'unit', 'uom'),
+    'budgeted_man_hours': ('budgeted_man_hours', 'budgeted_hours', 'man_hours', 'hours'),
+    'actual_man_hours': ('actual_man_hours', 'actual_hours'),
+    'planned_start': ('planned_start', 'start', 'start_date'),
+    'planned_finish': ('planned_finish', 'finish', 'finish_date', 'end_date')
+}
+
+REQUIRED_IMPORT_FIELDS = ('work_item_id_str', 'sub_job', 'cost_code')
+
+
+def _normalize_header(header):
+    return str(header or '').strip().lower().replace(' ', '_')
+
+
+def _parse_number(value, field):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        return float(str(value).replace(',', '')) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {field}: {value}")
+
+
+def _parse_date(value, field):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    # XLSX cells arrive as datetimes, CSV cells as ISO strings
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        raise ValueError(f"Invalid {field} (expected YYYY-MM-DD): {value}")
+
+
+class WorkItemImportService:
+    """
+    Service for bulk work item imports
+    """
+
+    @staticmethod
+    def iter_csv_rows(stream):
+        """
+        Yield the rows of a CSV file as lists of cell values
+
+        Args:
+            stream: Binary file object
+
+        Yields:
+            list: Cell values of one row, the header row first
+        """
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        try:
+            yield from csv.reader(text)
+        finally:
+            text.detach()
+
+    @staticmethod
+    def iter_xlsx_rows(stream):
+        """
+        Yield the rows of the first worksheet of an XLSX workbook
+
+        The workbook is opened in read-only mode, which parses the sheet XML
+        incrementally instead of loading every cell.
+
+        Args:
+            stream: Seekable binary file object
+
+        Yields:
+            tuple: Cell values of one row, the header row first
+        """
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("XLSX import requires the openpyxl package")
+
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def iter_file_rows(stream, file_name):
+        """
+        Yield the rows of an uploaded CSV or XLSX file, chosen by its extension
+
+        Args:
+            stream: Binary file object
+            file_name (str): Original file name
+
+        Yields:
+            Cell values of one row, the header row first
+        """
+        extension = os.path.splitext(file_name or '')[1].lower()
+        if extension in ('.xlsx', '.xlsm'):
+            return WorkItemImportService.iter_xlsx_rows(stream)
+        if extension in ('.csv', '.txt', ''):
+            return WorkItemImportService.iter_csv_rows(stream)
+        raise ValueError(f"Unsupported import file type: {extension}")
+
+    @staticmethod
+    def _load_maps(project_id):
+        """Sub job, cost code and rule step maps of a project plus every existing work item ID"""
+        sub_jobs = dict(db.session.execute(
+            select(SubJob.sub_job_id_str, SubJob.id).where(SubJob.project_id == project_id)
+        ).all())
+        cost_codes = {
+            cost_code_id_str: (cost_code_id, rule_id)
+            for cost_code_id_str, cost_code_id, rule_id in db.session.execute(
+                select(CostCode.cost_code_id_str, CostCode.id, CostCode.rule_of_credit_id)
+                .where(CostCode.project_id == project_id)
+            )
+        }
+        rule_ids = {rule_id for _, rule_id in cost_codes.values() if rule_id}
+        rule_steps = {
+            rule.id: RuleStepCache.get_steps(rule)
+            for rule in RuleOfCredit.query.filter(RuleOfCredit.id.in_(rule_ids))
+        } if rule_ids else {}
+        existing_ids = set(db.session.execute(select(WorkItem.work_item_id_str)).scalars())
+        return sub_jobs, cost_codes, rule_steps, existing_ids
+
+    @staticmethod
+    def _insert_chunk(chunk, rule_steps, deltas):
+        """
+        Compute earned values for a chunk of validated rows and bulk insert it
+
+        Args:
+            chunk (list): (work item mapping, rule ID, {step name: percent}) tuples
+            rule_steps (dict): Rule ID -> tuple of RuleStep
+            deltas (dict): Summary deltas accumulated across chunks
+
+        Returns:
+            int: Number of step progress rows inserted
+        """
+        # Items under the same rule share a weight vector: one matrix product per rule
+        by_rule = {}
+        for index, (_, rule_id, _) in enumerate(chunk):
+            by_rule.setdefault(rule_id, []).append(index)
+        for rule_id, indexes in by_rule.items():
+            steps = rule_steps.get(rule_id, ())
+            weights = np.array([step.weight for step in steps], dtype=float)
+            progress = np.array(
+                [[chunk[index][2].get(step.name, 0.0) for step in steps] for index in indexes],
+                dtype=float
+            ).reshape(len(indexes), len(steps))
+            budgeted_hours = np.array([chunk[index][0]['budgeted_man_hours'] for index in indexes], dtype=float)
+            budgeted_quantity = np.array([chunk[index][0]['budgeted_quantity'] for index in indexes], dtype=float)
+            earned_values = EarnedValueService.compute_earned_values(progress, weights, budgeted_hours, budgeted_quantity)
+            for index, earned_hours, percent_complete_hours, earned_quantity, percent_complete_quantity in zip(
+                    indexes, *(values.tolist() for values in earned_values)):
+                mapping = chunk[index][0]
+                mapping['earned_man_hours'] = earned_hours
+                mapping['percent_complete_hours'] = percent_complete_hours
+                mapping['earned_quantity'] = earned_quantity
+                mapping['percent_complete_quantity'] = percent_complete_quantity
+
+        mappings = [mapping for mapping, _, _ in chunk]
+        db.session.bulk_insert_mappings(WorkItem, mappings)
+
+        step_rows = []
+        with_progress = {mapping['work_item_id_str']: progress for mapping, _, progress in chunk if progress}
+        if with_progress:
+            # One lookup of the generated ids of the items that carry step progress
+            for work_item_id, work_item_id_str in db.session.execute(
+                select(WorkItem.id, WorkItem.work_item_id_str).where(WorkItem.work_item_id_str.in_(list(with_progress)))
+            ):
+                step_rows.extend(
+                    {'work_item_id': work_item_id, 'step_name': step_name, 'percent_complete': percent}
+                    for step_name, percent in with_progress[work_item_id_str].items()
+                )
+            db.session.bulk_insert_mappings(WorkItemStepProgress, step_rows)
+
+        for mapping in mappings:
+            add_summary_delta(
+                deltas, mapping['project_id'], mapping['sub_job_id'], mapping['cost_code_id'],
+                [mapping['budgeted_man_hours'], mapping['earned_man_hours'],
+                 mapping['budgeted_quantity'], mapping['earned_quantity']], 1
+            )
+        return len(step_rows)
+
+    @staticmethod
+    def import_work_items(rows, project_id, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+        """
+        Validate and insert work items for a project from a stream of rows
+
+        The first row is the header. Columns are matched by IMPORT_COLUMNS;
+        any other column named after a step of the row's rule of credit is
+        read as that step's initial percent complete. Invalid rows are
+        reported and skipped; the valid rows commit in one transaction.
+
+        Args:
+            rows (iterable): Rows of cell values, header first (see iter_file_rows)
+            project_id (int): Project the work items belong to
+            chunk_size (int): Work items per bulk insert
+            dry_run (bool): Validate only, insert nothing
+
+        Returns:
+            dict: Rows read, items imported, step progress rows, seconds,
+                error count and the first MAX_IMPORT_ERRORS errors
+        """
+        started = time.perf_counter()
+        errors = []
+        error_count = 0
+
+        def reject(row_number, work_item_id_str, message):
+            nonlocal error_count
+            error_count += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({'row': row_number, 'work_item_id_str': work_item_id_str, 'error': message})
+
+        try:
+            rows = iter(rows)
+            header = next(rows, None)
+            if header is None:
+                raise ValueError("The import file is empty")
+
+            aliases = {alias: field for field, names in IMPORT_COLUMNS.items() for alias in names}
+            field_indexes = {}
+            step_columns = []
+            for index, name in enumerate(header):
+                field = aliases.get(_normalize_header(name))
+                if field and field not in field_indexes:
+                    field_indexes[field] = index
+                elif name is not None and str(name).strip():
+                    step_columns.append((index, str(name).strip()))
+            missing = [field for field in REQUIRED_IMPORT_FIELDS if field not in field_indexes]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+            sub_jobs, cost_codes, rule_steps, existing_ids = WorkItemImportService._load_maps(project_id)
+            step_names = {rule_id: {step.name for step in steps} for rule_id, steps in rule_steps.items()}
+
+            def cell(values, field):
+                index = field_indexes.get(field)
+                if index is None or index >= len(values):
+                    return None
+                return values[index]
+
+            deltas = {}
+            chunk = []
+            rows_read = 0
+            imported = 0
+            step_rows = 0
+            for row_number, values in enumerate(rows, start=2):
+                if not values or all(value is None or str(value).strip() == '' for value in values):
+                    continue
+                rows_read += 1
+
+                work_item_id_str = str(cell(values, 'work_item_id_str') or '').strip()
+                if not work_item_id_str:
+                    reject(row_number, work_item_id_str, 'work_item_id_str is required')
+                    continue
+                if work_item_id_str in existing_ids:
+                    reject(row_number, work_item_id_str, 'Duplicate work_item_id_str')
+                    continue
+
+                sub_job_id = sub_jobs.get(str(cell(values, 'sub_job') or '').strip())
+                if sub_job_id is None:
+                    reject(row_number, work_item_id_str, f"Unknown sub job: {cell(values, 'sub_job')}")
+                    continue
+                cost_code = cost_codes.get(str(cell(values, 'cost_code') or '').strip())
+                if cost_code is None:
+                    reject(row_number, work_item_id_str, f"Unknown cost code: {cell(values, 'cost_code')}")
+                    continue
+                cost_code_id, rule_id = cost_code
+
+                try:
+                    budgeted_quantity = _parse_number(cell(values, 'budgeted_quantity'), 'budgeted_quantity')
+                    budgeted_man_hours = _parse_number(cell(values, 'budgeted_man_hours'), 'budgeted_man_hours')
+                    actual_man_hours = _parse_number(cell(values, 'actual_man_hours'), 'actual_man_hours')
+                    planned_start = _parse_date(cell(values, 'planned_start'), 'planned_start')
+                    planned_finish = _parse_date(cell(values, 'planned_finish'), 'planned_finish')
+                    if planned_start and planned_finish and planned_finish < planned_start:
+                        raise ValueError(f"planned_finish {planned_finish} is before planned_start {planned_start}")
+                    progress = {}
+                    rule_step_names = step_names.get(rule_id, ())
+                    for index, step_name in step_columns:
+                        if step_name in rule_step_names and index < len(values):
+                            percent = _parse_number(values[index], step_name)
+                            if percent is None:
+                                continue
+                            if not 0 <= percent <= 100:
+                                raise ValueError(f"Percent must be between 0 and 100 for {step_name}: {percent}")
+                            progress[step_name] = percent
+                except ValueError as e:
+                    reject(row_number, work_item_id_str, str(e))
+                    continue
+
+                existing_ids.add(work_item_id_str)
+                description = cell(values, 'description')
+                unit_of_measure = cell(values, 'unit_of_measure')
+                chunk.append(({
+                    'work_item_id_str': work_item_id_str,
+                    'description': str(description).strip() if description is not None else None,
+                    'project_id': project_id,
+                    'sub_job_id': sub_job_id,
+                    'cost_code_id': cost_code_id,
+                    'budgeted_quantity': budgeted_quantity,
+                    'unit_of_measure': str(unit_of_measure).strip() if unit_of_measure is not None else None,
+                    'budgeted_man_hours': budgeted_man_hours,
+                    'actual_man_hours': actual_man_hours or 0.0,
+                    'planned_start': planned_start,
+                    'planned_finish': planned_finish
+                }, rule_id, progress))
+
+                if len(chunk) >= chunk_size:
+                    if not dry_run:
+                        step_rows += WorkItemImportService._insert_chunk(chunk, rule_steps, deltas)
+                    imported += len(chunk)
+                    chunk = []
+
+            if chunk:
+                if not dry_run:
+                    step_rows += WorkItemImportService._insert_chunk(chunk, rule_steps, deltas)
+                imported += len(chunk)
+
+            if not dry_run:
+                connection = db.session.connection()
+                apply_summary_deltas(connection, deltas)
+                if imported:
+                    bump_project_revisions(connection, {project_id})
+                db.session.commit()
+
+            result = {
+                'project_id': project_id,
+                'rows_read': rows_read,
+                'items_imported': 0 if dry_run else imported,
+                'items_valid': imported,
+                'step_progress_rows': step_rows,
+                'error_count': error_count,
+                'errors': errors,
+                'dry_run': dry_run,
+                'seconds': time.perf_counter() - started
+            }
+            logger.info(f"Imported {result['items_imported']} of {rows_read} work item rows into project {project_id} "
+                        f"in {result['seconds']:.2f}s with {error_count} errors")
+            return result
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error importing work items into project {project_id}: {str(e)}")
+            raise
@@ -2,28 +2,71 @@
 Fixed WorkItemService with count_work_items method for Magellan EV Tracker v3.0
 - Added missing count_work_items method required by dashboard
 - Enhanced error handling and logging
+- calculate_work_item_metrics returns the earned value management metrics (services.evm_service)
 """
-from models import WorkItem, db
+from models import WorkItem, CostCode, db
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
+from services.load_profiles import WORK_ITEM_PROFILES, apply_load_profile
+from services.evm_service import EVMService
+from utils.rule_step_cache import RuleStepCache
+import base64
+import json
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Keep IN lists below SQLite's bound parameter limit
+IN_CLAUSE_CHUNK_SIZE = 500
+
+# Sortable listing columns; each is indexed together with id so keyset pages seek
+WORK_ITEM_SORT_COLUMNS = {
+    'id': WorkItem.id,
+    'work_item_id': WorkItem.work_item_id_str,
+    'cost_code': WorkItem.cost_code_id,
+    'progress': WorkItem.percent_complete_hours
+}
+
+# Status buckets of the work item listing, by hours percent complete
+WORK_ITEM_STATUS_BUCKETS = ('not_started', 'in_progress', 'completed')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_value, item_id):
+    """Encode the last row of a page as an opaque keyset cursor"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, item_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a keyset cursor into (sort value, id), raising ValueError when malformed"""
+    try:
+        sort_value, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(item_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
 class WorkItemService:
     """
     Service for work item-related operations
     """
     
     @staticmethod
-    def get_all_work_items():
+    def get_all_work_items(profile='list'):
         """
         Get all work items
         
+        Args:
+            profile (str): Eager-loading profile from services.load_profiles
+        
         Returns:
             list: List of all work items
         """
         try:
-            work_items = WorkItem.query.all()
+            work_items = apply_load_profile(WorkItem.query, WORK_ITEM_PROFILES, profile).all()
             logger.info(f"Retrieved {len(work_items)} work items")
             return work_items
         except Exception as e:
@@ -44,25 +87,45 @@ class WorkItemService:
         try:
             work_item = WorkItem.query.get(work_item_id)
             if work_item:
-                logger.info(f"Retrieved work item: {work_item.id}, {work_item.name}")
+                logger.info(f"Retrieved work item: {work_item.id}, {work_item.work_item_id_str}")
             return work_item
         except Exception as e:
             logger.error(f"Error retrieving work item {work_item_id}: {str(e)}")
             return None
     
     @staticmethod
-    def get_sub_job_work_items(sub_job_id):
+    def calculate_work_item_metrics(work_item, status_date=None):
+        """
+        Get the earned value management metrics of a work item
+        
+        Args:
+            work_item (WorkItem): Work item
+            status_date (date, optional): Date planned value is measured at, defaults to today
+            
+        Returns:
+            dict: Metrics as returned by ProjectService.get_project_metrics
+        """
+        try:
+            return EVMService.get_work_item_metrics(work_item, status_date)
+        except Exception as e:
+            logger.error(f"Error calculating metrics of work item {work_item.id}: {str(e)}")
+            return EVMService.empty_metrics()
+    
+    @staticmethod
+    def get_sub_job_work_items(sub_job_id, profile='list'):
         """
         Get all work items for a sub job
         
         Args:
             sub_job_id (int): Sub Job ID
+            profile (str): Eager-loading profile from services.load_profiles
             
         Returns:
             list: List of work items for the sub job
         """
         try:
-            work_items = WorkItem.query.filter_by(sub_job_id=sub_job_id).all()
+            query = apply_load_profile(WorkItem.query, WORK_ITEM_PROFILES, profile)
+            work_items = query.filter_by(sub_job_id=sub_job_id).all()
             logger.info(f"Retrieved {len(work_items)} work items for sub job {sub_job_id}")
             return work_items
         except Exception as e:
@@ -70,24 +133,169 @@ class WorkItemService:
             return []
     
     @staticmethod
-    def get_recent_work_items(limit=10):
+    def get_recent_work_items(limit=10, profile='list'):
         """
         Get most recent work items
         
         Args:
             limit (int): Maximum number of work items to return
+            profile (str): Eager-loading profile from services.load_profiles
             
         Returns:
             list: List of recent work items
         """
         try:
-            work_items = WorkItem.query.order_by(WorkItem.id.desc()).limit(limit).all()
+            query = apply_load_profile(WorkItem.query, WORK_ITEM_PROFILES, profile)
+            work_items = query.order_by(WorkItem.id.desc()).limit(limit).all()
             logger.info(f"Retrieved {len(work_items)} recent work items")
             return work_items
         except Exception as e:
             logger.error(f"Error retrieving recent work items: {str(e)}")
             return []
     
+    @staticmethod
+    def get_work_items_page(project_id=None, sub_job_id=None, discipline=None, cost_code_id=None,
+                            status=None, search=None, sort_by='id', descending=False,
+                            cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Get one page of work items with keyset pagination
+        
+        Rows are ordered by (sort column, id) and the next page starts after
+        the last row of this one, so every page is an index seek no matter
+        how deep the listing is scrolled.
+        
+        Args:
+            project_id (int, optional): Filter by project
+            sub_job_id (int, optional): Filter by sub job
+            discipline (str, optional): Filter by cost code discipline
+            cost_code_id (int, optional): Filter by cost code
+            status (str, optional): One of WORK_ITEM_STATUS_BUCKETS
+            search (str, optional): Substring of the work item ID or description
+            sort_by (str): Key of WORK_ITEM_SORT_COLUMNS
+            descending (bool): Sort in descending order
+            cursor (str, optional): next_cursor of the previous page
+            limit (int): Page size, capped at MAX_PAGE_SIZE
+            
+        Returns:
+            dict: 'items' (list of work items with their cost code loaded) and
+                'next_cursor' (str, None on the last page)
+        """
+        if sort_by not in WORK_ITEM_SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort column: {sort_by}")
+        if status and status not in WORK_ITEM_STATUS_BUCKETS:
+            raise ValueError(f"Unsupported status: {status}")
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        sort_column = WORK_ITEM_SORT_COLUMNS[sort_by]
+        
+        query = apply_load_profile(WorkItem.query, WORK_ITEM_PROFILES, 'list')
+        if project_id:
+            query = query.filter(WorkItem.project_id == project_id)
+        if sub_job_id:
+            query = query.filter(WorkItem.sub_job_id == sub_job_id)
+        if cost_code_id:
+            query = query.filter(WorkItem.cost_code_id == cost_code_id)
+        if discipline:
+            query = query.filter(WorkItem.cost_code_id.in_(
+                db.select(CostCode.id).where(CostCode.discipline == discipline)
+            ))
+        if status == 'not_started':
+            query = query.filter(or_(WorkItem.percent_complete_hours.is_(None), WorkItem.percent_complete_hours <= 0))
+        elif status == 'in_progress':
+            query = query.filter(WorkItem.percent_complete_hours > 0, WorkItem.percent_complete_hours < 100)
+        elif status == 'completed':
+            query = query.filter(WorkItem.percent_complete_hours >= 100)
+        if search:
+            pattern = f"%{search}%"
+            query = query.filter(or_(WorkItem.work_item_id_str.ilike(pattern), WorkItem.description.ilike(pattern)))
+        
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor)
+            query = query.filter(WorkItemService._after_cursor(sort_column, sort_value, last_id, descending))
+        
+        if descending:
+            query = query.order_by(sort_column.desc(), WorkItem.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), WorkItem.id.asc())
+        
+        try:
+            # Fetch one extra row to know whether another page exists
+            work_items = query.limit(limit + 1).all()
+        except Exception as e:
+            logger.error(f"Error getting work items page: {str(e)}")
+            raise
+        
+        next_cursor = None
+        if len(work_items) > limit:
+            work_items = work_items[:limit]
+            last = work_items[-1]
+            next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+        return {'items': work_items, 'next_cursor': next_cursor}
+    
+    @staticmethod
+    def _after_cursor(sort_column, sort_value, last_id, descending):
+        """
+        Keyset condition selecting rows after (sort_value, last_id)
+        
+        NULL sort values order first ascending and last descending, as SQLite
+        orders them, so they get their own branches.
+        """
+        if descending:
+            if sort_value is None:
+                return and_(sort_column.is_(None), WorkItem.id < last_id)
+            return or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, WorkItem.id < last_id),
+                sort_column.is_(None)
+            )
+        if sort_value is None:
+            return or_(
+                and_(sort_column.is_(None), WorkItem.id > last_id),
+                sort_column.isnot(None)
+            )
+        return or_(
+            sort_column > sort_value,
+            and_(sort_column == sort_value, WorkItem.id > last_id)
+        )
+    
+    @staticmethod
+    def serialize_list_item(work_item):
+        """
+        Serialize a work item for the listing API
+        
+        Unlike WorkItem.serialize this leaves out step progress, so a page
+        only needs the cost code that the 'list' profile already loaded.
+        
+        Args:
+            work_item (WorkItem): Work item with its cost code loaded
+            
+        Returns:
+            dict: Listing fields of the work item
+        """
+        percent_complete = work_item.percent_complete_hours or 0
+        if percent_complete <= 0:
+            status = 'not_started'
+        elif percent_complete < 100:
+            status = 'in_progress'
+        else:
+            status = 'completed'
+        return {
+            'id': work_item.id,
+            'work_item_id_str': work_item.work_item_id_str,
+            'description': work_item.description,
+            'project_id': work_item.project_id,
+            'sub_job_id': work_item.sub_job_id,
+            'cost_code_id': work_item.cost_code_id,
+            'cost_code': work_item.cost_code.cost_code_id_str if work_item.cost_code else None,
+            'discipline': work_item.cost_code.discipline if work_item.cost_code else None,
+            'budgeted_quantity': work_item.budgeted_quantity,
+            'earned_quantity': work_item.earned_quantity,
+            'unit_of_measure': work_item.unit_of_measure,
+            'budgeted_man_hours': work_item.budgeted_man_hours,
+            'earned_man_hours': work_item.earned_man_hours,
+            'percent_complete_hours': percent_complete,
+            'status': status
+        }
+    
     @staticmethod
     def count_work_items():
         """
@@ -172,6 +380,89 @@ class WorkItemService:
             logger.error(f"Error updating work item {work_item_id}: {str(e)}")
             raise
     
+    @staticmethod
+    def bulk_update_progress(rows):
+        """
+        Apply many step progress updates in one transaction
+        
+        Rows are validated and grouped per work item; each item's progress is
+        rewritten and recalculated once, and the whole batch commits once.
+        Invalid rows are reported and skipped without aborting the batch.
+        
+        Args:
+            rows (list): Dictionaries with work_item_id_str, step_name and percent
+            
+        Returns:
+            dict: Counts of rows applied and items updated, plus per-row errors
+        """
+        errors = []
+        updates = {}
+        for row_number, row in enumerate(rows, start=1):
+            work_item_id_str = str(row.get('work_item_id_str') or '').strip()
+            step_name = str(row.get('step_name') or '').strip()
+            if not work_item_id_str or not step_name:
+                errors.append({'row': row_number, 'work_item_id_str': work_item_id_str, 'error': 'work_item_id_str and step_name are required'})
+                continue
+            try:
+                percent = float(row.get('percent'))
+            except (TypeError, ValueError):
+                errors.append({'row': row_number, 'work_item_id_str': work_item_id_str, 'error': f"Invalid percent: {row.get('percent')}"})
+                continue
+            if not 0 <= percent <= 100:
+                errors.append({'row': row_number, 'work_item_id_str': work_item_id_str, 'error': f"Percent must be between 0 and 100: {percent}"})
+                continue
+            updates.setdefault(work_item_id_str, []).append((row_number, step_name, percent))
+        
+        try:
+            # Load every referenced item with its cost code, rule and step progress in a few queries
+            work_items = {}
+            id_strs = list(updates)
+            for start in range(0, len(id_strs), IN_CLAUSE_CHUNK_SIZE):
+                chunk = id_strs[start:start + IN_CLAUSE_CHUNK_SIZE]
+                for work_item in WorkItem.query.options(
+                    selectinload(WorkItem.cost_code).selectinload(CostCode.rule_of_credit),
+                    selectinload(WorkItem.step_progress)
+                ).filter(WorkItem.work_item_id_str.in_(chunk)):
+                    work_items[work_item.work_item_id_str] = work_item
+            
+            rows_applied = 0
+            items_updated = 0
+            for work_item_id_str, item_updates in updates.items():
+                work_item = work_items.get(work_item_id_str)
+                if work_item is None:
+                    errors.extend({'row': row_number, 'work_item_id_str': work_item_id_str, 'error': 'Work item not found'}
+                                  for row_number, _, _ in item_updates)
+                    continue
+                
+                step_names = {step.name for step in RuleStepCache.get_steps_for_cost_code(work_item.cost_code)}
+                progress_data = work_item.get_steps_progress()
+                changed = False
+                for row_number, step_name, percent in item_updates:
+                    if step_name not in step_names:
+                        errors.append({'row': row_number, 'work_item_id_str': work_item_id_str, 'error': f"Unknown rule of credit step: {step_name}"})
+                        continue
+                    progress_data[step_name] = percent
+                    rows_applied += 1
+                    changed = True
+                
+                if changed:
+                    work_item.set_steps_progress(progress_data)
+                    work_item.calculate_earned_values()
+                    items_updated += 1
+            
+            db.session.commit()
+            errors.sort(key=lambda error: error['row'])
+            logger.info(f"Bulk progress update applied {rows_applied} rows to {items_updated} work items with {len(errors)} errors")
+            return {
+                'rows_applied': rows_applied,
+                'items_updated': items_updated,
+                'errors': errors
+            }
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error applying bulk progress update: {str(e)}")
+            raise
+    
     @staticmethod
     def delete_work_item(work_item_id):
         """
@@ -1,40 +1,64 @@
 """
-Fixed simple_app.py with database recreation for Magellan EV Tracker v3.0
+Fixed simple_app.py for Magellan EV Tracker v3.0
 - Simplified database configuration to match v1.32 pattern
-- Added database recreation to ensure schema matches models
+- Applies versioned schema migrations on startup instead of recreating the database
 - Uses consistent SQLite path that works reliably on Railway
 """
 
 from flask import Flask, render_template, redirect, url_for
-from models import db
+from utils.db_profile import init_database
 from routes import main_bp
+from auto_migration import setup_auto_migration
+from reports.report_jobs import report_jobs
+from reports.report_batch import report_batches
+from utils.commands import register_commands
+from utils.query_counter import register_query_budget
+from utils.perf import perf_monitor
+from utils.service_cache import service_cache
+from utils.logging_config import configure_logging
 import os
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: queued JSON records, level/format/sampling from LOG_LEVEL, LOG_FORMAT and LOG_SAMPLING
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Create Flask app
 app = Flask(__name__)
 
-# Configure database - simplified to match v1.32 pattern
-# Use instance folder for SQLite database (works reliably on Railway)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///magellan_ev.db'
+# Configure database - SQLite in the instance folder (works reliably on Railway)
+# unless DATABASE_URL points at a server database; see utils/db_profile.py
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_key_for_magellan')
 
-logger.info(f"Using SQLite database at: {app.config['SQLALCHEMY_DATABASE_URI']}")
-
-# Initialize database
-db.init_app(app)
+# Initialize database with the engine profile (WAL and pragmas for SQLite, pooling for servers)
+init_database(app)
 
 # Register blueprints
 app.register_blueprint(main_bp)
 
+# Background report generation with cached PDF artifacts
+report_jobs.init_app(app)
+
+# Batch exports of many reports into a zip archive on a process pool (REPORT_BATCH_WORKERS processes)
+if os.environ.get('REPORT_BATCH_WORKERS'):
+    app.config['REPORT_BATCH_WORKERS'] = int(os.environ['REPORT_BATCH_WORKERS'])
+report_batches.init_app(app)
+
+# In-process TTL/LRU cache of dashboard counters and project options
+app.config['SERVICE_CACHE_TTL'] = int(os.environ.get('SERVICE_CACHE_TTL', 30))
+service_cache.init_app(app)
+
+# Register CLI commands
+register_commands(app)
+
+# Per-request query/template timings: Server-Timing header and /debug/perf (PERF_PANEL)
+app.config['PERF_PANEL'] = os.environ.get('PERF_PANEL', '').lower() in ('1', 'true', 'yes')
+perf_monitor.init_app(app)
+
+# Fail requests over the QUERY_BUDGET statement limit (set in tests to catch N+1 loads)
+register_query_budget(app)
+
 # Root route redirects to index
 @app.route('/')
 def index():
@@ -50,26 +74,8 @@ def server_error(e):
     logger.error(f"500 error: {str(e)}")
     return render_template('500.html'), 500
 
-# Create database tables on startup
-with app.app_context():
-    try:
-        # Drop all tables and recreate them to ensure schema matches models
-        logger.info("Dropping all tables to ensure clean schema")
-        db.drop_all()
-        
-        # Create all tables based on current models
-        logger.info("Creating all tables based on current models")
-        db.create_all()
-        logger.info("Database tables created successfully")
-        
-        # Test database connection by counting projects
-        from models import Project
-        project_count = Project.query.count()
-        logger.info(f"Database connection test: Found {project_count} projects")
-        
-    except Exception as e:
-        logger.error(f"Error during application startup: {str(e)}")
-        raise
+# Bring the schema up to date on startup (a single version check once current)
+setup_auto_migration(app)
 
 if __name__ == '__main__':
     # Run the app
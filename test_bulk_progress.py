@@ -0,0 +1,111 @@
+"""
+Bulk progress entry check for Magellan EV Tracker v3.0
+- Applies a batch of step progress rows with WorkItemService.bulk_update_progress
+  and through /api/work_items/progress/bulk, asserting that invalid rows are
+  reported by row number without aborting the batch and that the whole batch
+  is written in a single commit
+- Run with `python -m pytest test_bulk_progress.py`
+"""
+import os
+import tempfile
+
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, Project, SubJob, CostCode, RuleOfCredit, WorkItem
+from auto_migration import setup_auto_migration
+from utils.db_profile import init_database
+from routes import main_bp
+from services.summary_service import SummaryService
+from services.work_item_service import WorkItemService
+
+
+def create_test_app():
+    instance_path = tempfile.mkdtemp()
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(instance_path, 'bulk.db')
+    app.config['TESTING'] = True
+    init_database(app)
+    app.register_blueprint(main_bp)
+    setup_auto_migration(app)
+
+    with app.app_context():
+        rule = RuleOfCredit(name='Rule', steps_json='{"steps": [{"name": "Set", "weight": 40}, {"name": "Weld", "weight": 60}]}')
+        project = Project(project_id_str='P1', name='Project 1')
+        db.session.add_all([rule, project])
+        db.session.flush()
+        cost_code = CostCode(cost_code_id_str='CC1', description='Cost code', discipline='Piping',
+                             project_id=project.id, rule_of_credit_id=rule.id)
+        sub_job = SubJob(sub_job_id_str='S1', name='Sub job', project_id=project.id)
+        db.session.add_all([cost_code, sub_job])
+        db.session.flush()
+        for i in range(1, 4):
+            db.session.add(WorkItem(work_item_id_str=f'WI-{i}', description='Item', project_id=project.id,
+                                    sub_job_id=sub_job.id, cost_code_id=cost_code.id,
+                                    budgeted_man_hours=100, budgeted_quantity=10))
+        db.session.commit()
+    return app
+
+
+def count_commits(call):
+    """Run a callable and return its result and the number of session commits it made"""
+    commits = []
+
+    def record(session):
+        commits.append(session)
+
+    event.listen(db.session, 'after_commit', record)
+    try:
+        result = call()
+    finally:
+        event.remove(db.session, 'after_commit', record)
+    return result, len(commits)
+
+
+def earned_hours(work_item_id_str):
+    return WorkItem.query.filter_by(work_item_id_str=work_item_id_str).one().earned_man_hours
+
+
+def test_bulk_update_reports_row_errors_and_commits_once():
+    app = create_test_app()
+    with app.app_context():
+        rows = [
+            {'work_item_id_str': 'WI-1', 'step_name': 'Set', 'percent': 100},
+            {'work_item_id_str': 'WI-1', 'step_name': 'Weld', 'percent': '50'},
+            {'work_item_id_str': 'WI-2', 'step_name': 'Set', 'percent': 'half'},
+            {'work_item_id_str': 'WI-2', 'step_name': 'Weld', 'percent': 120},
+            {'work_item_id_str': 'WI-9', 'step_name': 'Set', 'percent': 10},
+            {'work_item_id_str': 'WI-3', 'step_name': 'Paint', 'percent': 10},
+            {'work_item_id_str': '', 'step_name': 'Set', 'percent': 10},
+            {'work_item_id_str': 'WI-3', 'step_name': 'Weld', 'percent': 100},
+        ]
+        result, commits = count_commits(lambda: WorkItemService.bulk_update_progress(rows))
+
+        assert commits == 1
+        assert result['rows_applied'] == 3
+        assert result['items_updated'] == 2
+        assert [error['row'] for error in result['errors']] == [3, 4, 5, 6, 7]
+        assert result['errors'][2]['error'] == 'Work item not found'
+        assert result['errors'][3]['error'] == 'Unknown rule of credit step: Paint'
+
+        db.session.expire_all()
+        assert earned_hours('WI-1') == 70
+        assert earned_hours('WI-2') == 0
+        assert earned_hours('WI-3') == 60
+        assert SummaryService.check_drift() == []
+
+
+def test_bulk_progress_endpoint_accepts_csv():
+    app = create_test_app()
+    client = app.test_client()
+    body = 'work_item_id_str,step_name,percent\nWI-1,Set,100\nWI-2,Weld,-5\nWI-2,Weld,50\n'
+    response = client.post('/api/work_items/progress/bulk', data=body, content_type='text/csv')
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['success']
+    assert payload['rows_applied'] == 2
+    assert [error['row'] for error in payload['errors']] == [2]
+    with app.app_context():
+        assert earned_hours('WI-1') == 40
+        assert earned_hours('WI-2') == 30
@@ -0,0 +1,106 @@
+"""
+Query budget check for Magellan EV Tracker v3.0
+- Requests the project list, a project page and the work item listing API
+  under a QUERY_BUDGET pinned to their current statement counts, so an N+1
+  load fails the request (utils.query_counter.register_query_budget)
+- The counts must not grow with the number of projects, sub jobs or work items
+- Run with `python -m pytest test_query_budget.py`
+"""
+import os
+import tempfile
+
+from flask import Flask
+
+from models import db, Project, SubJob, CostCode, RuleOfCredit, WorkItem
+from auto_migration import setup_auto_migration
+from utils.db_profile import init_database
+from utils.query_counter import QueryCounter, register_query_budget
+from routes import main_bp
+
+# Statements per request, pinned; lower them when a page gets cheaper
+QUERY_BUDGET = {
+    'main.projects': 3,
+    'main.view_project': 3,
+    'main.api_work_items': 1,
+}
+
+
+def create_test_app():
+    instance_path = tempfile.mkdtemp()
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(instance_path, 'budget.db')
+    app.config['SECRET_KEY'] = 'test'
+    app.config['TESTING'] = True
+    app.config['QUERY_BUDGET'] = QUERY_BUDGET
+    init_database(app)
+    app.register_blueprint(main_bp)
+    register_query_budget(app)
+    # The templates also link to pages served by routes_refactored.py, which this app does not register
+    app.url_build_error_handlers.append(lambda error, endpoint, values: '#')
+    setup_auto_migration(app)
+
+    with app.app_context():
+        db.session.add(RuleOfCredit(name='Rule', steps_json='{"steps": [{"name": "Install", "weight": 100}]}'))
+        db.session.commit()
+    return app
+
+
+def add_project(number, sub_jobs=3, items_per_sub_job=10):
+    """Add a project with sub jobs, cost codes and work items"""
+    project = Project(project_id_str=f'P{number}', name=f'Project {number}')
+    db.session.add(project)
+    db.session.flush()
+    cost_codes = []
+    for c in range(2):
+        cost_code = CostCode(cost_code_id_str=f'P{number}-CC{c}', description='Cost code', discipline='Civil',
+                             project_id=project.id, rule_of_credit_id=1)
+        db.session.add(cost_code)
+        cost_codes.append(cost_code)
+    for s in range(sub_jobs):
+        sub_job = SubJob(sub_job_id_str=f'P{number}-S{s}', name=f'Sub job {s}', project_id=project.id)
+        db.session.add(sub_job)
+        db.session.flush()
+        for i in range(items_per_sub_job):
+            db.session.add(WorkItem(
+                work_item_id_str=f'P{number}-S{s}-{i}', description='Item', project_id=project.id,
+                sub_job_id=sub_job.id, cost_code_id=cost_codes[i % 2].id,
+                budgeted_man_hours=10, budgeted_quantity=5, percent_complete_hours=i * 10
+            ))
+    db.session.commit()
+    return project.id
+
+
+def statement_counts(client, project_id):
+    """GET each budgeted page and return its status code and statement count"""
+    counts = {}
+    pages = {}
+    for endpoint, url in (
+        ('main.projects', '/projects'),
+        ('main.view_project', f'/view_project/{project_id}'),
+        ('main.api_work_items', f'/api/work_items?project_id={project_id}&limit=100'),
+    ):
+        with QueryCounter() as counter:
+            response = client.get(url)
+        counts[endpoint] = (response.status_code, counter.count)
+        pages[endpoint] = response.get_data(as_text=True)
+    # The pages rendered their data rather than an error fallback
+    assert f'Project {project_id}' in pages['main.projects']
+    assert f'P{project_id}-S0' in pages['main.view_project']
+    assert f'P{project_id}-S0-1' in pages['main.api_work_items']
+    return counts
+
+
+def test_pages_stay_within_query_budget():
+    app = create_test_app()
+    client = app.test_client()
+    with app.app_context():
+        project_id = add_project(1, sub_jobs=1, items_per_sub_job=2)
+    small = statement_counts(client, project_id)
+
+    with app.app_context():
+        for number in range(2, 6):
+            project_id = add_project(number, sub_jobs=4, items_per_sub_job=20)
+    large = statement_counts(client, project_id)
+
+    assert small == large
+    assert large == {endpoint: (200, budget) for endpoint, budget in QUERY_BUDGET.items()}
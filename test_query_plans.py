@@ -0,0 +1,127 @@
+"""
+Query plan check for Magellan EV Tracker v3.0
+- Builds a migrated SQLite database, runs the hot service queries and asserts
+  with EXPLAIN QUERY PLAN that each one is served by its secondary index
+- Run with `python -m pytest test_query_plans.py` or `python test_query_plans.py`
+"""
+import os
+import tempfile
+
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, Project, SubJob, CostCode, RuleOfCredit, WorkItem
+from auto_migration import setup_auto_migration
+from utils.db_profile import init_database
+from services.work_item_service import WorkItemService
+from services.sub_job_service import SubJobService
+from services.cost_code_service import CostCodeService
+from services.rollup_service import RollupService
+from reports.report_rows import iter_report_items
+
+
+def create_test_app():
+    instance_path = tempfile.mkdtemp()
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(instance_path, 'plans.db')
+    init_database(app)
+    setup_auto_migration(app)
+
+    with app.app_context():
+        rule = RuleOfCredit(name='Rule', steps_json='{"steps": [{"name": "Install", "weight": 100}]}')
+        db.session.add(rule)
+        for p in range(1, 6):
+            project = Project(project_id_str=f'P{p}', name=f'Project {p}')
+            db.session.add(project)
+            db.session.flush()
+            cost_codes = []
+            for c in range(3):
+                cost_code = CostCode(cost_code_id_str=f'P{p}-CC{c}', description='Cost code', discipline='Civil',
+                                     project_id=project.id, rule_of_credit_id=rule.id)
+                db.session.add(cost_code)
+                cost_codes.append(cost_code)
+            for s in range(3):
+                sub_job = SubJob(sub_job_id_str=f'P{p}-S{s}', name=f'Sub job {s}', project_id=project.id)
+                db.session.add(sub_job)
+                db.session.flush()
+                for i in range(20):
+                    db.session.add(WorkItem(
+                        work_item_id_str=f'P{p}-S{s}-{i}', description='Item', project_id=project.id,
+                        sub_job_id=sub_job.id, cost_code_id=cost_codes[i % 3].id,
+                        budgeted_man_hours=10, budgeted_quantity=5, percent_complete_hours=i * 5
+                    ))
+        db.session.commit()
+    return app
+
+
+def capture_statements(call):
+    """Run a callable and return the (statement, parameters) pairs it executed"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def query_plan(statement, parameters):
+    cursor = db.engine.raw_connection().cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def assert_uses_index(call, table, index_name):
+    """Assert that some statement of `call` reading `table` is planned with `index_name`"""
+    plans = [query_plan(statement, parameters) for statement, parameters in capture_statements(call)]
+    details = [detail for plan in plans for detail in plan if f' {table} ' in f' {detail} ']
+    assert details, f"No statement read {table}"
+    assert any(index_name in detail for detail in details), f"{index_name} not used: {details}"
+    assert not any(detail == f'SCAN {table}' for detail in details), f"Full scan of {table}: {details}"
+
+
+HOT_QUERIES = [
+    ('sub job work items', lambda: WorkItemService.get_sub_job_work_items(2),
+     'work_item', 'ix_work_item_sub_job_id_id'),
+    ('sub job keyset page', lambda: WorkItemService.get_work_items_page(sub_job_id=2),
+     'work_item', 'ix_work_item_sub_job_id_id'),
+    ('cost code keyset page', lambda: WorkItemService.get_work_items_page(sort_by='cost_code'),
+     'work_item', 'ix_work_item_cost_code_id_id'),
+    ('completed status bucket by progress', lambda: WorkItemService.get_work_items_page(status='completed', sort_by='progress'),
+     'work_item', 'ix_work_item_percent_complete_hours_id'),
+    ('project rollup', lambda: RollupService.get_rollup(project_id=2),
+     'work_item', 'ix_work_item_project_id_cost_code_id'),
+    ('project report rows', lambda: list(iter_report_items(project_id=2)),
+     'work_item', 'ix_work_item_project_id_cost_code_id'),
+    ('project sub jobs', lambda: SubJobService.get_project_sub_jobs(2),
+     'sub_job', 'ix_sub_job_project_id'),
+    ('project cost codes', lambda: CostCodeService.get_project_cost_codes(2),
+     'cost_code', 'ix_cost_code_project_id'),
+    ('cost codes of a rule', lambda: CostCode.query.filter_by(rule_of_credit_id=1).all(),
+     'cost_code', 'ix_cost_code_rule_of_credit_id'),
+]
+
+
+def test_hot_queries_use_indexes():
+    app = create_test_app()
+    with app.app_context():
+        for name, call, table, index_name in HOT_QUERIES:
+            assert_uses_index(call, table, index_name)
+
+
+if __name__ == '__main__':
+    app = create_test_app()
+    with app.app_context():
+        for name, call, table, index_name in HOT_QUERIES:
+            try:
+                assert_uses_index(call, table, index_name)
+                print(f"OK    {name}: {index_name}")
+            except AssertionError as e:
+                print(f"FAIL  {name}: {e}")
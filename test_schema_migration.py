@@ -0,0 +1,163 @@
+"""
+Schema migration check for Magellan EV Tracker v3.0
+- Builds a SQLite database with the schema and data of a release before the
+  versioned migrations, runs setup_auto_migration on it and asserts that it
+  is upgraded in place to LATEST_VERSION without losing data
+- Run with `python -m pytest test_schema_migration.py`
+"""
+import json
+import os
+import sqlite3
+import tempfile
+
+from flask import Flask
+from sqlalchemy import inspect
+
+from models import db, Project, SubJob, RuleOfCredit, WorkItem, ProjectRevision
+from auto_migration import setup_auto_migration, run_migrations, get_schema_version, LATEST_VERSION, MIGRATIONS
+from utils.db_profile import init_database
+from services.summary_service import SummaryService
+
+# Tables as the baseline release created them with db.create_all()
+BASELINE_SCHEMA = """
+CREATE TABLE project (
+    id INTEGER NOT NULL,
+    project_id_str VARCHAR(50) NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    description TEXT,
+    PRIMARY KEY (id),
+    UNIQUE (project_id_str)
+);
+CREATE TABLE rule_of_credit (
+    id INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    steps_json TEXT,
+    PRIMARY KEY (id)
+);
+CREATE TABLE sub_job (
+    id INTEGER NOT NULL,
+    sub_job_id_str VARCHAR(50) NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    description TEXT,
+    project_id INTEGER NOT NULL,
+    area VARCHAR(100),
+    PRIMARY KEY (id),
+    UNIQUE (sub_job_id_str),
+    FOREIGN KEY(project_id) REFERENCES project (id)
+);
+CREATE TABLE cost_code (
+    id INTEGER NOT NULL,
+    cost_code_id_str VARCHAR(50) NOT NULL,
+    description VARCHAR(200) NOT NULL,
+    discipline VARCHAR(100) NOT NULL,
+    project_id INTEGER NOT NULL,
+    rule_of_credit_id INTEGER,
+    PRIMARY KEY (id),
+    UNIQUE (cost_code_id_str),
+    FOREIGN KEY(project_id) REFERENCES project (id),
+    FOREIGN KEY(rule_of_credit_id) REFERENCES rule_of_credit (id)
+);
+CREATE TABLE work_item (
+    id INTEGER NOT NULL,
+    work_item_id_str VARCHAR(100) NOT NULL,
+    description TEXT,
+    project_id INTEGER NOT NULL,
+    sub_job_id INTEGER NOT NULL,
+    cost_code_id INTEGER NOT NULL,
+    budgeted_quantity FLOAT,
+    unit_of_measure VARCHAR(20),
+    budgeted_man_hours FLOAT,
+    progress_json TEXT,
+    earned_man_hours FLOAT,
+    earned_quantity FLOAT,
+    percent_complete_hours FLOAT,
+    percent_complete_quantity FLOAT,
+    PRIMARY KEY (id),
+    UNIQUE (work_item_id_str),
+    FOREIGN KEY(project_id) REFERENCES project (id),
+    FOREIGN KEY(sub_job_id) REFERENCES sub_job (id),
+    FOREIGN KEY(cost_code_id) REFERENCES cost_code (id)
+);
+"""
+
+
+def create_baseline_database(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    steps = json.dumps({'steps': [{'name': 'Set', 'weight': 40}, {'name': 'Weld', 'weight': 60}]})
+    connection.execute("INSERT INTO rule_of_credit VALUES (1, 'Rule', NULL, ?)", (steps,))
+    for p in (1, 2):
+        connection.execute("INSERT INTO project VALUES (?, ?, ?, NULL)", (p, f'P{p}', f'Project {p}'))
+        connection.execute("INSERT INTO cost_code VALUES (?, ?, 'Cost code', 'Piping', ?, 1)", (p, f'CC{p}', p))
+        connection.execute("INSERT INTO sub_job VALUES (?, ?, 'Sub job', NULL, ?, ?)",
+                           (p, f'S{p}', p, 'North' if p == 1 else None))
+    for i in range(10):
+        p = i % 2 + 1
+        progress = json.dumps([{'step_name': 'Set', 'current_complete_percentage': 100},
+                               {'step_name': 'Weld', 'current_complete_percentage': i * 10}])
+        earned = 40 + 0.6 * i * 10
+        connection.execute(
+            "INSERT INTO work_item VALUES (?, ?, 'Item', ?, ?, ?, 10, 'EA', 100, ?, ?, ?, ?, ?)",
+            (i + 1, f'WI-{i}', p, p, p, progress, earned, earned / 10, earned, earned)
+        )
+    connection.commit()
+    connection.close()
+
+
+def create_test_app(path):
+    app = Flask(__name__, instance_path=os.path.dirname(path))
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    init_database(app)
+    return app
+
+
+def test_baseline_database_is_upgraded_in_place():
+    path = os.path.join(tempfile.mkdtemp(), 'baseline.db')
+    create_baseline_database(path)
+    app = create_test_app(path)
+    setup_auto_migration(app)
+
+    with app.app_context():
+        connection = db.session.connection()
+        assert get_schema_version(connection) == LATEST_VERSION
+        assert [row[0] for row in connection.exec_driver_sql("SELECT version FROM schema_version ORDER BY version")] == \
+            [version for version, _, _ in MIGRATIONS]
+
+        inspector = inspect(connection)
+        assert {'version'} <= {column['name'] for column in inspector.get_columns('rule_of_credit')}
+        assert {'budgeted_hours'} <= {column['name'] for column in inspector.get_columns('sub_job')}
+        assert {'ix_work_item_sub_job_id_id', 'ix_work_item_project_id_cost_code_id'} <= \
+            {index['name'] for index in inspector.get_indexes('work_item')}
+
+        # Existing rows survive, with the new columns defaulted
+        assert Project.query.count() == 2
+        assert WorkItem.query.count() == 10
+        assert RuleOfCredit.query.one().version == 1
+        assert [sub_job.area for sub_job in SubJob.query.order_by(SubJob.id)] == ['North', 'Main']
+
+        # Legacy progress blobs moved into work_item_step_progress
+        work_item = WorkItem.query.filter_by(work_item_id_str='WI-3').one()
+        assert work_item.progress_json is None
+        assert work_item.get_steps_progress() == {'Set': 100.0, 'Weld': 30.0}
+
+        # Summaries and revisions are seeded from the existing data
+        assert SummaryService.check_drift() == []
+        assert SummaryService.get_project_summary(1).item_count == 5
+        assert ProjectRevision.query.count() == 3
+
+        # A current schema applies nothing on the next start
+        db.session.rollback()
+        assert run_migrations() == []
+
+
+def test_current_schema_is_left_alone():
+    path = os.path.join(tempfile.mkdtemp(), 'current.db')
+    create_baseline_database(path)
+    app = create_test_app(path)
+    setup_auto_migration(app)
+    setup_auto_migration(app)
+
+    with app.app_context():
+        assert db.session.connection().exec_driver_sql("SELECT COUNT(*) FROM schema_version").scalar() == len(MIGRATIONS)
+        assert WorkItem.query.count() == 10
@@ -0,0 +1,89 @@
+"""
+Step progress migration check for Magellan EV Tracker v3.0
+- Stores legacy work_item.progress_json blobs in each of their three formats
+  and asserts that migration.migrate_step_progress moves them into
+  work_item_step_progress, keeps newer rows and can be re-run
+- Run with `python -m pytest test_step_progress_migration.py`
+"""
+import json
+import os
+import tempfile
+
+from flask import Flask
+
+from models import db, Project, SubJob, CostCode, RuleOfCredit, WorkItem, WorkItemStepProgress
+from auto_migration import setup_auto_migration
+from utils.db_profile import init_database
+from migration import migrate_step_progress
+
+LEGACY_BLOBS = {
+    'WI-1': json.dumps([{'step_name': 'Set', 'current_complete_percentage': 100},
+                        {'step_name': 'Weld', 'current_complete_percentage': '25'}]),
+    'WI-2': json.dumps([{'name': 'Set', 'percentage': 50}, {'name': 'Weld', 'percentage': 0}]),
+    'WI-3': json.dumps({'Set': 75, 'Weld': 10.5}),
+    'WI-4': json.dumps({'Set': 'done', 'Weld': 40}),
+    'WI-5': 'not json',
+}
+
+
+def create_test_app():
+    instance_path = tempfile.mkdtemp()
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(instance_path, 'progress.db')
+    init_database(app)
+    setup_auto_migration(app)
+
+    with app.app_context():
+        rule = RuleOfCredit(name='Rule', steps_json='{"steps": [{"name": "Set", "weight": 40}, {"name": "Weld", "weight": 60}]}')
+        project = Project(project_id_str='P1', name='Project 1')
+        db.session.add_all([rule, project])
+        db.session.flush()
+        cost_code = CostCode(cost_code_id_str='CC1', description='Cost code', discipline='Piping',
+                             project_id=project.id, rule_of_credit_id=rule.id)
+        sub_job = SubJob(sub_job_id_str='S1', name='Sub job', project_id=project.id)
+        db.session.add_all([cost_code, sub_job])
+        db.session.flush()
+        for work_item_id_str in sorted(LEGACY_BLOBS) + ['WI-6']:
+            db.session.add(WorkItem(work_item_id_str=work_item_id_str, description='Item', project_id=project.id,
+                                    sub_job_id=sub_job.id, cost_code_id=cost_code.id, budgeted_man_hours=100))
+        db.session.commit()
+
+        # Write the blobs as an older release stored them, next to one newer migrated row
+        work_item = WorkItem.__table__
+        for work_item_id_str, blob in LEGACY_BLOBS.items():
+            db.session.execute(work_item.update()
+                               .where(work_item.c.work_item_id_str == work_item_id_str)
+                               .values(progress_json=blob))
+        wi_3 = WorkItem.query.filter_by(work_item_id_str='WI-3').one()
+        db.session.add(WorkItemStepProgress(work_item_id=wi_3.id, step_name='Set', percent_complete=90))
+        db.session.commit()
+    return app
+
+
+def stored_progress():
+    """Step progress rows keyed by work item ID string"""
+    progress = {}
+    for work_item in WorkItem.query.order_by(WorkItem.id):
+        progress[work_item.work_item_id_str] = work_item.get_steps_progress()
+    return progress
+
+
+def test_legacy_progress_formats_are_migrated():
+    app = create_test_app()
+    with app.app_context():
+        assert migrate_step_progress(batch_size=2)
+        db.session.expire_all()
+
+        assert stored_progress() == {
+            'WI-1': {'Set': 100.0, 'Weld': 25.0},
+            'WI-2': {'Set': 50.0, 'Weld': 0.0},
+            'WI-3': {'Set': 90.0, 'Weld': 10.5},
+            'WI-4': {'Weld': 40.0},
+            'WI-5': {},
+            'WI-6': {},
+        }
+        assert WorkItem.query.filter(WorkItem.progress_json.isnot(None)).count() == 0
+
+        # Nothing is left to move, so a second run changes nothing
+        assert migrate_step_progress(batch_size=2)
+        assert WorkItemStepProgress.query.count() == 7
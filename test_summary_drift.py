@@ -0,0 +1,112 @@
+"""
+Summary drift check for Magellan EV Tracker v3.0
+- Creates, edits, reassigns and deletes work items through the ORM and the
+  bulk service paths, and asserts after each step that the summaries kept by
+  models.maintain_ev_summaries match totals recomputed from the work items
+- Run with `python -m pytest test_summary_drift.py`
+"""
+import os
+import tempfile
+
+from flask import Flask
+
+from models import db, Project, SubJob, CostCode, RuleOfCredit, WorkItem
+from auto_migration import setup_auto_migration
+from utils.db_profile import init_database
+from services.summary_service import SummaryService
+from services.work_item_service import WorkItemService
+from services.earned_value_service import EarnedValueService
+
+
+def create_test_app():
+    instance_path = tempfile.mkdtemp()
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(instance_path, 'drift.db')
+    init_database(app)
+    setup_auto_migration(app)
+
+    with app.app_context():
+        rule = RuleOfCredit(name='Rule', steps_json='{"steps": [{"name": "Set", "weight": 40}, {"name": "Weld", "weight": 60}]}')
+        db.session.add(rule)
+        for p in range(1, 3):
+            project = Project(project_id_str=f'P{p}', name=f'Project {p}')
+            db.session.add(project)
+            db.session.flush()
+            for c in range(2):
+                db.session.add(CostCode(cost_code_id_str=f'P{p}-CC{c}', description='Cost code', discipline='Piping',
+                                        project_id=project.id, rule_of_credit_id=rule.id))
+            for s in range(2):
+                db.session.add(SubJob(sub_job_id_str=f'P{p}-S{s}', name=f'Sub job {s}', project_id=project.id))
+        db.session.commit()
+    return app
+
+
+def add_work_item(work_item_id_str, sub_job, cost_code, hours, quantity, progress):
+    work_item = WorkItem(
+        work_item_id_str=work_item_id_str, description='Item', project_id=sub_job.project_id,
+        sub_job_id=sub_job.id, cost_code_id=cost_code.id,
+        budgeted_man_hours=hours, budgeted_quantity=quantity
+    )
+    db.session.add(work_item)
+    work_item.set_steps_progress(progress)
+    work_item.calculate_earned_values()
+    return work_item
+
+
+def test_summaries_follow_work_item_changes():
+    app = create_test_app()
+    with app.app_context():
+        sub_jobs = SubJob.query.order_by(SubJob.id).all()
+        cost_codes = CostCode.query.order_by(CostCode.id).all()
+
+        # Create
+        for i in range(12):
+            add_work_item(f'WI-{i}', sub_jobs[i % 2], cost_codes[i % 2], 10 + i, 4 + i, {'Set': 100, 'Weld': i * 5})
+        db.session.commit()
+        assert SummaryService.check_drift() == []
+        summary = SummaryService.get_project_summary(sub_jobs[0].project_id)
+        assert summary.item_count == 12
+        assert summary.budgeted_hours == sum(10 + i for i in range(12))
+
+        # Edit budgets and step progress
+        for work_item in WorkItem.query.filter(WorkItem.id % 3 == 0):
+            work_item.budgeted_man_hours = (work_item.budgeted_man_hours or 0) * 2
+            work_item.budgeted_quantity = None
+            work_item.set_steps_progress({'Set': 50})
+            work_item.calculate_earned_values()
+        db.session.commit()
+        assert SummaryService.check_drift() == []
+
+        # Reassign to another sub job and cost code, within and across projects
+        moved = WorkItem.query.filter_by(work_item_id_str='WI-1').one()
+        moved.sub_job_id = sub_jobs[0].id
+        moved.cost_code_id = cost_codes[0].id
+        moved.calculate_earned_values()
+        other_project = WorkItem.query.filter_by(work_item_id_str='WI-2').one()
+        other_project.project_id = sub_jobs[3].project_id
+        other_project.sub_job_id = sub_jobs[3].id
+        other_project.cost_code_id = cost_codes[3].id
+        db.session.commit()
+        assert SummaryService.check_drift() == []
+        assert SummaryService.get_project_summary(sub_jobs[3].project_id).item_count == 1
+
+        # Delete
+        db.session.delete(WorkItem.query.filter_by(work_item_id_str='WI-4').one())
+        assert WorkItemService.delete_work_item(WorkItem.query.filter_by(work_item_id_str='WI-2').one().id)
+        db.session.commit()
+        assert SummaryService.check_drift() == []
+        assert SummaryService.get_project_summary(sub_jobs[3].project_id).item_count == 0
+
+        # Bulk paths that apply summary deltas themselves
+        result = WorkItemService.bulk_update_progress([
+            {'work_item_id_str': 'WI-5', 'step_name': 'Weld', 'percent': 100},
+            {'work_item_id_str': 'WI-6', 'step_name': 'Set', 'percent': 0}
+        ])
+        assert result['items_updated'] == 2
+        assert SummaryService.check_drift() == []
+
+        rule = RuleOfCredit.query.one()
+        rule.set_steps({'steps': [{'name': 'Set', 'weight': 10}, {'name': 'Weld', 'weight': 90}]})
+        db.session.commit()
+        EarnedValueService.recalculate_rule(rule.id)
+        assert SummaryService.check_drift() == []
@@ -0,0 +1,110 @@
+"""
+Keyset pagination check for Magellan EV Tracker v3.0
+- Walks WorkItemService.get_work_items_page and /api/work_items cursor by
+  cursor over sort keys with NULLs and long runs of ties, asserting that the
+  pages together list every work item exactly once in (sort key, id) order
+- Run with `python -m pytest test_work_item_pages.py`
+"""
+import os
+import tempfile
+
+from flask import Flask
+
+from models import db, Project, SubJob, CostCode, RuleOfCredit, WorkItem
+from auto_migration import setup_auto_migration
+from utils.db_profile import init_database
+from routes import main_bp
+from services.work_item_service import WorkItemService
+
+# Hours percent complete per work item: NULLs and repeated values interleaved by id
+PROGRESS = [None, 50, 0, 50, None, 100, 50, 0, None, 25, 50, 100, None, 0, 50]
+
+
+def create_test_app():
+    instance_path = tempfile.mkdtemp()
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(instance_path, 'pages.db')
+    app.config['TESTING'] = True
+    init_database(app)
+    app.register_blueprint(main_bp)
+    setup_auto_migration(app)
+
+    with app.app_context():
+        rule = RuleOfCredit(name='Rule', steps_json='{"steps": [{"name": "Install", "weight": 100}]}')
+        project = Project(project_id_str='P1', name='Project 1')
+        db.session.add_all([rule, project])
+        db.session.flush()
+        cost_codes = [CostCode(cost_code_id_str=f'CC{c}', description='Cost code', discipline='Civil',
+                               project_id=project.id, rule_of_credit_id=rule.id) for c in range(2)]
+        sub_job = SubJob(sub_job_id_str='S1', name='Sub job', project_id=project.id)
+        db.session.add_all(cost_codes + [sub_job])
+        db.session.flush()
+        for i, progress in enumerate(PROGRESS):
+            db.session.add(WorkItem(work_item_id_str=f'WI-{i:02d}', description='Item', project_id=project.id,
+                                    sub_job_id=sub_job.id, cost_code_id=cost_codes[i % 2].id,
+                                    budgeted_man_hours=10, percent_complete_hours=progress or 0))
+        db.session.flush()
+        # NULL progress as left by older imports; the column default would store 0
+        work_item = WorkItem.__table__
+        null_ids = [i + 1 for i, progress in enumerate(PROGRESS) if progress is None]
+        db.session.execute(work_item.update().where(work_item.c.id.in_(null_ids)).values(percent_complete_hours=None))
+        db.session.commit()
+    return app
+
+
+def expected_ids(sort_key, descending):
+    """IDs in (sort key, id) order with NULLs first, as SQLite orders them ascending"""
+    rows = [(sort_key(i), i + 1) for i in range(len(PROGRESS))]
+    ids = [item_id for _, item_id in sorted(rows, key=lambda row: (row[0] is not None, row[0] or 0, row[1]))]
+    return ids[::-1] if descending else ids
+
+
+def walk_pages(limit, **filters):
+    """Follow next_cursor from the first page to the last and return the IDs in page order"""
+    ids = []
+    cursor = None
+    while True:
+        page = WorkItemService.get_work_items_page(cursor=cursor, limit=limit, **filters)
+        ids.extend(work_item.id for work_item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def test_keyset_pages_with_null_sort_keys_and_ties():
+    app = create_test_app()
+    with app.app_context():
+        for descending in (False, True):
+            for limit in (1, 2, 3, 4):
+                assert walk_pages(limit, sort_by='progress', descending=descending) == \
+                    expected_ids(lambda i: PROGRESS[i], descending)
+                assert walk_pages(limit, sort_by='cost_code', descending=descending) == \
+                    expected_ids(lambda i: i % 2, descending)
+
+
+def test_keyset_pages_with_filters():
+    app = create_test_app()
+    with app.app_context():
+        # Status buckets treat NULL progress as not started
+        not_started = [i + 1 for i, progress in enumerate(PROGRESS) if not progress]
+        assert walk_pages(2, status='not_started', sort_by='progress') == \
+            [item_id for item_id in expected_ids(lambda i: PROGRESS[i], False) if item_id in not_started]
+        assert walk_pages(2, status='completed', descending=True) == \
+            [i + 1 for i in reversed(range(len(PROGRESS))) if PROGRESS[i] == 100]
+
+
+def test_work_items_api_follows_cursor():
+    app = create_test_app()
+    client = app.test_client()
+    ids = []
+    url = '/api/work_items?sort_by=progress&order=desc&limit=4'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        payload = response.get_json()
+        ids.extend(item['id'] for item in payload['items'])
+        url = f"/api/work_items?sort_by=progress&order=desc&limit=4&cursor={payload['next_cursor']}" \
+            if payload['next_cursor'] else None
+
+    assert ids == expected_ids(lambda i: PROGRESS[i], True)
+    assert client.get('/api/work_items?sort_by=name').status_code == 400
@@ -0,0 +1,135 @@
+"""
+CLI commands for Magellan EV Tracker v3.0
+Registers maintenance commands on the Flask app (run with `flask <command>`)
+"""
+import click
+
+
+def register_commands(app):
+    """
+    Register all CLI commands with the Flask app
+    
+    Args:
+        app: Flask application instance
+    """
+    @app.cli.command('rebuild-summaries')
+    @click.option('--project-id', type=int, default=None, help='Only rebuild this project')
+    @click.option('--check', is_flag=True, help='Only report drift, do not rebuild')
+    def rebuild_summaries(project_id, check):
+        """Recompute the earned-value summary tables and report drift"""
+        from services.summary_service import SummaryService
+        
+        drift = SummaryService.check_drift(project_id=project_id)
+        for row in drift:
+            for column, (stored, expected) in row['differences'].items():
+                click.echo(f"{row['table']} {row['id']}: {column} stored={stored} expected={expected}")
+        click.echo(f"{len(drift)} drifted summary rows")
+        
+        if check:
+            if drift:
+                raise SystemExit(1)
+            return
+        
+        count = SummaryService.rebuild(project_id=project_id)
+        click.echo(f"Rebuilt {count} summary rows")
+    
+    @app.cli.command('recalculate-rule')
+    @click.argument('rule_id', type=int)
+    @click.option('--project-id', type=int, default=None, help='Only recalculate this project')
+    def recalculate_rule(rule_id, project_id):
+        """Recalculate earned values of every work item using a rule of credit"""
+        from services.earned_value_service import EarnedValueService
+        
+        result = EarnedValueService.recalculate_rule(rule_id, project_id=project_id)
+        click.echo(f"Recalculated {result['items']} work items in {result['seconds']:.3f}s")
+    
+    @app.cli.command('import-work-items')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--project-id', type=int, required=True, help='Project the work items belong to')
+    @click.option('--chunk-size', type=int, default=None, help='Work items per bulk insert')
+    @click.option('--dry-run', is_flag=True, help='Only validate the file')
+    def import_work_items(path, project_id, chunk_size, dry_run):
+        """Import work items from a CSV or XLSX estimate export"""
+        from services.work_item_import_service import WorkItemImportService, IMPORT_CHUNK_SIZE
+        
+        with open(path, 'rb') as stream:
+            rows = WorkItemImportService.iter_file_rows(stream, path)
+            result = WorkItemImportService.import_work_items(
+                rows, project_id, chunk_size=chunk_size or IMPORT_CHUNK_SIZE, dry_run=dry_run
+            )
+        for error in result['errors']:
+            click.echo(f"Row {error['row']} {error['work_item_id_str']}: {error['error']}")
+        click.echo(f"{result['items_valid']} of {result['rows_read']} rows valid, {result['items_imported']} imported "
+                   f"in {result['seconds']:.2f}s ({result['error_count']} errors)")
+        if result['error_count']:
+            raise SystemExit(1)
+    
+    @app.cli.command('export-reports')
+    @click.argument('archive', type=click.Path(dir_okay=False))
+    @click.option('--type', 'report_types', multiple=True, help='Report type (repeatable; default hours and quantities)')
+    @click.option('--format', 'file_formats', multiple=True, help='File format (repeatable; default pdf)')
+    @click.option('--project-id', 'project_ids', type=int, multiple=True, help='Only these projects (repeatable)')
+    @click.option('--workers', type=int, default=None, help='Worker processes')
+    def export_reports(archive, report_types, file_formats, project_ids, workers):
+        """Export reports of every project and sub job into a zip archive"""
+        from reports.report_batch import run_report_batch
+        from reports.report_dataset import REPORT_TYPES
+        
+        def show_progress(completed, failed, total):
+            click.echo(f"{completed}/{total} projects and sub jobs exported ({failed} failed)")
+        
+        result = run_report_batch(
+            archive, list(report_types) or list(REPORT_TYPES), list(file_formats) or ['pdf'], list(project_ids) or None,
+            workers=workers or app.config.get('REPORT_BATCH_WORKERS'), progress=show_progress
+        )
+        for error in result['errors']:
+            click.echo(error)
+        click.echo(f"Wrote {result['reports']} reports to {archive} in {result['seconds']:.1f}s")
+        if result['failed']:
+            raise SystemExit(1)
+    
+    @app.cli.command('snapshot-ev')
+    @click.option('--date', 'cutoff_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Cutoff date (default today); an existing snapshot of that date is replaced')
+    @click.option('--project-id', type=int, default=None, help='Only snapshot this project')
+    def snapshot_ev(cutoff_date, project_id):
+        """Record earned-value snapshots for S-curves (run periodically, e.g. weekly)"""
+        from services.snapshot_service import SnapshotService
+        
+        cutoff_date = cutoff_date.date() if cutoff_date else None
+        if project_id is not None:
+            snapshot = SnapshotService.take_snapshot(project_id, cutoff_date)
+            click.echo(f"Snapshot of project {project_id} at {snapshot.cutoff_date}: {snapshot.item_count} work items")
+            return
+        
+        result = SnapshotService.take_all_snapshots(cutoff_date)
+        for snapshot in result['snapshots']:
+            click.echo(f"Snapshot of project {snapshot.project_id} at {snapshot.cutoff_date}: {snapshot.item_count} work items")
+        for failed_project_id, error in result['errors'].items():
+            click.echo(f"Project {failed_project_id}: {error}")
+        if result['errors']:
+            raise SystemExit(1)
+    
+    @app.cli.command('migrate-db')
+    @click.option('--status', is_flag=True, help='Only print the schema version')
+    def migrate_db(status):
+        """Apply pending versioned schema migrations"""
+        from auto_migration import LATEST_VERSION, get_schema_version, setup_auto_migration
+        from models import db
+        
+        with db.engine.connect() as connection:
+            version = get_schema_version(connection)
+        click.echo(f"Schema version {version} of {LATEST_VERSION}")
+        if status:
+            return
+        setup_auto_migration(app)
+        with db.engine.connect() as connection:
+            click.echo(f"Schema now at version {get_schema_version(connection)}")
+    
+    @app.cli.command('migrate-step-progress')
+    def migrate_step_progress():
+        """Move legacy progress_json blobs into work_item_step_progress"""
+        from migration import migrate_step_progress as run_step_progress_migration
+        
+        if not run_step_progress_migration():
+            raise SystemExit(1)
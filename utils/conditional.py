@@ -0,0 +1,110 @@
+"""
+HTTP conditional GET for Magellan EV Tracker v3.0
+- Views decorated with conditional_get answer 304 Not Modified when the
+  client's ETag (or Last-Modified date) still matches the project data
+  revision, before the view queries or renders anything
+- Strong ETags combine the endpoint, its arguments, the data revision and a
+  version of the templates, so a deploy with changed templates never serves
+  a stale page
+- Responses carry Cache-Control: no-cache, i.e. browsers revalidate every time
+"""
+from datetime import timezone
+from functools import wraps
+from flask import current_app, make_response, request, session
+import hashlib
+import os
+
+
+def template_version(app):
+    """
+    Digest of the template file names, sizes and modification times
+
+    Computed once per process; ETAG_VERSION overrides it (e.g. with a commit SHA).
+
+    Args:
+        app: Flask application instance
+
+    Returns:
+        str: Short hex digest
+    """
+    version = app.extensions.get('etag_version')
+    if version is None:
+        version = app.config.get('ETAG_VERSION')
+        if not version:
+            digest = hashlib.sha256()
+            template_folder = os.path.join(app.root_path, app.template_folder or 'templates')
+            for directory, _, file_names in sorted(os.walk(template_folder)):
+                for file_name in sorted(file_names):
+                    stat = os.stat(os.path.join(directory, file_name))
+                    digest.update(f"{os.path.relpath(os.path.join(directory, file_name), template_folder)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+            version = digest.hexdigest()[:12]
+        app.extensions['etag_version'] = version
+    return version
+
+
+def make_etag(*parts):
+    """Strong ETag value (without quotes) from the given parts"""
+    return hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Check the request's validators against the current ones
+
+    If-None-Match wins when present, as RFC 9110 requires. Last-Modified has
+    one-second resolution and is only a fallback for clients without ETags.
+
+    Args:
+        etag (str): Current ETag value
+        last_modified (datetime, optional): Current modification time (UTC)
+
+    Returns:
+        bool: True when the client's copy is current
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_get(revision_for):
+    """
+    Answer GET requests with 304 while the data revision is unchanged
+
+    Requests with pending flash messages always render, so the messages are
+    shown. Set CONDITIONAL_GET = False to disable.
+
+    Args:
+        revision_for (callable): Called with the view's keyword arguments;
+            returns a (revision, updated_at) row, or None to always render
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or session.get('_flashes')
+                    or not current_app.config.get('CONDITIONAL_GET', True)):
+                return view(*args, **kwargs)
+
+            current = revision_for(**kwargs)
+            if current is None:
+                return view(*args, **kwargs)
+
+            revision, updated_at = current
+            last_modified = updated_at.replace(tzinfo=timezone.utc) if updated_at else None
+            etag = make_etag(request.endpoint, sorted(kwargs.items()), request.query_string.decode(),
+                             revision, template_version(current_app))
+
+            if not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                # Error pages and pages that flashed a message are not cacheable
+                if response.status_code != 200 or session.get('_flashes'):
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
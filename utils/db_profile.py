@@ -0,0 +1,110 @@
+"""
+Database engine profiles for Magellan EV Tracker v3.0
+- SQLite (default): WAL journaling, synchronous=NORMAL, mmap, page cache and a
+  busy timeout set on every new connection, so concurrent gunicorn workers
+  queue for the write lock instead of failing with "database is locked"
+- Server databases: set DATABASE_URL (e.g. postgresql://...) to run the same
+  `db` object against a pooled server connection
+"""
+from models import db
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_URI = 'sqlite:///magellan_ev.db'
+
+# Applied with PRAGMA on every new SQLite connection; override per key with SQLITE_PRAGMAS
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers no longer block the writer, and the writer no longer blocks readers
+    'synchronous': 'NORMAL',  # Safe with WAL; fsync at checkpoints instead of every commit
+    'busy_timeout': 30000,  # Milliseconds to wait for the write lock before "database is locked"
+    'cache_size': -65536,  # Negative means KiB: 64 MiB page cache per connection
+    'mmap_size': 268435456,  # Read the first 256 MiB of the file through memory mapping
+    'temp_store': 'MEMORY'
+}
+
+# SQLite allows one writer at a time, so a few pooled connections per worker suffice
+SQLITE_ENGINE_OPTIONS = {
+    'pool_size': 5,
+    'max_overflow': 5,
+    'pool_timeout': 30,
+    'connect_args': {'timeout': 30, 'check_same_thread': False}
+}
+
+SERVER_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30,
+    'pool_recycle': 1800,  # Recycle before server-side idle timeouts close connections
+    'pool_pre_ping': True
+}
+
+
+def database_uri():
+    """
+    Database URI from the DATABASE_URL environment variable, SQLite by default
+
+    Returns:
+        str: SQLAlchemy database URI
+    """
+    uri = os.environ.get('DATABASE_URL') or DEFAULT_SQLITE_URI
+    # Hosting providers still hand out the postgres:// scheme SQLAlchemy 1.4+ rejects
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Run PRAGMA statements on a raw sqlite3 connection
+
+    Args:
+        dbapi_connection: sqlite3 connection
+        pragmas (dict): Pragma name -> value
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def init_database(app):
+    """
+    Configure the engine profile and initialize `db` on the app
+
+    Configuration:
+        SQLALCHEMY_DATABASE_URI: Defaults to DATABASE_URL or the local SQLite file
+        SQLALCHEMY_ENGINE_OPTIONS: Merged over the profile's pool settings
+        SQLITE_PRAGMAS: Merged over DEFAULT_SQLITE_PRAGMAS
+
+    Args:
+        app: Flask application instance
+    """
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_uri())
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    is_sqlite = uri.startswith('sqlite')
+
+    engine_options = dict(SQLITE_ENGINE_OPTIONS if is_sqlite else SERVER_ENGINE_OPTIONS)
+    if is_sqlite and (':memory:' in uri or uri in ('sqlite://', 'sqlite:///')):
+        # In-memory databases live in a single connection; keep Flask-SQLAlchemy's static pool
+        engine_options = {}
+    engine_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+    db.init_app(app)
+
+    if is_sqlite:
+        pragmas = dict(DEFAULT_SQLITE_PRAGMAS)
+        pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+
+        with app.app_context():
+            @event.listens_for(db.engine, "connect")
+            def set_sqlite_pragmas(dbapi_connection, connection_record):
+                apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    logger.info(f"Using database at: {make_url(uri).render_as_string(hide_password=True)}")
@@ -0,0 +1,157 @@
+"""
+Logging setup for Magellan EV Tracker v3.0
+- Request threads only put records on an in-memory queue (QueueHandler); a
+  QueueListener thread formats and writes them, so log I/O never blocks a request
+- Records are written as one JSON object per line (LOG_FORMAT=text for plain lines)
+- Per-logger sampling and rate limits keep chatty loggers from flooding the output;
+  warnings and errors are never sampled or rate limited
+- Configured once from the environment: LOG_LEVEL, LOG_FORMAT and LOG_SAMPLING
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback apart from the message
+
+    The stock handler folds the formatted traceback into msg; here it travels
+    in exc_text so the JSON formatter can emit it as its own field.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Sample and rate limit records below WARNING per logger
+
+    Rules are matched on the logger name or its closest configured parent,
+    e.g. {"services": {"sample_rate": 0.1}, "routes": {"rate_limit": 20}}.
+
+    sample_rate keeps that fraction of records. rate_limit caps records per
+    second with a token bucket that allows short bursts of the same size.
+    """
+
+    def __init__(self, rules):
+        super().__init__()
+        self.rules = rules
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._rule_cache = {}
+
+    def _rule_for(self, name):
+        rule = self._rule_cache.get(name)
+        if rule is None:
+            rule = {}
+            candidate = name
+            while candidate:
+                if candidate in self.rules:
+                    rule = self.rules[candidate]
+                    break
+                candidate = candidate.rpartition('.')[0]
+            self._rule_cache[name] = rule
+        return rule
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rule = self._rule_for(record.name)
+        if not rule:
+            return True
+
+        sample_rate = rule.get('sample_rate')
+        if sample_rate is not None and random.random() >= sample_rate:
+            return False
+
+        rate_limit = rule.get('rate_limit')
+        if rate_limit:
+            now = time.monotonic()
+            with self._lock:
+                tokens, updated = self._buckets.get(record.name, (rate_limit, now))
+                tokens = min(rate_limit, tokens + (now - updated) * rate_limit)
+                allowed = tokens >= 1
+                self._buckets[record.name] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+        return True
+
+
+def configure_logging(level=None, log_format=None, sampling=None):
+    """
+    Route all logging through a background queue listener
+
+    Safe to call more than once; only the first call configures handlers.
+
+    Args:
+        level (str, optional): Root level, defaults to LOG_LEVEL or INFO
+        log_format (str, optional): 'json' or 'text', defaults to LOG_FORMAT or json
+        sampling (dict, optional): SamplingFilter rules, defaults to the LOG_SAMPLING JSON
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.environ.get('LOG_LEVEL') or 'INFO').upper()
+    log_format = (log_format or os.environ.get('LOG_FORMAT') or 'json').lower()
+    if sampling is None:
+        sampling = json.loads(os.environ.get('LOG_SAMPLING') or '{}')
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    queue_handler = StructuredQueueHandler(queue.SimpleQueue())
+    if sampling:
+        # Filter before enqueueing so dropped records cost nothing downstream
+        queue_handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,93 @@
+"""
+Packed column encoding for Magellan EV Tracker v3.0
+- Stores a whole column of numbers (e.g. the earned hours of every work item
+  in a snapshot) as one compressed binary value instead of one row per item
+- IDs are sorted and delta-encoded first, so consecutive IDs pack into runs
+  of small numbers that compress to a few bits each
+- Values are little-endian 8-byte integers / doubles regardless of the host,
+  so packed columns read back the same on every server
+"""
+from array import array
+import sys
+import zlib
+
+# zlib level: packing happens once per snapshot, reads are what matter
+COMPRESSION_LEVEL = 6
+
+
+def _pack(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return zlib.compress(values.tobytes(), COMPRESSION_LEVEL)
+
+
+def _unpack(typecode, blob):
+    values = array(typecode)
+    if blob:
+        values.frombytes(zlib.decompress(blob))
+        if sys.byteorder != 'little':
+            values.byteswap()
+    return values
+
+
+def pack_ids(ids):
+    """
+    Pack ascending integer IDs as compressed deltas
+
+    Args:
+        ids (iterable): Integers in ascending order
+
+    Returns:
+        bytes: Packed column
+    """
+    deltas = array('q')
+    previous = 0
+    for value in ids:
+        deltas.append(value - previous)
+        previous = value
+    return _pack(deltas)
+
+
+def unpack_ids(blob):
+    """
+    Unpack IDs packed with pack_ids
+
+    Args:
+        blob (bytes): Packed column
+
+    Returns:
+        array: IDs in ascending order
+    """
+    ids = _unpack('q', blob)
+    total = 0
+    for i, delta in enumerate(ids):
+        total += delta
+        ids[i] = total
+    return ids
+
+
+def pack_floats(values):
+    """
+    Pack floats (None counts as 0.0)
+
+    Args:
+        values (iterable): Numbers
+
+    Returns:
+        bytes: Packed column
+    """
+    return _pack(array('d', (value or 0.0 for value in values)))
+
+
+def unpack_floats(blob):
+    """
+    Unpack floats packed with pack_floats
+
+    Args:
+        blob (bytes): Packed column
+
+    Returns:
+        array: Values in their packed order
+    """
+    return _unpack('d', blob)
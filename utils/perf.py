@@ -0,0 +1,214 @@
+"""
+Request performance instrumentation for Magellan EV Tracker v3.0
+- Times every SQL statement through SQLAlchemy before/after_cursor_execute
+- Records per request: query count, total SQL time, template render time and
+  the slowest statements, for requests handled by the instrumented blueprints
+- Sends the timings to the browser as a Server-Timing header
+- Keeps a rolling in-memory window per endpoint, shown with p50/p95 at /debug/perf
+  next to the service cache statistics
+"""
+from collections import deque
+from flask import g, has_request_context, render_template, request, abort
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.service_cache import service_cache
+import math
+import threading
+import time
+
+# Requests kept per endpoint in the rolling window
+DEFAULT_PERF_WINDOW = 500
+
+# Slowest statements kept per request and across the window
+SLOW_STATEMENTS_PER_REQUEST = 5
+SLOW_STATEMENTS_KEPT = 20
+
+
+class RequestPerf:
+    """Timings collected while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = []
+
+    def add_statement(self, statement, seconds):
+        self.query_count += 1
+        self.sql_seconds += seconds
+        self.statements.append((seconds, statement))
+        if len(self.statements) > SLOW_STATEMENTS_PER_REQUEST * 4:
+            self.statements = sorted(self.statements, reverse=True)[:SLOW_STATEMENTS_PER_REQUEST]
+
+    def slowest_statements(self):
+        return sorted(self.statements, reverse=True)[:SLOW_STATEMENTS_PER_REQUEST]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+class PerfStore:
+    """
+    Rolling window of request timings per endpoint, shared by the worker's threads
+    """
+
+    def __init__(self, window=DEFAULT_PERF_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._slow_statements = []
+
+    def record(self, endpoint, total_seconds, perf):
+        with self._lock:
+            samples = self._requests.get(endpoint)
+            if samples is None:
+                samples = self._requests[endpoint] = deque(maxlen=self.window)
+            samples.append((total_seconds, perf.sql_seconds, perf.template_seconds, perf.query_count))
+
+            for seconds, statement in perf.slowest_statements():
+                self._slow_statements.append((seconds, statement, endpoint))
+            self._slow_statements = sorted(self._slow_statements, key=lambda entry: entry[0], reverse=True)[:SLOW_STATEMENTS_KEPT]
+
+    def summary(self):
+        """
+        Summarize the window per endpoint
+
+        Returns:
+            dict: 'endpoints' (list of dicts with count and p50/p95 of total, SQL
+                and template milliseconds and query counts, slowest p95 first)
+                and 'slow_statements' (list of (ms, statement, endpoint))
+        """
+        with self._lock:
+            requests = {endpoint: list(samples) for endpoint, samples in self._requests.items()}
+            slow_statements = list(self._slow_statements)
+
+        endpoints = []
+        for endpoint, samples in requests.items():
+            columns = [sorted(column) for column in zip(*samples)]
+            total, sql, template, queries = columns
+            endpoints.append({
+                'endpoint': endpoint,
+                'count': len(samples),
+                'total_p50': percentile(total, 0.5) * 1000,
+                'total_p95': percentile(total, 0.95) * 1000,
+                'sql_p50': percentile(sql, 0.5) * 1000,
+                'sql_p95': percentile(sql, 0.95) * 1000,
+                'template_p50': percentile(template, 0.5) * 1000,
+                'template_p95': percentile(template, 0.95) * 1000,
+                'queries_p50': percentile(queries, 0.5),
+                'queries_p95': percentile(queries, 0.95)
+            })
+        endpoints.sort(key=lambda row: row['total_p95'], reverse=True)
+        return {
+            'endpoints': endpoints,
+            'slow_statements': [(seconds * 1000, statement, endpoint) for seconds, statement, endpoint in slow_statements]
+        }
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+            self._slow_statements = []
+
+
+def _current_perf():
+    if has_request_context():
+        return g.get('request_perf')
+    return None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if _current_perf() is not None:
+        conn.info.setdefault('perf_statement_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    perf = _current_perf()
+    started = conn.info.get('perf_statement_started')
+    if perf is not None and started:
+        perf.add_statement(statement, time.perf_counter() - started.pop())
+
+
+class TimedTemplate(Template):
+    """Jinja template that adds its render time to the current request's timings"""
+
+    def render(self, *args, **kwargs):
+        perf = _current_perf()
+        if perf is None:
+            return super().render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            perf.template_seconds += time.perf_counter() - started
+
+
+class PerfMonitor:
+    """
+    Flask extension collecting per-request query and timing data
+
+    Configuration:
+        PERF_BLUEPRINTS: Blueprints to instrument (default ('main',))
+        PERF_WINDOW: Requests kept per endpoint (default 500)
+        PERF_PANEL: Serve /debug/perf (default: only in debug mode)
+    """
+
+    def __init__(self, app=None):
+        self.store = PerfStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Register the request hooks, template timing and the /debug/perf page
+
+        Args:
+            app: Flask application instance
+        """
+        blueprints = set(app.config.get('PERF_BLUEPRINTS', ('main',)))
+        self.store.window = app.config.get('PERF_WINDOW', DEFAULT_PERF_WINDOW)
+        app.jinja_env.template_class = TimedTemplate
+        app.extensions['perf'] = self
+
+        @app.before_request
+        def start_request_perf():
+            if request.blueprint in blueprints:
+                g.request_perf = RequestPerf()
+
+        @app.after_request
+        def finish_request_perf(response):
+            perf = g.pop('request_perf', None)
+            if perf is None:
+                return response
+            total_seconds = time.perf_counter() - perf.started
+            self.store.record(request.endpoint, total_seconds, perf)
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={perf.sql_seconds * 1000:.1f};desc="{perf.query_count} queries", '
+                f'tpl;dur={perf.template_seconds * 1000:.1f}, '
+                f'total;dur={total_seconds * 1000:.1f}'
+            )
+            return response
+
+        def debug_perf():
+            """Per-endpoint p50/p95 timings of the rolling window"""
+            if not app.config.get('PERF_PANEL', app.debug):
+                abort(404)
+            if request.args.get('clear'):
+                self.store.clear()
+            return render_template('debug_perf.html', summary=self.store.summary(), window=self.store.window,
+                                   cache_stats=service_cache.stats())
+
+        app.add_url_rule('/debug/perf', 'debug_perf', debug_perf)
+
+
+# Shared monitor, bound to the app in simple_app.py
+perf_monitor = PerfMonitor()
@@ -0,0 +1,95 @@
+"""
+SQL query counting for Magellan EV Tracker v3.0
+- QueryCounter counts the statements executed inside a `with` block
+- register_query_budget fails any request that issues more statements than
+  the QUERY_BUDGET config allows, catching N+1 regressions in tests
+"""
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import threading
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block or request issues more SQL statements than allowed"""
+
+
+class QueryCounter:
+    """
+    Count SQL statements executed by the current thread inside a `with` block
+    
+    Usage:
+        with QueryCounter(max_queries=5) as counter:
+            client.get('/work_items')
+        print(counter.count, counter.statements)
+    """
+    _local = threading.local()
+    
+    def __init__(self, max_queries=None):
+        self.max_queries = max_queries
+        self.statements = []
+    
+    @property
+    def count(self):
+        return len(self.statements)
+    
+    def __enter__(self):
+        stack = getattr(QueryCounter._local, 'stack', None)
+        if stack is None:
+            stack = QueryCounter._local.stack = []
+        stack.append(self)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        QueryCounter._local.stack.remove(self)
+        if exc_type is None and self.max_queries is not None and self.count > self.max_queries:
+            raise QueryBudgetExceeded(
+                f"{self.count} queries issued, budget is {self.max_queries}:\n" + "\n".join(self.statements)
+            )
+        return False
+    
+    @staticmethod
+    def _record(statement):
+        for counter in getattr(QueryCounter._local, 'stack', ()):
+            counter.statements.append(statement)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    QueryCounter._record(statement)
+    if has_request_context() and 'query_budget_statements' in g:
+        g.query_budget_statements.append(statement)
+
+
+def register_query_budget(app):
+    """
+    Enforce a per-request SQL statement budget when QUERY_BUDGET is configured
+    
+    QUERY_BUDGET may be an int applied to every request, or a dict of
+    endpoint -> int (with an optional 'default' key). Requests over budget
+    raise QueryBudgetExceeded, which surfaces as a test failure when the app
+    runs with TESTING enabled.
+    
+    Args:
+        app: Flask application instance
+    """
+    def budget_for(endpoint):
+        budget = app.config.get('QUERY_BUDGET')
+        if isinstance(budget, dict):
+            return budget.get(endpoint, budget.get('default'))
+        return budget
+    
+    @app.before_request
+    def start_query_budget():
+        if budget_for(request.endpoint) is not None:
+            g.query_budget_statements = []
+    
+    @app.after_request
+    def check_query_budget(response):
+        budget = budget_for(request.endpoint)
+        statements = g.pop('query_budget_statements', None)
+        if budget is not None and statements is not None and len(statements) > budget:
+            raise QueryBudgetExceeded(
+                f"{request.endpoint} issued {len(statements)} queries, budget is {budget}:\n" + "\n".join(statements)
+            )
+        return response
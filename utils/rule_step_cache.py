@@ -0,0 +1,108 @@
+"""
+Rule of credit step cache for Magellan EV Tracker v3.0
+Parses a rule's steps_json once per (rule id, version) and shares the
+normalized (name, weight) steps across the whole process
+"""
+from collections import namedtuple
+import json
+import threading
+
+# A normalized rule of credit step; weight is a percentage of the whole rule
+RuleStep = namedtuple("RuleStep", ["name", "weight"])
+
+
+def parse_rule_steps(steps_json):
+    """
+    Parse a rule's steps_json into normalized steps
+
+    Supports the current {"steps": [{"name", "weight"}]} format and the
+    legacy list format whose entries carry either "name" or "step_name".
+
+    Args:
+        steps_json (str): JSON text stored on the rule
+
+    Returns:
+        tuple: Tuple of RuleStep in rule order
+    """
+    parsed_rule_steps = []
+    try:
+        rule_data = json.loads(steps_json or "[]")
+        if isinstance(rule_data, dict) and isinstance(rule_data.get("steps"), list):
+            for step_entry in rule_data["steps"]:
+                if isinstance(step_entry, dict) and "name" in step_entry and "weight" in step_entry:
+                    parsed_rule_steps.append(RuleStep(str(step_entry["name"]), float(step_entry["weight"])))
+        elif isinstance(rule_data, list):  # Legacy format support
+            for step_entry in rule_data:
+                if isinstance(step_entry, dict) and "weight" in step_entry:
+                    step_name_val = step_entry.get("name", step_entry.get("step_name"))
+                    if step_name_val:
+                        parsed_rule_steps.append(RuleStep(str(step_name_val), float(step_entry["weight"])))
+    except (ValueError, TypeError):
+        pass
+    return tuple(parsed_rule_steps)
+
+
+class RuleStepCache:
+    """
+    Process-wide cache of parsed rule steps keyed by (rule id, version)
+
+    The version is bumped whenever a rule's steps change, so a worker whose
+    cache still holds an older version simply misses and re-parses; the
+    explicit invalidation in RuleOfCreditService frees the stale entries.
+    """
+    _lock = threading.Lock()
+    _steps = {}
+
+    @classmethod
+    def get_steps(cls, rule):
+        """
+        Get the normalized steps of a rule
+
+        Args:
+            rule (RuleOfCredit): Rule of credit, may be None
+
+        Returns:
+            tuple: Tuple of RuleStep, empty when there is no rule
+        """
+        if rule is None:
+            return ()
+        if rule.id is None:
+            return parse_rule_steps(rule.steps_json)
+
+        key = (rule.id, rule.version or 1)
+        steps = cls._steps.get(key)
+        if steps is None:
+            steps = parse_rule_steps(rule.steps_json)
+            with cls._lock:
+                cls._steps[key] = steps
+        return steps
+
+    @classmethod
+    def get_steps_for_cost_code(cls, cost_code):
+        """
+        Get the normalized steps of a cost code's rule of credit
+
+        Args:
+            cost_code (CostCode): Cost code, may be None
+
+        Returns:
+            tuple: Tuple of RuleStep, empty when the cost code has no rule
+        """
+        if cost_code is None or not cost_code.rule_of_credit_id:
+            return ()
+        return cls.get_steps(cost_code.rule_of_credit)
+
+    @classmethod
+    def invalidate(cls, rule_id=None):
+        """
+        Drop cached steps for one rule, or for every rule
+
+        Args:
+            rule_id (int, optional): Rule of Credit ID
+        """
+        with cls._lock:
+            if rule_id is None:
+                cls._steps.clear()
+            else:
+                for key in [key for key in cls._steps if key[0] == rule_id]:
+                    del cls._steps[key]
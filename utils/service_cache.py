@@ -0,0 +1,148 @@
+"""
+Service-layer cache for Magellan EV Tracker v3.0
+- Process-wide, size-bounded LRU of small read results (counters, option lists)
+- Callers put the data revision (services.revision_service) in the key, so a
+  write in any worker is seen by every worker on its next read
+- Every entry expires after a TTL, so entries of superseded revisions do not
+  linger; the LRU bound caps the size
+- Keys are (namespace, ...) tuples so a whole namespace can be dropped
+- Hit/miss/eviction statistics are shown on /debug/perf
+"""
+from collections import OrderedDict
+import threading
+import time
+
+DEFAULT_CACHE_TTL = 30  # seconds
+DEFAULT_CACHE_SIZE = 256  # entries
+
+_MISSING = object()
+
+
+class ServiceCache:
+    """
+    Thread-safe TTL + LRU cache shared by the service classes
+
+    Configuration (through init_app):
+        SERVICE_CACHE_TTL: Default time to live in seconds (default 30, 0 disables caching)
+        SERVICE_CACHE_SIZE: Maximum number of entries (default 256)
+    """
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, max_size=DEFAULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def init_app(self, app):
+        """
+        Read the cache settings from the app config
+
+        Args:
+            app: Flask application instance
+        """
+        self.ttl = app.config.get('SERVICE_CACHE_TTL', DEFAULT_CACHE_TTL)
+        self.max_size = app.config.get('SERVICE_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+        self.clear()
+        app.extensions['service_cache'] = self
+
+    def get(self, key, default=None):
+        """
+        Get a live entry and mark it most recently used
+
+        Args:
+            key (tuple): (namespace, ...) key
+            default: Returned when the key is missing or expired
+
+        Returns:
+            Cached value or default
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                del self._entries[key]
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value, evicting the least recently used entries over max_size
+
+        Args:
+            key (tuple): (namespace, ...) key
+            value: Value to cache; must not be bound to a database session
+            ttl (float, optional): Seconds to live, defaults to the cache TTL
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Get a cached value, calling loader() and caching its result on a miss
+
+        Concurrent misses may each call the loader; the last result wins.
+
+        Args:
+            key (tuple): (namespace, ...) key
+            loader (callable): Computes the value
+            ttl (float, optional): Seconds to live, defaults to the cache TTL
+
+        Returns:
+            Cached or freshly loaded value
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, *namespaces):
+        """
+        Drop every entry of the given namespaces
+
+        Args:
+            *namespaces (str): Namespaces, the first element of the keys
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in namespaces]:
+                del self._entries[key]
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get the cache statistics of this worker process
+
+        Returns:
+            dict: hits, misses, evictions, expirations, invalidations, hit_rate,
+                size, max_size and ttl
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_size'] = self.max_size
+        stats['ttl'] = self.ttl
+        return stats
+
+
+# Shared cache, configured in simple_app.py
+service_cache = ServiceCache()